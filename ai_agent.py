@@ -5,35 +5,80 @@ import os
 # Importa "json" para parse/conversão de JSON (formato de dados)
 import json
 
-# Importa "time" para pausar código (usado em retry com espera)
-import time
-
 # Importa "re" (regular expressions) para extrair texto/padrões
 # Usado para encontrar tempo de retry nos erros da API
 import re
 
-# Importa cliente Google Generative AI (Gemini)
-# genai = módulo do Google
-from google import genai
-
-# Importa tipos de configuração do cliente (resposta JSON, etc)
-from google.genai import types
+# Importa o backend da IA (classifier_backend.py)
+# BackendGemini = UM cliente do Gemini reaproveitado por todas as chamadas
+from classifier_backend import BackendGemini
 
 # Importa load_dotenv para ler arquivo .env
 # O .env guarda variáveis sensíveis como GOOGLE_API_KEY
 from dotenv import load_dotenv
 
+# Importa o limitador de taxa compartilhado (rate_limiter.py)
+# Toda chamada ao Gemini passa por ele
+from rate_limiter import LimitadorTaxa
+
+# Importa o cache de classificações em duas camadas (classification_cache.py)
+from classification_cache import CacheClassificacoes, ORIGEM_HEURISTICA
+
+# Importa a impressão digital do estabelecimento (transactions.py)
+# "UBER *TRIP 8F2K" e "UBER *TRIP 9XQ1" viram a mesma chave de cache
+from transactions import impressao_digital
+
+# Importa o motor de heurísticas compilado (heuristic_engine.py)
+# Usado como fallback e quando o circuito da API está aberto
+from heuristic_engine import MOTOR_HEURISTICAS
+
 # ========== CONFIGURAÇÃO ==========
 # Carrega variáveis do arquivo .env
 # Deve ter: GOOGLE_API_KEY=sua_chave_aqui
 load_dotenv()
 
-# Cache em memória para evitar reprocessamento
-# Estrutura: {chave: resultado}
-# Chave = "descricao_valor"
-# Valor = resposta da IA armazenada
-# Exemplo: {"UBER TRIP_-45.9": {"category": "Transporte", ...}}
-_CACHE_CLASSIFICACOES = {}
+# Categorias que a IA pode escolher
+# Qualquer resposta fora desta lista é considerada inválida
+CATEGORIAS_BASE = ["Transporte", "Assinaturas", "Alimentação", "Receita", "Compras Online", "Outros"]
+
+# Cache de classificações para evitar reprocessamento
+# Camada 1 = LRU em memória (GIRO_CACHE_TAMANHO entradas no máximo)
+# Camada 2 = tabela classification_cache no banco (sobrevive a reinícios)
+# Chave = hash de (impressão digital, sinal do valor, versão das categorias)
+CACHE_CLASSIFICACOES = CacheClassificacoes(
+    'Classificador Inteligente de Transações.db',
+    CATEGORIAS_BASE,
+    capacidade=int(os.getenv("GIRO_CACHE_TAMANHO", "5000")),
+    normalizador=impressao_digital
+)
+
+# Quantas transações vão em cada prompt de lote (classificar_lote)
+# Pode ser alterado pela variável de ambiente GIRO_TAMANHO_LOTE_IA
+TAMANHO_LOTE_PADRAO = int(os.getenv("GIRO_TAMANHO_LOTE_IA", "20"))
+
+# Por quanto tempo (no mínimo) a API fica "desligada" depois de estourar
+# a cota em todas as tentativas; nesse período só heurísticas são usadas
+TEMPO_CIRCUITO_S = 30
+
+# Limitador ÚNICO para todas as chamadas ao Gemini (todas as threads)
+# GIRO_GEMINI_RPM = requisições por minuto da cota
+# GIRO_GEMINI_TPM = tokens por minuto da cota
+LIMITADOR_GEMINI = LimitadorTaxa(
+    requisicoes_por_minuto=float(os.getenv("GIRO_GEMINI_RPM", "15")),
+    tokens_por_minuto=float(os.getenv("GIRO_GEMINI_TPM", "1000000"))
+)
+
+# Backend ÚNICO da IA (todas as threads usam o mesmo cliente)
+# GIRO_GEMINI_BASE_URL = outro servidor com a mesma API, ex.: o servidor
+# falso de benchmarks/servidor_falso_gemini.py (testes sem rede)
+BACKEND_IA = BackendGemini(base_url=os.getenv("GIRO_GEMINI_BASE_URL") or None)
+
+
+def definir_backend(backend):
+    """Troca o backend da IA (testes, benchmarks). Retorna o anterior."""
+    global BACKEND_IA
+    anterior, BACKEND_IA = BACKEND_IA, backend
+    return anterior
 
 
 # ========== FUNÇÃO HELPER 1: EXTRAIR TEMPO DE RETRY ==========
@@ -77,69 +122,79 @@ def _classificar_por_heuristica(description, amount):
     Fallback: usa heurísticas locais quando IA falha.
     
     Quando IA não pode classificar (sem internet, quota, erro):
-    - Usa palavras-chave automáticas
+    - Usa palavras-chave automáticas (tabelas em heuristicas.json)
     - Simples mas eficaz
     - Mantém sistema funcionando
+
+    As tabelas são compiladas uma única vez em heuristic_engine.py.
     """
-    
-    # Converte descrição para MAIÚSCULA (para comparar com keywords)
-    # Exemplo: "Uber Trip" → "UBER TRIP"
-    desc_upper = description.upper()
-    
-    # ========== CASO 1: RECEITA ==========
-    # Se valor é positivo (> 0), é entrada de dinheiro
-    # Exemplo: +1000 = salário, herança, etc
-    if amount > 0:
-        return {
-            "category": "Receita",
-            # Confiança alta (95%) porque valores positivos são muito específicos
-            "confidence": 95,
-            "reason": "Valor positivo identificado como receita (heurística)"
-        }
-    
-    # ========== CASO 2: TRANSPORTE ==========
-    # Procura por palavras-chave de transporte
-    # any() = True se QUALQUER uma das palavras está em desc_upper
-    if any(x in desc_upper for x in ["UBER", "99", "LYFT", "TAXI", "GASOLINA", "POSTO", "COMBUSTIVEL", "ESTACIONAMENTO"]):
-        return {
-            "category": "Transporte",
-            # Confiança alta (90%) porque keywords são bem específicos
-            "confidence": 90,
-            "reason": "Palavras-chave de transporte detectadas"
-        }
-    
-    # ========== CASO 3: ALIMENTAÇÃO ==========
-    # Procura por palavras comuns de restaurantes/comida
-    if any(x in desc_upper for x in ["IFOOD", "RESTAURANTE", "PADARIA", "SUPERMERcado", "MERCADO", "LANCHE", "COMIDA", "ALIMENT"]):
-        return {
-            "category": "Alimentação",
-            "confidence": 88,
-            "reason": "Palavras-chave de alimentação detectadas"
-        }
-    
-    # ========== CASO 4: ASSINATURAS ==========
-    if any(x in desc_upper for x in ["NETFLIX", "SPOTIFY", "AMAZON PRIME", "DISNEY", "HBO", "APPLE", "GOOGLE PLAY", "SUBSCRIPTION", "MENSALIDADE"]):
-        return {
-            "category": "Assinaturas",
-            "confidence": 92,
-            "reason": "Palavras-chave de assinaturas detectadas"
-        }
-    
-    # ========== CASO 5: COMPRAS ONLINE ==========
-    if any(x in desc_upper for x in ["AMAZON", "MERCADO LIVRE", "SHOPEE", "ALIEXPRESS", "EBAY", "ONLINE", "COMPRA"]):
-        return {
-            "category": "Compras Online",
-            "confidence": 85,
-            "reason": "Palavras-chave de compras online detectadas"
-        }
-    
-    # ========== CASO PADRÃO: OUTROS ==========
-    # Se nada se encaixar, "Outros"
-    return {
-        "category": "Outros",
-        "confidence": 50,
-        "reason": "Nenhuma categoria específica detectada (heurística)"
-    }
+    return MOTOR_HEURISTICAS.classificar(description, amount)
+
+
+def _fallback_heuristica(description, amount):
+    """
+    Heurística com cache PRÓPRIO (origem "heuristica", TTL curto).
+
+    Nunca é gravada como se fosse resposta da IA: assim que a cota
+    voltar, a transação é classificada de verdade pelo modelo.
+    """
+    resultado = CACHE_CLASSIFICACOES.obter(description, amount, ORIGEM_HEURISTICA)
+    if resultado is None:
+        resultado = _classificar_por_heuristica(description, amount)
+        CACHE_CLASSIFICACOES.guardar(description, amount, resultado, ORIGEM_HEURISTICA)
+    return resultado
+
+
+# ========== FUNÇÃO HELPER 3: ESTIMAR TOKENS ==========
+def _estimar_tokens(input_str, instrucao, qtd_itens=1):
+    """
+    Estimativa grosseira de tokens de uma chamada (≈ 4 caracteres por token),
+    somando entrada, instrução de sistema e ~40 tokens de resposta por item.
+    Usada só para o balde de tokens/minuto do limitador.
+    """
+    return (len(input_str) + len(instrucao)) // 4 + 40 * qtd_itens
+
+
+def _eh_erro_quota(erro_str):
+    """True se o erro é de quota (429 / RESOURCE_EXHAUSTED)."""
+    return "429" in erro_str or "RESOURCE_EXHAUSTED" in erro_str
+
+
+# ========== FUNÇÃO HELPER 4: INSTRUÇÕES DE SISTEMA ==========
+# Instrução de sistema para classificar UMA transação
+_INSTRUCAO_UNITARIA = """
+Você recebe um JSON com:
+- "description": descrição da transação
+- "amount": valor (negativo para saídas, positivo para entradas)
+- "available_categories": lista de categorias válidas
+
+Classifique a transação escolhendo UMA categoria de "available_categories".
+Retorne SOMENTE um JSON válido com:
+- "category": a categoria escolhida
+- "confidence": inteiro de 0 a 100
+- "reason": explicação breve
+
+Se não puder classificar, use "Outros" com confidence 0.
+Não retorne texto extra fora do JSON.
+"""
+
+# Instrução de sistema para classificar VÁRIAS transações de uma vez
+_INSTRUCAO_LOTE = """
+Você recebe um JSON com:
+- "transactions": lista de objetos com "id", "description" e "amount"
+  (amount negativo para saídas, positivo para entradas)
+- "available_categories": lista de categorias válidas
+
+Classifique CADA transação escolhendo UMA categoria de "available_categories".
+Retorne SOMENTE um array JSON, com um objeto por transação, contendo:
+- "id": o mesmo id recebido
+- "category": a categoria escolhida
+- "confidence": inteiro de 0 a 100
+- "reason": explicação breve
+
+Se não puder classificar uma transação, use "Outros" com confidence 0.
+Não retorne texto extra fora do JSON.
+"""
 
 
 # ========== FUNÇÃO PRINCIPAL: CLASSIFICAÇÃO COM IA ==========
@@ -159,12 +214,16 @@ def classificar_transacao_com_ia(description, amount):
     """
     
     # ========== PASSO 1: VERIFICAR CACHE ==========
-    cache_key = f"{description}_{amount}"
-    if cache_key in _CACHE_CLASSIFICACOES:
-        return True, _CACHE_CLASSIFICACOES[cache_key]
+    em_cache = CACHE_CLASSIFICACOES.obter(description, amount)
+    if em_cache is not None:
+        return True, em_cache
+
+    # Circuito aberto (cota estourada há pouco): nem tenta a API
+    if LIMITADOR_GEMINI.circuito_aberto():
+        return False, _fallback_heuristica(description, amount)
     
     # ========== PASSO 2: PREPARAR LISTA DE CATEGORIAS ==========
-    categorias_base = ["Transporte", "Assinaturas", "Alimentação", "Receita", "Compras Online", "Outros"]
+    categorias_base = CATEGORIAS_BASE
     
     # ========== PASSO 3: MONTAR INPUT JSON ESTRITO ==========
     input_json = {
@@ -174,42 +233,23 @@ def classificar_transacao_com_ia(description, amount):
     }
     input_str = json.dumps(input_json, ensure_ascii=False)
     
-    # ========== PASSO 4: CONFIGURAR MODELO COM SYSTEM PROMPT ==========
-    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-    model = genai.GenerativeModel(
-        model_name="gemini-1.5-flash-latest",
-        generation_config=types.GenerationConfig(
-            response_mime_type="application/json",
-            temperature=0.2
-        ),
-        system_instruction="""
-Você recebe um JSON com:
-- "description": descrição da transação
-- "amount": valor (negativo para saídas, positivo para entradas)
-- "available_categories": lista de categorias válidas
-
-Classifique a transação escolhendo UMA categoria de "available_categories".
-Retorne SOMENTE um JSON válido com:
-- "category": a categoria escolhida
-- "confidence": inteiro de 0 a 100
-- "reason": explicação breve
-
-Se não puder classificar, use "Outros" com confidence 0.
-Não retorne texto extra fora do JSON.
-"""
-    )
+    # ========== PASSO 4: ESTIMAR CUSTO NA COTA ==========
+    # (o modelo e a instrução de sistema já estão no backend: nada a montar)
+    tokens = _estimar_tokens(input_str, _INSTRUCAO_UNITARIA)
     
     # ========== PASSO 5: LOOP DE RETRY ==========
     max_tentativas = 3
     for tentativa in range(max_tentativas):
         try:
+            # ========== ESPERAR COTA NO LIMITADOR ==========
+            LIMITADOR_GEMINI.adquirir(tokens)
+
             # ========== TENTAR CHAMAR IA ==========
-            response = model.generate_content(
-                contents=[{"role": "user", "parts": [input_str]}]
-            )
+            texto = BACKEND_IA.gerar(_INSTRUCAO_UNITARIA, input_str)
+            LIMITADOR_GEMINI.registrar_sucesso()
             
             # ========== PARSEAR RESPOSTA ==========
-            resultado_json = json.loads(response.text)
+            resultado_json = json.loads(texto)
             
             # ========== VALIDAÇÃO DE SEGURANÇA ==========
             if resultado_json.get("category") not in categorias_base:
@@ -218,36 +258,188 @@ Não retorne texto extra fora do JSON.
                 resultado_json["reason"] = "A IA sugeriu uma categoria inválida. Marcado como Outros."
             
             # ========== SUCESSO! ==========
-            _CACHE_CLASSIFICACOES[cache_key] = resultado_json
+            CACHE_CLASSIFICACOES.guardar(description, amount, resultado_json)
             return True, resultado_json
             
         except Exception as e:
             erro_str = str(e)
             
-            if "429" in erro_str or "RESOURCE_EXHAUSTED" in erro_str:
+            if _eh_erro_quota(erro_str):
+                # Ensina o limitador: reduz a taxa e pausa pelo tempo sugerido
+                tempo_espera = _extrair_tempo_retry(erro_str)
+                LIMITADOR_GEMINI.registrar_429(tempo_espera)
                 if tentativa < max_tentativas - 1:
-                    tempo_espera = _extrair_tempo_retry(erro_str)
                     print(f"⚠️ Quota da IA excedida. Aguardando {tempo_espera:.1f}s antes de tentar novamente... (tentativa {tentativa + 1}/{max_tentativas})")
-                    time.sleep(tempo_espera)
                     continue
                 else:
                     print(f"⚠️ Quota excedida após {max_tentativas} tentativas. Usando fallback com heurísticas.")
-                    resultado = _classificar_por_heuristica(description, amount)
-                    _CACHE_CLASSIFICACOES[cache_key] = resultado
+                    LIMITADOR_GEMINI.abrir_circuito(max(TEMPO_CIRCUITO_S, tempo_espera))
+                    resultado = _fallback_heuristica(description, amount)
                     return False, resultado
             
             else:
                 print(f"⚠️ Erro na IA: {e}")
-                resultado = _classificar_por_heuristica(description, amount)
-                _CACHE_CLASSIFICACOES[cache_key] = resultado
+                resultado = _fallback_heuristica(description, amount)
                 return False, resultado
     
     # ========== FALLBACK FINAL ==========
-    resultado = _classificar_por_heuristica(description, amount)
-    _CACHE_CLASSIFICACOES[cache_key] = resultado
+    resultado = _fallback_heuristica(description, amount)
     return False, resultado
 
 
+# ========== FUNÇÃO HELPER 5: VALIDAR ITEM DO LOTE ==========
+def _validar_item_lote(item):
+    """
+    Valida um elemento da resposta em lote.
+
+    Retorna o dict normalizado ou None se estiver malformado
+    (não é objeto, categoria fora da lista, confiança inválida).
+    """
+    if not isinstance(item, dict):
+        return None
+    if item.get("category") not in CATEGORIAS_BASE:
+        return None
+    try:
+        confianca = float(item.get("confidence", 0))
+    except (TypeError, ValueError):
+        return None
+    if not 0 <= confianca <= 100:
+        return None
+    return {
+        "category": item["category"],
+        "confidence": confianca,
+        "reason": str(item.get("reason", ""))
+    }
+
+
+# ========== FUNÇÃO PRINCIPAL 2: CLASSIFICAÇÃO EM LOTE ==========
+def classificar_lote(transacoes, origens=None):
+    """
+    Classifica VÁRIAS transações numa única chamada à IA.
+
+    Recebe lista de (description, amount) e monta um prompt com um
+    array JSON. Cada elemento devolvido é validado; se faltar ou vier
+    malformado, só aquele item cai para a heurística local.
+
+    origens (opcional): lista preenchida com de onde veio cada resposta,
+    na mesma ordem: 'cache', 'ia' ou 'heuristica' (tela de progresso).
+
+    Returns:
+        lista de (sucesso, resultado), na mesma ordem da entrada,
+        no mesmo formato de classificar_transacao_com_ia
+    """
+
+    resultados = [None] * len(transacoes)
+    fontes = ['cache'] * len(transacoes)
+
+    # ========== PASSO 1: VERIFICAR CACHE ==========
+    # Só vai para o prompt quem ainda não foi classificado
+    faltando = []
+    for i, (description, amount) in enumerate(transacoes):
+        em_cache = CACHE_CLASSIFICACOES.obter(description, amount)
+        if em_cache is not None:
+            resultados[i] = (True, em_cache)
+        else:
+            faltando.append(i)
+
+    if not faltando:
+        if origens is not None:
+            origens.extend(fontes)
+        return resultados
+
+    # Circuito aberto (cota estourada há pouco): nem tenta a API,
+    # classifica o lote inteiro com as heurísticas compiladas
+    if LIMITADOR_GEMINI.circuito_aberto():
+        heuristicas = MOTOR_HEURISTICAS.classificar_lote(
+            [transacoes[i][0] for i in faltando], [transacoes[i][1] for i in faltando]
+        )
+        for i, resultado in zip(faltando, heuristicas):
+            resultados[i] = (False, resultado)
+            fontes[i] = 'heuristica'
+        if origens is not None:
+            origens.extend(fontes)
+        return resultados
+
+    # ========== PASSO 2: MONTAR INPUT JSON (ARRAY) ==========
+    # "id" = posição na lista original, para casar a resposta
+    input_json = {
+        "transactions": [
+            {"id": i, "description": transacoes[i][0], "amount": transacoes[i][1]}
+            for i in faltando
+        ],
+        "available_categories": CATEGORIAS_BASE
+    }
+    input_str = json.dumps(input_json, ensure_ascii=False)
+
+    tokens = _estimar_tokens(input_str, _INSTRUCAO_LOTE, len(faltando))
+
+    # ========== PASSO 3: LOOP DE RETRY ==========
+    resposta = None
+    max_tentativas = 3
+    for tentativa in range(max_tentativas):
+        try:
+            LIMITADOR_GEMINI.adquirir(tokens)
+            texto = BACKEND_IA.gerar(_INSTRUCAO_LOTE, input_str)
+            LIMITADOR_GEMINI.registrar_sucesso()
+            resposta = json.loads(texto)
+            break
+
+        except Exception as e:
+            erro_str = str(e)
+
+            if _eh_erro_quota(erro_str):
+                # Ensina o limitador: reduz a taxa e pausa pelo tempo sugerido
+                tempo_espera = _extrair_tempo_retry(erro_str)
+                LIMITADOR_GEMINI.registrar_429(tempo_espera)
+                if tentativa < max_tentativas - 1:
+                    print(f"⚠️ Quota da IA excedida. Aguardando {tempo_espera:.1f}s antes de tentar novamente... (tentativa {tentativa + 1}/{max_tentativas})")
+                    continue
+                # Cota continua estourada: abre o circuito por um tempo
+                LIMITADOR_GEMINI.abrir_circuito(max(TEMPO_CIRCUITO_S, tempo_espera))
+
+            print(f"⚠️ Erro na IA (lote de {len(faltando)}): {e}. Usando fallback com heurísticas.")
+            break
+
+    # ========== PASSO 4: CASAR RESPOSTA COM A ENTRADA ==========
+    # Aceita array puro ou {"transactions": [...]}
+    if isinstance(resposta, dict):
+        resposta = resposta.get("transactions")
+    por_id = {}
+    if isinstance(resposta, list):
+        for item in resposta:
+            if not isinstance(item, dict):
+                continue
+            try:
+                por_id.setdefault(int(item.get("id")), item)
+            except (TypeError, ValueError):
+                continue
+
+    sem_resposta = []
+    for i in faltando:
+        description, amount = transacoes[i]
+        valido = _validar_item_lote(por_id.get(i))
+        if valido is not None:
+            CACHE_CLASSIFICACOES.guardar(description, amount, valido)
+            resultados[i] = (True, valido)
+            fontes[i] = 'ia'
+        else:
+            # Item ausente ou malformado: fallback só para ele
+            sem_resposta.append(i)
+
+    # Fallbacks do lote numa passada só pelo motor de heurísticas
+    if sem_resposta:
+        heuristicas = MOTOR_HEURISTICAS.classificar_lote(
+            [transacoes[i][0] for i in sem_resposta], [transacoes[i][1] for i in sem_resposta]
+        )
+        for i, resultado in zip(sem_resposta, heuristicas):
+            resultados[i] = (False, resultado)
+            fontes[i] = 'heuristica'
+
+    if origens is not None:
+        origens.extend(fontes)
+    return resultados
+
+
 # ========== TESTE (EXECUTAR DIRETO) ==========
 if __name__ == "__main__":
     sucesso, res = classificar_transacao_com_ia("UBER TRIP", -45.90)
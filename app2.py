@@ -1,7 +1,12 @@
 # ========== IMPORTS (BIBLIOTECAS EXTERNAS) ==========
 # Importa "os" para acessar variáveis de ambiente e manipular arquivos
 import os
-import threading
+# Importa "json" para montar os eventos de progresso (SSE)
+import json
+# Importa "queue" para esperar eventos do worker com timeout
+import queue
+# Importa o arquivo "em memória" dos uploads (só vai para o disco se for grande)
+from tempfile import SpooledTemporaryFile
 # Importa Flask e seus decompositores
 # Flask = framework web para criar aplicação
 # render_template = mostra arquivos HTML com dados
@@ -10,50 +15,130 @@ import threading
 # url_for = gera URLs automaticamente (mais seguro)
 # flash = mostra mensagens temporárias ao usuário
 # session = guarda dados do usuário logado (cookies)
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+# g = "bolso" da requisição atual (guarda a conexão do banco)
+# jsonify = resposta JSON (endpoints chamados pelo JavaScript)
+# Response = resposta "em fluxo" (eventos de progresso)
+# Request = requisição (trocamos onde os arquivos enviados ficam)
+from flask import Flask, render_template, request, redirect, url_for, flash, session, g, jsonify, Response, Request, abort
 
-# Importa SQLite3 para conectar ao banco de dados
-import sqlite3
+# Importa a fábrica de conexões compartilhada (db.py)
+from db import obter_conexao, liberar_conexao
 
 # Importa funções de autenticação e cadastro de user.py
 from user import login_usuario, cadastrar_usuario             
 
-# Importa função que processa CSV de transactions.py
-from transactions import upload_to_csv_db
+# Importa a importação de CSVs de transactions.py
+# (vários arquivos: leitura em paralelo, um escritor só)
+from transactions import importar_arquivos
 
-# Importa funções de processor.py:
-# aplicar_regras_automaticas = aplica regras do usuário
-# processar_com_ia = classifica com IA
-from processor import aplicar_regras_automaticas, processar_com_ia
+# Importa a fila durável de classificação (job_queue.py):
+# enfileirar_classificacao = pede regras + IA para o usuário
+# PoolWorkers = threads fixas que executam os jobs
+from job_queue import enfileirar_classificacao, PoolWorkers
+
+# Importa invalidação do cache de regras compiladas (rule_matcher.py)
+# Chamada sempre que uma regra nova é inserida
+from rule_matcher import invalidar_cache_regras, SQL_REGRA_EXISTENTE
+
+# Importa o treino incremental do classificador local (local_classifier.py)
+# Cada confirmação do usuário vira exemplo de treino
+from local_classifier import treinar
+
+# Importa as migrações do banco (database.py)
+from database import inicializar_banco
+
+# Página do dashboard: paginação por chave, filtros e totais agregados
+from dashboard_query import ler_filtros, buscar_pagina, contar_transacoes, ultimo_evento, buscar_mudancas
+
+# Resumo por categoria/mês, mantido junto com cada confirmação/exclusão
+from category_totals import ajustar_totais, totais_por_categoria
+
+# Página de categorias: uma consulta com janelas + lista sob demanda (JSON)
+from category_query import resumo_categorias, buscar_transacoes_categoria
+
+# Progresso da classificação em segundo plano (pub/sub do worker → SSE)
+from progress import PROGRESSO
+
+# Ações em lote por conjunto (IN em pedaços, auditoria com INSERT ... SELECT)
+from batch_actions import ler_ids, confirmar_lote, excluir_lote, confirmar_acima_da_confianca, SQL_TRANSACAO_POR_ID
 
 # ========== CONFIGURAÇÃO FLASK ==========
 # Cria instância de aplicação Flask
 # __name__ = nome do módulo (usado para encontrar templates)
 app = Flask(__name__)
 
+
+# ========== UPLOADS SEM PASSAR PELO DISCO ==========
+# Até este tamanho o arquivo enviado fica só na memória; acima disso vai
+# para um arquivo temporário anônimo (sem nome, só deste processo,
+# apagado ao fechar). O parser lê direto desse fluxo.
+LIMITE_UPLOAD_EM_MEMORIA = int(os.getenv("GIRO_UPLOAD_MEMORIA_MB", "16")) * 1024 * 1024
+
+
+class RequisicaoUploadEmMemoria(Request):
+    """Requisição cujos arquivos enviados ficam em memória (até o limite)."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledTemporaryFile(max_size=LIMITE_UPLOAD_EM_MEMORIA, mode='rb+')
+
+
+app.request_class = RequisicaoUploadEmMemoria
+
 # Define chave secreta para criptografar dados da sessão
 # IMPORTANTE: Nunca deixar no código em produção! Use variável de ambiente
 app.secret_key = 'chave_secreta_para_desafio'
 
+
+# Datas ficam em ISO no banco (AAAA-MM-DD); na tela aparecem DD/MM/AAAA
+@app.template_filter('data_br')
+def data_br(data):
+    partes = str(data).split('-')
+    if len(partes) == 3 and len(partes[0]) == 4:
+        return f"{partes[2]}/{partes[1]}/{partes[0]}"
+    return data
+
+
 # ========== CONSTANTES ==========
 # Lista de categorias permitidas (padrão)
 # Usada para validação em vários locais
 CATEGORIAS_PERMITIDAS = ["Transporte", "Assinaturas", "Alimentação", "Receita", "Compras Online", "Outros"]
 
+# ========== WORKERS DE CLASSIFICAÇÃO ==========
+# Número FIXO de threads consumindo a fila "jobs" (GIRO_WORKERS_IA, padrão 2)
+# Uploads só enfileiram; quem classifica são estes workers
+# (as threads só sobem em iniciar_servicos(), não no import)
+POOL_CLASSIFICACAO = PoolWorkers(tamanho=int(os.getenv("GIRO_WORKERS_IA", "2")))
+
+
+# ========== INICIALIZAÇÃO DOS SERVIÇOS ==========
+def iniciar_servicos():
+    """
+    Aplica as migrações pendentes (tabelas, colunas, índices) e sobe os
+    workers, nessa ordem: nenhum worker toca no banco antes de migrar.
+
+    Fica fora do import: testes importam app2 (test_client) sem criar
+    banco na pasta atual nem subir threads.
+    """
+    inicializar_banco()
+    POOL_CLASSIFICACAO.iniciar()
+
 # ========== FUNÇÃO HELPER: CONECTAR BANCO ==========
-# Função auxiliar para abrir conexão com banco em cada rota
-# Isso garante que cada requisição tem conexão fresca
+# Função auxiliar que entrega a conexão do banco para a rota
+# A conexão vem de db.py (uma por thread, já configurada e reaproveitada)
+# e é guardada em "g" durante a requisição; liberar_bd() a devolve no fim
 def conectar_bd():
-    """Abre e configura conexão com banco de dados."""
-    
-    # Conecta ao banco SQLite
-    con = sqlite3.connect('Classificador Inteligente de Transações.db', timeout=30, check_same_thread=False)    
-    # Configura para acessar por nome de coluna (Ex: row['email'])
-    # Muito mais legível do que índices (row[0])
-    con.row_factory = sqlite3.Row 
-    
-    # Retorna conexão configurada
-    return con
+    """Conexão do banco da requisição atual."""
+    if 'db' not in g:
+        g.db = obter_conexao()
+    return g.db
+
+
+@app.teardown_appcontext
+def liberar_bd(erro):
+    """Fim da requisição: desfaz o que ficou sem commit (ex.: rota que deu erro)."""
+    db = g.pop('db', None)
+    if db is not None:
+        liberar_conexao(db)
 
 # ========== ROTA ÍNDICE (RAIZ) ==========
 # @app.route('/') = quando usuário acessa "http://localhost:5000/"
@@ -137,9 +222,6 @@ def login():
             # Pega primeira linha (só tem uma porque ID é único)
             usuario = cur.fetchone()
             
-            # Fecha conexão
-            db.close()
-            
             # Se encontrou dados do usuário
             if usuario:
                 # usuario[0] = primeira coluna do resultado (NOME)
@@ -169,54 +251,54 @@ def dashboard():
     # Abre banco de dados
     db = conectar_bd()
     
-    # PASSO 1: Busca TODAS as transações do usuário
-    # ORDER BY date DESC = mais recente primeiro
-    transacoes = db.execute(
-        'SELECT * FROM transactions WHERE user_id = ? ORDER BY date DESC', 
-        (session['user_id'],)
-    ).fetchall()
-    
-    # PASSO 2: Busca TODAS as categorias confirmadas do usuário
-    # Usado para popular lista de categorias no dropdown
-    categorias_usuario = db.execute(
-        "SELECT DISTINCT confirmed_category FROM transactions WHERE user_id = ? AND confirmed_category IS NOT NULL", 
-        (session['user_id'],)
-    ).fetchall()
+    # PASSO 1: Busca UMA página de transações (pendentes primeiro)
+    # Filtros e cursor vêm da URL: /dashboard?status=pending&apos=...
+    # (?apos= é a chave da última linha da página anterior)
+    filtros = ler_filtros(request.args)
+    transacoes, proximo_cursor = buscar_pagina(
+        db, session['user_id'], filtros, cursor=request.args.get('apos')
+    )
+
+    # Totais de TODAS as páginas (consulta agregada, sem carregar linhas)
+    totais = contar_transacoes(db, session['user_id'], filtros)
+
+    # Cursor do feed de mudanças: a página pede só o que mudar depois daqui
+    cursor_mudancas = ultimo_evento(db, session['user_id'])
+
+    # PASSO 2: Busca as categorias confirmadas do usuário
+    # Usado para popular lista de categorias no dropdown e o gráfico
+    # (vem do resumo category_totals: uma linha por categoria)
+    totais_categorias = totais_por_categoria(db, session['user_id'])
 
     # Começa com categorias padrão
     todas_categorias = set(CATEGORIAS_PERMITIDAS)
     
     # Adiciona categorias personalizadas (que o usuário criou)
-    for c in categorias_usuario:
-        todas_categorias.add(c['confirmed_category'])
+    for c in totais_categorias:
+        todas_categorias.add(c['categoria'])
     
     # Converte set para lista ordenada (A-Z)
     lista_categorias = sorted(list(todas_categorias))
 
     # PASSO 3: Prepara dados para gráfico
-    # Somará TODAS as despesas por categoria
-    dados_grafico = {}
-    
-    # Para cada transação
-    for t in transacoes:
-        # Se transação está confirmada E tem categoria confirmada
-        if t['status'] == 'confirmed' and t['confirmed_category']:
-            # Pega a categoria
-            cat = t['confirmed_category']
-            
-            # Se é despesa (amount < 0), adiciona ao gráfico
-            # abs() = valor absoluto (remove o -)
-            # Faz: dados_grafico['Transporte'] += 45.90
-            dados_grafico[cat] = dados_grafico.get(cat, 0) + abs(t['amount'])
-    
-    # Fecha conexão
-    db.close()
+    # Soma das confirmadas por categoria (já pronta no resumo)
+    dados_grafico = {c['categoria']: c['total'] for c in totais_categorias}
 
     # PASSO 4: Retorna template com dados
     # render_template('dashboard.html', ...) = mostra HTML com dados
     return render_template('dashboard.html', 
-                           # Todas as transações
+                           # Transações da página atual
                            transacoes=transacoes, 
+                           # Cursor da próxima página (None = última)
+                           proximo_cursor=proximo_cursor,
+                           # Filtros aplicados (para manter nos links)
+                           filtros=filtros,
+                           # Só os filtros preenchidos, para montar os links de página
+                           filtros_url={k: v for k, v in filtros.items() if v},
+                           # Totais do conjunto filtrado (cards)
+                           totais=totais,
+                           # Último evento já refletido na página (feed de mudanças)
+                           cursor_mudancas=cursor_mudancas,
                            # Lista de categorias para dropdown
                            categorias=lista_categorias,
                            # Nomes das categorias para gráfico (labels)
@@ -243,55 +325,43 @@ def logout():
 @app.route('/upload', methods=['POST'])
 def upload():
     if 'user_id' not in session: return redirect(url_for('login'))
-    arquivos = request.files.getlist('file')
+    arquivos = [
+        f for f in request.files.getlist('file')
+        if f.filename and f.filename.lower().endswith(('.csv', '.txt'))
+    ]
     processou_algo = False
+    resumos = []  # "Upload concluído (N novas, M já existentes ...)" de cada arquivo
     mensagem_de_erro = "Nenhum arquivo CSV ou TXT válido enviado."
-    
-    for f in arquivos:
-        if f.filename == '' or not f.filename.lower().endswith(('.csv', '.txt')): 
-            continue
-            
-        caminho = os.path.join(app.root_path, f.filename)
-        f.save(caminho)
-        sucesso, msg = upload_to_csv_db(caminho, session['user_id'])
-        
-        if os.path.exists(caminho): os.remove(caminho)
+
+    # Lê direto do que chegou na requisição (nada é salvo com o nome do
+    # cliente): arquivos lidos em paralelo, gravados um de cada vez
+    relatorios = []
+    resultados = importar_arquivos(
+        [f.stream for f in arquivos], session['user_id'], relatorios=relatorios
+    ) if arquivos else []
+    # Re-upload do mesmo extrato: o content_hash pula tudo e não sobra nada para classificar
+    novas = sum(r.get('inseridas', 0) for r in relatorios)
+
+    for sucesso, msg in resultados:
         if sucesso: 
             processou_algo = True
+            resumos.append(msg)
         else:
             mensagem_de_erro = msg 
     
-    if processou_algo:
-        # Aplica as regras rápidas na hora
-        aplicar_regras_automaticas(session['user_id'])
-        
-        # 🔥 A MÁGICA: Inicia a IA em SEGUNDO PLANO. A tela não trava mais!
-        thread_ia = threading.Thread(target=processar_com_ia, args=(session['user_id'],))
-        thread_ia.start()
+    if processou_algo and novas:
+        # 🔥 Só ENFILEIRA: regras + IA rodam nos workers em segundo plano.
+        # Vários uploads seguidos viram um único job por usuário.
+        enfileirar_classificacao(session['user_id'])
         
-        flash("Upload concluído! A IA está classificando os dados em segundo plano. Atualize a página em alguns segundos para ver as sugestões.", "success")
+        flash(f"{'; '.join(resumos)}. As regras e a IA estão classificando os dados em segundo plano. As sugestões aparecem na tabela assim que ficarem prontas.", "success")
+    elif processou_algo:
+        # Nada novo: nenhum job (nem card de progresso) à toa
+        flash(f"{'; '.join(resumos)}. Nenhuma transação nova para classificar.", "success")
     else:
         flash(f"Falha no arquivo: {mensagem_de_erro}", "error")
         
     return redirect(url_for('dashboard'))
-    
-    # PROCESSAMENTO PÓS-UPLOAD
-    if processou_algo:
-        # Aplica regras automáticas (palavras-chave)
-        # de processor.py
-        aplicar_regras_automaticas(session['user_id'])
-        
-        # Classifica com IA as transações que não tiveram regra
-        processar_com_ia(session['user_id'])
-        
-        # Mostra sucesso
-        flash("Arquivo(s) processados com sucesso!", "success")
-    else:
-        # Nenhum arquivo válido
-        flash("Nenhum arquivo CSV válido foi processado.", "error")
-    
-    # Volta ao dashboard
-    return redirect(url_for('dashboard'))
 
 # ========== ROTA CONFIRMAR TRANSAÇÃO ==========
 @app.route('/confirmar', methods=['POST'])
@@ -312,59 +382,65 @@ def confirmar():
     # Abre banco
     db = conectar_bd()
     
-    # Verifica se transação existe
+    # Verifica se a transação existe E é do usuário logado
     # Busca a descrição (será usada para extrair palavra-chave padrão)
-    t = db.execute("SELECT description FROM transactions WHERE transaction_id = ?", (id_t,)).fetchone()
+    t = db.execute(SQL_TRANSACAO_POR_ID, (id_t, user_id)).fetchone()
     
-    # Se transação existe
-    if t:
-        # PASSO 1: Atualiza status e categoria da transação
-        # confirmed_category = categoria que usuário escolheu
-        # status = 'confirmed' (foi confirmada)
-        db.execute(
-            "UPDATE transactions SET confirmed_category = ?, status = 'confirmed' WHERE transaction_id = ?", 
-            (cat, id_t)
-        )
-        
-        # PASSO 2: Registra no audit log
-        # action = 'user_confirmed' (usuário confirmou manualmente)
-        # source = 'user' (veio do usuário, não da IA)
-        db.execute(
-            "INSERT INTO audit_log (transaction_id, user_id, action, new_category, source) VALUES (?, ?, 'user_confirmed', ?, 'user')", 
-            (id_t, user_id, cat)
-        )
-        
-        # PASSO 3: Cria regra se usuário marcou checkbox
-        # criar_regra == 'on' = checkbox foi marcado
-        # palavra_chave = texto da regra (ex: "UBER")
-        if criar_regra == 'on' and palavra_chave:
-            # Verifica se esta regra já existe (para não duplicar)
-            existe = db.execute(
-                "SELECT id FROM rules WHERE user_id = ? AND keyword = ?", 
-                (user_id, palavra_chave)
-            ).fetchone()
-            
-            # Se não existe, cria
-            if not existe:
-                # Insere nova regra
-                # keyword = palavra a procurar
-                # category = categoria automática
-                db.execute(
-                    "INSERT INTO rules (user_id, keyword, category) VALUES (?, ?, ?)", 
-                    (user_id, palavra_chave, cat)
-                )
-        
-        # Confirma mudanças
-        db.commit()
+    # Id inexistente ou de outro usuário
+    if not t:
+        abort(404)
+
+    # PASSO 1: Atualiza status e categoria da transação
+    # confirmed_category = categoria que usuário escolheu
+    # status = 'confirmed' (foi confirmada)
+    # (o resumo por categoria tira o estado antigo e soma o novo)
+    ajustar_totais(db, user_id, [id_t], peso=-1)
+    db.execute(
+        "UPDATE transactions SET confirmed_category = ?, status = 'confirmed' WHERE transaction_id = ? AND user_id = ?", 
+        (cat, id_t, user_id)
+    )
+    ajustar_totais(db, user_id, [id_t])
+    
+    # PASSO 2: Registra no audit log
+    # action = 'user_confirmed' (usuário confirmou manualmente)
+    # source = 'user' (veio do usuário, não da IA)
+    db.execute(
+        "INSERT INTO audit_log (transaction_id, user_id, action, new_category, source) VALUES (?, ?, 'user_confirmed', ?, 'user')", 
+        (id_t, user_id, cat)
+    )
+
+    # PASSO 3: Ensina o classificador local (na mesma transação)
+    # Se já estava confirmada com outra categoria, "desaprende" a antiga
+    if t['status'] == 'confirmed':
+        treinar(db, user_id, [(t['description'], t['amount'], t['confirmed_category'])], peso=-1)
+    treinar(db, user_id, [(t['description'], t['amount'], cat)])
+    
+    # PASSO 4: Cria regra se usuário marcou checkbox
+    # criar_regra == 'on' = checkbox foi marcado
+    # palavra_chave = texto da regra (ex: "UBER")
+    if criar_regra == 'on' and palavra_chave:
+        # Verifica se esta regra já existe (para não duplicar)
+        existe = db.execute(SQL_REGRA_EXISTENTE, (user_id, palavra_chave)).fetchone()
         
-        # Mostra sucesso
-        flash("Transação confirmada com sucesso!", "success")
-    else:
-        # Transação não existe (erro raro)
-        flash("Transação não encontrada.", "error")
+        # Se não existe, cria
+        if not existe:
+            # Insere nova regra
+            # keyword = palavra a procurar
+            # category = categoria automática
+            db.execute(
+                "INSERT INTO rules (user_id, keyword, category) VALUES (?, ?, ?)", 
+                (user_id, palavra_chave, cat)
+            )
     
-    # Fecha conexão
-    db.close()
+    # Confirma mudanças
+    db.commit()
+
+    # Regra nova: o autômato compilado do usuário ficou velho
+    if criar_regra == 'on' and palavra_chave:
+        invalidar_cache_regras(user_id)
+    
+    # Mostra sucesso
+    flash("Transação confirmada com sucesso!", "success")
     
     # Volta ao dashboard
     return redirect(url_for('dashboard'))
@@ -387,18 +463,33 @@ def editar():
     
     # Abre banco
     db = conectar_bd()
+
+    # Estado anterior (para o treino do classificador local)
+    # Id inexistente ou de outro usuário: nada é alterado
+    t = db.execute(SQL_TRANSACAO_POR_ID, (id_t, user_id)).fetchone()
+    if not t:
+        abort(404)
     
     # Atualiza categoria e marca como confirmada
+    # (o resumo por categoria tira o estado antigo e soma o novo)
+    ajustar_totais(db, user_id, [id_t], peso=-1)
     db.execute(
-        "UPDATE transactions SET confirmed_category = ?, status = 'confirmed' WHERE transaction_id = ?", 
-        (nova_cat, id_t)
+        "UPDATE transactions SET confirmed_category = ?, status = 'confirmed' WHERE transaction_id = ? AND user_id = ?", 
+        (nova_cat, id_t, user_id)
     )
+    ajustar_totais(db, user_id, [id_t])
     
     # Registra no audit log
     db.execute(
         "INSERT INTO audit_log (transaction_id, user_id, action, new_category, source) VALUES (?, ?, 'user_edited', ?, 'user')", 
         (id_t, user_id, nova_cat)
     )
+
+    # Ensina o classificador local (na mesma transação)
+    # Se já estava confirmada com outra categoria, "desaprende" a antiga
+    if t['status'] == 'confirmed':
+        treinar(db, user_id, [(t['description'], t['amount'], t['confirmed_category'])], peso=-1)
+    treinar(db, user_id, [(t['description'], t['amount'], nova_cat)])
     
     # Cria regra se marcou checkbox
     if criar_regra == 'on' and palavra_chave:
@@ -409,7 +500,10 @@ def editar():
     
     # Confirma
     db.commit()
-    db.close()
+
+    # Regra nova: o autômato compilado do usuário ficou velho
+    if criar_regra == 'on' and palavra_chave:
+        invalidar_cache_regras(user_id)
     
     # Mostra mensagem
     flash("Categoria editada com sucesso!", "success")
@@ -435,6 +529,8 @@ def excluir():
     
     # PASSO 1: Deleta transação
     # WHERE user_id = ? garante que só pode deletar suas próprias transações
+    # (antes, tira do resumo por categoria o que ela contava)
+    ajustar_totais(db, user_id, [id_t], peso=-1)
     db.execute(
         "DELETE FROM transactions WHERE transaction_id = ? AND user_id = ?", 
         (id_t, user_id)
@@ -450,7 +546,6 @@ def excluir():
     
     # Confirma
     db.commit()
-    db.close()
     
     # Mostra mensagem
     flash("Transação excluída com sucesso.", "info")
@@ -458,6 +553,83 @@ def excluir():
     # Volta ao dashboard
     return redirect(url_for('dashboard'))
 
+# ========== ROTA FEED DE MUDANÇAS (JSON) ==========
+@app.route('/dashboard/mudancas')
+def mudancas_dashboard():
+    """
+    Transações alteradas depois do cursor, em JSON.
+    Uso: /dashboard/mudancas?desde=<id do último evento>
+    O dashboard consulta de tempos em tempos e atualiza só as linhas alteradas.
+    """
+    
+    # Proteção (JSON: sem redirect para a tela de login)
+    if 'user_id' not in session:
+        return jsonify({'erro': 'não autenticado'}), 401
+    
+    desde = request.args.get('desde', type=int)
+    if desde is None:
+        return jsonify({'erro': 'informe o cursor (desde)'}), 400
+    
+    # Abre banco
+    db = conectar_bd()
+    
+    return jsonify(buscar_mudancas(db, session['user_id'], desde))
+
+# ========== ROTA PROGRESSO (SERVER-SENT EVENTS) ==========
+# Sem evento por este tempo, manda um comentário (mantém a conexão viva)
+INTERVALO_HEARTBEAT_S = 15
+
+# Se a conexão cair, o navegador reconecta sozinho depois deste tempo
+RECONEXAO_SSE_MS = 3000
+
+
+def _evento_sse(evento):
+    """Formata um evento no protocolo SSE ("id:" + "data:" + linha em branco)."""
+    return f"id: {evento['seq']}\ndata: {json.dumps(evento, ensure_ascii=False)}\n\n"
+
+
+@app.route('/progresso')
+def progresso():
+    """
+    Progresso da classificação do usuário, empurrado pelo servidor (SSE).
+    Uso no navegador: new EventSource('/progresso')
+    Cada evento é um JSON (ver progress.AcompanhamentoJob).
+    """
+    
+    # Proteção (stream: sem redirect para a tela de login)
+    if 'user_id' not in session:
+        return jsonify({'erro': 'não autenticado'}), 401
+    
+    # Lido aqui: o gerador roda depois, fora do contexto da requisição
+    user_id = session['user_id']
+    
+    def gerar():
+        fila = PROGRESSO.assinar(user_id)
+        try:
+            # Primeiro pedaço na hora: os cabeçalhos só saem com ele
+            yield f"retry: {RECONEXAO_SSE_MS}\n\n"
+            # Quem chega no meio do job recebe logo o estado atual
+            ultimo = PROGRESSO.ultimo(user_id)
+            if ultimo:
+                yield _evento_sse(ultimo)
+            while True:
+                try:
+                    evento = fila.get(timeout=INTERVALO_HEARTBEAT_S)
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                yield _evento_sse(evento)
+        finally:
+            # Navegador fechou a aba / conexão caiu
+            PROGRESSO.cancelar(user_id, fila)
+    
+    return Response(gerar(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Proxy (nginx) não pode segurar os eventos em buffer
+        'X-Accel-Buffering': 'no'
+    })
+
+
 # ========== ROTA AÇÃO EM LOTE ==========
 @app.route('/acao_lote', methods=['POST'])
 def acao_lote():
@@ -469,55 +641,44 @@ def acao_lote():
     
     # Pega dados
     # request.form.getlist() = pega VÁRIOS valores com mesmo name
-    # Exemplo: checkboxes marcadas
-    ids = request.form.getlist('transacao_ids')
+    # Exemplo: checkboxes marcadas (inválidos e repetidos são descartados)
+    ids = ler_ids(request.form.getlist('transacao_ids'))
     
-    # Qual ação fazer? 'confirmar' ou 'excluir'
+    # Qual ação fazer? 'confirmar', 'excluir' ou 'confirmar_confianca'
     acao = request.form.get('acao_lote')
     user_id = session['user_id']
     
     # Abre banco
     db = conectar_bd()
-    
-    # Para CADA ID selecionado
-    for id_t in ids:
-        if acao == 'excluir':
-            # Deleta a transação
-            db.execute(
-                "DELETE FROM transactions WHERE transaction_id = ? AND user_id = ?", 
-                (id_t, user_id)
-            )
-        elif acao == 'confirmar':
-            # Busca transação com sua categoria sugerida
-            t = db.execute(
-                "SELECT description, suggested_category FROM transactions WHERE transaction_id = ?", 
-                (id_t,)
-            ).fetchone()
-            
-            # Se transação existe
-            if t:
-                # Usa categoria sugerida (pela regra ou IA)
-                # Se não tiver sugestão, usa 'Outros'
-                cat_final = t['suggested_category'] or 'Outros'
-                
-                # Atualiza como confirmada
-                db.execute(
-                    "UPDATE transactions SET confirmed_category = ?, status = 'confirmed' WHERE transaction_id = ?", 
-                    (cat_final, id_t)
-                )
-                
-                # Registra no audit log
-                db.execute(
-                    "INSERT INTO audit_log (transaction_id, user_id, action, new_category, source) VALUES (?, ?, 'batch_confirmed', ?, 'user')", 
-                    (id_t, user_id, cat_final)
-                )
+
+    # Cada ação é um punhado de comandos por conjunto (não um por transação)
+    # e já cuida de auditoria, resumo por categoria e treino local
+    if acao == 'excluir':
+        qtd = excluir_lote(db, user_id, ids)
+        mensagem = f"{qtd} transação(ões) excluída(s)."
+    elif acao == 'confirmar':
+        qtd = confirmar_lote(db, user_id, ids)
+        mensagem = f"{qtd} transação(ões) confirmada(s)."
+    elif acao == 'confirmar_confianca':
+        # Confirma TODAS as pendentes acima da confiança (sem mandar ids)
+        try:
+            confianca_minima = float(request.form.get('confianca_minima', '').replace(',', '.'))
+        except ValueError:
+            confianca_minima = None
+        if confianca_minima is None or not 0 <= confianca_minima <= 100:
+            flash("Confiança mínima inválida (use de 0 a 100).", "error")
+            return redirect(url_for('dashboard'))
+        qtd = confirmar_acima_da_confianca(db, user_id, confianca_minima)
+        mensagem = f"{qtd} pendente(s) com confiança ≥ {confianca_minima:g}% confirmada(s)."
+    else:
+        flash("Ação em lote desconhecida.", "error")
+        return redirect(url_for('dashboard'))
     
     # Confirma mudanças
     db.commit()
-    db.close()
     
     # Mostra sucesso
-    flash(f"Ação em lote aplicada!", "success")
+    flash(mensagem, "success")
     
     # Volta ao dashboard
     return redirect(url_for('dashboard'))
@@ -578,7 +739,6 @@ def adicionar_transacao():
     
     # Confirma mudanças
     db.commit()
-    db.close()
     
     # Mostra sucesso
     flash("Transação adicionada manualmente.", "success")
@@ -602,63 +762,45 @@ def categorias():
     # Abre banco
     db = conectar_bd()
     
-    # Busca TODAS as categorias (confirmadas e sugeridas)
-    # UNION = combina dois SELECT
-    # DISTINCT = remove duplicatas
-    categorias = db.execute('''
-        SELECT DISTINCT confirmed_category as cat FROM transactions 
-        WHERE user_id = ? AND confirmed_category IS NOT NULL
-        UNION
-        SELECT DISTINCT suggested_category FROM transactions 
-        WHERE user_id = ? AND suggested_category IS NOT NULL
-    ''', (user_id, user_id)).fetchall()
-    
-    # Lista para armazenar dados formatados de cada categoria
-    dados_categorias = []
-    
-    # Para CADA categoria encontrada
-    for cat in categorias:
-        # Extrai nome da categoria
-        nome = cat['cat']
-        
-        # Pula se estiver vazia
-        if not nome:
-            continue
-        
-        # Busca TODAS as transações desta categoria
-        # confirmed_category = confirmas do usuário
-        # suggested_category = sugestões da IA/regras
-        trans = db.execute('''
-            SELECT * FROM transactions 
-            WHERE user_id = ? AND (confirmed_category = ? OR suggested_category = ?)
-            ORDER BY date DESC
-        ''', (user_id, nome, nome)).fetchall()
-        
-        # Calcula TOTAL de gastos desta categoria
-        # sum() = soma
-        # abs(t['amount']) = valor absoluto (remove -)
-        # if t['amount'] < 0 = apenas gastos (negativos)
-        # Não conta receitas (positivas)
-        total = sum(abs(t['amount']) for t in trans if t['amount'] < 0)
-        
-        # Adiciona dados desta categoria à lista
-        dados_categorias.append({
-            'nome': nome,  # Nome da categoria
-            'transacoes': trans,  # Lista de transações
-            'total': total,  # Total gasto
-            'quantidade': len(trans)  # Quantas transações
-        })
-    
-    # Fecha conexão
-    db.close()
+    # UMA consulta: por categoria, total de despesas, quantidade e
+    # só as transações mais recentes (o resto vem sob demanda, ver abaixo)
+    dados_categorias = resumo_categorias(db, user_id)
     
     # Retorna template com dados
-    return render_template('categorias.html', categorias=dados_categorias)
+    return render_template('categories.html', categorias=dados_categorias)
+
+
+# ========== ROTA LISTA DE UMA CATEGORIA (JSON) ==========
+@app.route('/categorias/transacoes')
+def transacoes_categoria():
+    """
+    Próxima página das transações de uma categoria, em JSON.
+    Uso: /categorias/transacoes?categoria=Transporte&apos=<cursor>
+    """
+    
+    # Proteção (JSON: sem redirect para a tela de login)
+    if 'user_id' not in session:
+        return jsonify({'erro': 'não autenticado'}), 401
+    
+    categoria = request.args.get('categoria')
+    if not categoria:
+        return jsonify({'erro': 'informe a categoria'}), 400
+    
+    # Abre banco
+    db = conectar_bd()
+    
+    transacoes, proximo_cursor = buscar_transacoes_categoria(
+        db, session['user_id'], categoria, cursor=request.args.get('apos')
+    )
+    
+    return jsonify({'transacoes': transacoes, 'proximo_cursor': proximo_cursor})
 
 
 # ========== INICIALIZA E EXECUTA ==========
 # Este bloco roda se arquivo for executado diretamente
 # if __name__ == "__main__" = true apenas se executado direto (não importado)
 if __name__ == '__main__':
+    # Migrações e workers antes de aceitar requisições
+    iniciar_servicos()
     # debug=True = modo debug (recarrega automaticamente, mostra erros det alhe)
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,174 @@
+# ========== AÇÕES EM LOTE ==========
+# Confirmar / excluir várias transações de uma vez (rota /acao_lote).
+#
+# Tudo em comandos por CONJUNTO, nunca uma transação por vez:
+# - ids selecionados vão em pedaços de TAMANHO_LOTE_IDS num IN (...)
+#   (limite de parâmetros "?" do SQLite)
+# - auditoria gravada com INSERT ... SELECT das próprias linhas
+# - "confirmar acima da confiança X" nem recebe ids: é um WHERE só
+#
+# Toda consulta leva "user_id = ?": id de outro usuário é ignorado.
+# Nenhuma função faz commit: a rota grava tudo (transações, auditoria,
+# resumo por categoria e treino do classificador local) de uma vez.
+
+# ========== IMPORTS ==========
+# Resumo por categoria (mesmo tamanho de pedaço do IN)
+from category_totals import TAMANHO_LOTE_IDS, ajustar_totais
+
+# Treino do classificador local com o que foi confirmado
+from local_classifier import treinar
+
+
+# ========== CONSTANTES ==========
+# Categoria de quem é confirmado sem sugestão (como a confirmação manual)
+CATEGORIA_PADRAO = 'Outros'
+
+# Categoria que a confirmação em lote grava
+_NOVA_CATEGORIA = f"COALESCE(suggested_category, '{CATEGORIA_PADRAO}')"
+
+# Filtros das ações (os planos são conferidos por database.py --verificar-indices)
+# Selecionadas na tela, um pedaço de ids por vez
+FILTRO_SELECIONADAS = "user_id = ? AND transaction_id IN ({marcadores})"
+# Pendentes com sugestão de confiança >= X (percorre o índice user_id + status)
+FILTRO_PENDENTES_ACIMA = (
+    "user_id = ? AND status = 'pending' "
+    "AND suggested_category IS NOT NULL AND suggested_confidence >= ?"
+)
+
+# Linhas que uma confirmação vai mudar (exemplos de treino)
+SQL_A_CONFIRMAR = f'''
+    SELECT transaction_id, description, amount, status, confirmed_category,
+           {_NOVA_CATEGORIA} AS nova_categoria
+    FROM transactions WHERE {{filtro}}
+'''
+
+# Estado de UMA transação DO USUÁRIO antes de confirmar/editar (rotas de app2.py)
+# (id de outro usuário = não encontrada)
+SQL_TRANSACAO_POR_ID = (
+    "SELECT description, amount, status, confirmed_category FROM transactions "
+    "WHERE transaction_id = ? AND user_id = ?"
+)
+
+
+# ========== AUXILIARES ==========
+def ler_ids(valores):
+    """Ids do formulário (texto) como inteiros, sem repetidos e sem lixo."""
+    ids = []
+    for valor in valores:
+        try:
+            ids.append(int(valor))
+        except (TypeError, ValueError):
+            continue
+    return list(dict.fromkeys(ids))
+
+
+def _pedacos(ids):
+    """Divide os ids em pedaços: [(pedaço, "?,?,...")]."""
+    for inicio in range(0, len(ids), TAMANHO_LOTE_IDS):
+        pedaco = ids[inicio:inicio + TAMANHO_LOTE_IDS]
+        yield pedaco, ",".join("?" * len(pedaco))
+
+
+def _comecar_escrita(con):
+    """
+    Trava de escrita ANTES da primeira leitura (BEGIN IMMEDIATE). Sem ela
+    o sqlite3 só abre a transação no primeiro INSERT/UPDATE: um worker
+    poderia gravar sugestões entre o SELECT e o UPDATE, e o UPDATE
+    confirmaria linhas que o resumo e o treino nunca viram.
+    Quem chamou faz o commit (como nas outras ações).
+    """
+    if not con.in_transaction:
+        con.execute("BEGIN IMMEDIATE")
+
+
+def _confirmar_onde(con, user_id, filtro, parametros, acao):
+    """
+    Confirma com a categoria sugerida (ou CATEGORIA_PADRAO) as linhas do
+    filtro: lê os exemplos de treino, grava a auditoria e atualiza, um
+    comando de cada. Retorna as linhas lidas (antes da mudança).
+    """
+    linhas = con.execute(SQL_A_CONFIRMAR.format(filtro=filtro), parametros).fetchall()
+    if not linhas:
+        return linhas
+
+    # Auditoria ANTES do UPDATE: o filtro ainda pega exatamente as mesmas linhas
+    con.execute(f'''
+        INSERT INTO audit_log (transaction_id, user_id, action, new_category, source)
+        SELECT transaction_id, user_id, '{acao}', {_NOVA_CATEGORIA}, 'user'
+        FROM transactions WHERE {filtro}
+    ''', parametros)
+    con.execute(f'''
+        UPDATE transactions
+        SET confirmed_category = {_NOVA_CATEGORIA}, status = 'confirmed'
+        WHERE {filtro}
+    ''', parametros)
+    return linhas
+
+
+def _treinar_confirmadas(con, user_id, linhas):
+    """Ensina o classificador local (e "desaprende" quem já estava confirmada com outra)."""
+    esquecidos = [
+        (t['description'], t['amount'], t['confirmed_category'])
+        for t in linhas if t['status'] == 'confirmed'
+    ]
+    treinar(con, user_id, esquecidos, peso=-1)
+    treinar(con, user_id, [(t['description'], t['amount'], t['nova_categoria']) for t in linhas])
+
+
+# ========== AÇÕES ==========
+def confirmar_lote(con, user_id, ids):
+    """
+    Confirma as transações `ids` do usuário com a categoria sugerida.
+    Retorna quantas foram confirmadas.
+    """
+    _comecar_escrita(con)
+    # Resumo: tira o que as selecionadas contam agora (volta somado no fim)
+    ajustar_totais(con, user_id, ids, peso=-1)
+
+    linhas = []
+    for pedaco, marcadores in _pedacos(ids):
+        linhas.extend(_confirmar_onde(
+            con, user_id, FILTRO_SELECIONADAS.format(marcadores=marcadores),
+            [user_id] + pedaco, 'batch_confirmed'
+        ))
+
+    ajustar_totais(con, user_id, ids)
+    _treinar_confirmadas(con, user_id, linhas)
+    return len(linhas)
+
+
+def excluir_lote(con, user_id, ids):
+    """Exclui as transações `ids` do usuário. Retorna quantas foram excluídas."""
+    _comecar_escrita(con)
+    ajustar_totais(con, user_id, ids, peso=-1)
+
+    excluidas = 0
+    for pedaco, marcadores in _pedacos(ids):
+        filtro = FILTRO_SELECIONADAS.format(marcadores=marcadores)
+        parametros = [user_id] + pedaco
+        # Auditoria só das que existem (o feed de mudanças tira a linha da tela)
+        con.execute(f'''
+            INSERT INTO audit_log (transaction_id, user_id, action, new_category, source)
+            SELECT transaction_id, user_id, 'batch_deleted', 'DELETED', 'user'
+            FROM transactions WHERE {filtro}
+        ''', parametros)
+        excluidas += con.execute(f"DELETE FROM transactions WHERE {filtro}", parametros).rowcount
+    return excluidas
+
+
+def confirmar_acima_da_confianca(con, user_id, confianca_minima):
+    """
+    Confirma TODAS as pendentes do usuário com sugestão de confiança
+    >= confianca_minima (0-100), sem o cliente mandar ids.
+    Retorna quantas foram confirmadas.
+    """
+    # Leitura e UPDATE na mesma transação de escrita: o UPDATE pega
+    # exatamente as linhas lidas
+    _comecar_escrita(con)
+    # Pendentes não contam no resumo: só soma depois
+    linhas = _confirmar_onde(
+        con, user_id, FILTRO_PENDENTES_ACIMA, (user_id, confianca_minima), 'batch_confirmed'
+    )
+    ajustar_totais(con, user_id, [t['transaction_id'] for t in linhas])
+    _treinar_confirmadas(con, user_id, linhas)
+    return len(linhas)
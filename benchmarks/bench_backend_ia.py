@@ -0,0 +1,110 @@
+# ========== BENCHMARK DO BACKEND DA IA (SEM REDE) ==========
+# Mede vazão e comportamento com cota estourada do caminho REAL da IA
+# (ai_agent → limitador → BackendGemini → SDK → HTTP), apontando o
+# cliente para o servidor falso local em vez da API do Google.
+#
+# Cada thread chama classificar_lote com descrições únicas (sem cache),
+# como os workers de classificação em segundo plano.
+#
+# Uso:
+#   python benchmarks/bench_backend_ia.py
+#   python benchmarks/bench_backend_ia.py --threads 4 --lotes 50 --latencia-ms 300 --taxa-429 0.1
+#   python benchmarks/bench_backend_ia.py --rpm 600 --limite-rpm 120
+
+# ========== IMPORTS ==========
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+
+# ========== EXECUÇÃO ==========
+def main():
+    parser = argparse.ArgumentParser(description="Vazão do backend da IA contra o servidor falso do Gemini")
+    parser.add_argument('--threads', type=int, default=2, help="chamadores simultâneos (como GIRO_WORKERS_IA)")
+    parser.add_argument('--lotes', type=int, default=20, help="lotes por thread")
+    parser.add_argument('--tamanho-lote', type=int, default=20)
+    parser.add_argument('--latencia-ms', type=float, default=200.0)
+    parser.add_argument('--variacao-ms', type=float, default=100.0)
+    parser.add_argument('--taxa-429', type=float, default=0.0)
+    parser.add_argument('--limite-rpm', type=int, help="cota simulada no servidor")
+    parser.add_argument('--retry-s', type=float, default=1.0)
+    parser.add_argument('--rpm', type=float, default=6000.0, help="GIRO_GEMINI_RPM do limitador do cliente")
+    args = parser.parse_args()
+
+    # O limitador lê a cota no import de ai_agent
+    os.environ['GIRO_GEMINI_RPM'] = str(args.rpm)
+
+    # Roda numa pasta temporária: o cache de classificações usa o banco
+    # da pasta atual e não pode responder pela IA
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, raiz)
+    os.chdir(tempfile.mkdtemp(prefix="giro_bench_ia_"))
+
+    import ai_agent
+    from database import inicializar_banco
+    from classifier_backend import BackendGemini
+    from servidor_falso_gemini import ServidorFalsoGemini
+
+    servidor = ServidorFalsoGemini(
+        latencia_ms=args.latencia_ms, variacao_ms=args.variacao_ms, taxa_429=args.taxa_429,
+        limite_rpm=args.limite_rpm, retry_s=args.retry_s
+    )
+    inicializar_banco()
+    base_url = servidor.iniciar()
+    backend = BackendGemini(api_key='falsa', base_url=base_url)
+    anterior = ai_agent.definir_backend(backend)
+
+    origens = Counter()
+    trava = threading.Lock()
+
+    def nome_unico(numero):
+        # Só letras: a impressão digital do cache ignora números, então
+        # "LOJA 1" e "LOJA 2" seriam o mesmo estabelecimento
+        letras = ''
+        while True:
+            numero, resto = divmod(numero, 26)
+            letras += chr(ord('A') + resto)
+            if not numero:
+                return letras
+
+    def chamador(n):
+        for lote in range(args.lotes):
+            primeiro = (n * args.lotes + lote) * args.tamanho_lote
+            transacoes = [
+                (f"LOJA BENCH {nome_unico(primeiro + i)}", -10.0 - i) for i in range(args.tamanho_lote)
+            ]
+            fontes = []
+            ai_agent.classificar_lote(transacoes, fontes)
+            with trava:
+                origens.update(fontes)
+
+    print(f"🤖 Servidor falso em {base_url} "
+          f"(latência {args.latencia_ms:.0f}±{args.variacao_ms:.0f} ms, 429 {args.taxa_429:.0%}, "
+          f"cota {args.limite_rpm or '-'} rpm)")
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=chamador, args=(n,)) for n in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+
+    ai_agent.definir_backend(anterior)
+    backend.fechar()
+    servidor.parar()
+
+    total = sum(origens.values())
+    estatisticas = servidor.estatisticas()
+    print(f"\n⏱️ {total} transações em {duracao:.2f}s → {total / duracao:.1f} transações/s")
+    print(f"   requisições no servidor: {estatisticas['requisicoes']} "
+          f"({estatisticas['requisicoes'] / duracao:.1f}/s), 429: {estatisticas['respostas_429']}")
+    print(f"   origem: {dict(origens)}")
+    print(f"   limitador: {ai_agent.LIMITADOR_GEMINI.estado()}")
+
+
+if __name__ == '__main__':
+    main()
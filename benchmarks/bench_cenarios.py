@@ -0,0 +1,299 @@
+# ========== BENCHMARK: CENÁRIOS DE PONTA A PONTA ==========
+# Mede os caminhos quentes do sistema em bancos de 1 mil, 100 mil e
+# 1 milhão de transações, sem rede (a IA é o classificador falso):
+#
+#   upload      → transactions.upload_to_csv_db (extrato sintético)
+#   regras      → processor.aplicar_regras_automaticas
+#   ia          → processor.processar_com_ia (classificador falso)
+#   dashboard   → GET /dashboard (primeira página)
+#   categorias  → GET /categorias
+#
+# Cada tamanho roda num banco novo, numa pasta temporária. O resultado
+# vai para um JSON; com --base, compara com uma execução anterior e
+# sai com código 1 se algum cenário ficou mais lento que a tolerância.
+#
+# Uso:
+#   python benchmarks/bench_cenarios.py
+#   python benchmarks/bench_cenarios.py --tamanhos 1000 100000 --saida base.json
+#   python benchmarks/bench_cenarios.py --tamanhos 1000 100000 --base base.json
+
+# ========== IMPORTS ==========
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import re
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import jinja2
+
+# Permite importar os módulos da raiz do projeto
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from gerador_extratos import ESTABELECIMENTOS_BASE, FORMATOS, gerar_extrato
+from classificador_falso import classificador_falso
+
+
+# ========== CONSTANTES ==========
+TAMANHOS_PADRAO = [1_000, 100_000, 1_000_000]
+
+# Páginas: mediana de algumas visitas (a primeira aquece o cache)
+VISITAS_POR_PAGINA = 5
+
+# Mais lento que isso (em relação à base) conta como regressão
+TOLERANCIA_PADRAO = 0.20
+
+# ... e por pelo menos isso: poucos milissegundos a mais são ruído
+DIFERENCA_MINIMA_S = 0.005
+
+CENARIOS = ('upload', 'regras', 'ia', 'dashboard', 'categorias')
+
+
+# ========== PREPARAÇÃO ==========
+def _carregar_template(nome):
+    caminho = os.path.join(RAIZ, nome)
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, encoding='utf-8') as f:
+        return f.read(), caminho, lambda: True
+
+
+def _importar_app():
+    """
+    Importa app2 sem iniciar_servicos(): sem workers, aqui cada etapa é
+    chamada direto, sem fila.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app2
+    app2.app.jinja_loader = jinja2.FunctionLoader(_carregar_template)
+    return app2
+
+
+def _banco_novo(pasta):
+    """Banco vazio (migrações aplicadas) em `pasta`, com um usuário. Retorna o user_id."""
+    from db import fechar_conexoes_da_thread, obter_conexao
+    from database import inicializar_banco
+
+    # O caminho do banco é relativo: trocar de pasta = trocar de banco
+    fechar_conexoes_da_thread()
+    os.chdir(pasta)
+    with contextlib.redirect_stdout(io.StringIO()):
+        inicializar_banco()
+    con = obter_conexao()
+    cur = con.execute(
+        "INSERT INTO users (nome, email, password_hash) VALUES ('Benchmark', 'bench@giro', 'x')"
+    )
+    con.commit()
+    return cur.lastrowid
+
+
+def _criar_regras(user_id, regras_extras):
+    """
+    Uma regra por estabelecimento base (primeira palavra do nome) e
+    `regras_extras` palavras que não batem com nada (autômato maior).
+    """
+    from db import obter_conexao
+    from rule_matcher import invalidar_cache_regras
+
+    # Só metade dos estabelecimentos vira regra: o resto sobra para a IA
+    regras = {}
+    for nome, categoria, _, _ in ESTABELECIMENTOS_BASE[::2]:
+        regras.setdefault(re.split(r'[ *.]', nome)[0], categoria)
+    regras.update({f"XQZ{i:05d}": 'Outros' for i in range(regras_extras)})
+
+    con = obter_conexao()
+    con.executemany(
+        "INSERT INTO rules (user_id, keyword, category) VALUES (?, ?, ?)",
+        [(user_id, palavra, categoria) for palavra, categoria in regras.items()]
+    )
+    con.commit()
+    invalidar_cache_regras(user_id)
+    return len(regras)
+
+
+def _confirmar_parte(user_id, confianca_minima=90):
+    """Confirma as sugestões mais confiantes (dá dados ao gráfico e às categorias)."""
+    from batch_actions import confirmar_acima_da_confianca
+    from db import obter_conexao
+
+    con = obter_conexao()
+    quantidade = confirmar_acima_da_confianca(con, user_id, confianca_minima)
+    con.commit()
+    return quantidade
+
+
+# ========== MEDIÇÃO ==========
+def medir(funcao, *args, **kwargs):
+    """Roda uma vez, sem o print do código medido. Retorna (segundos, resultado)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        inicio = time.perf_counter()
+        resultado = funcao(*args, **kwargs)
+        return time.perf_counter() - inicio, resultado
+
+
+def medir_pagina(cliente, url, visitas=VISITAS_POR_PAGINA):
+    """Mediana (e mínimo) do tempo de resposta de uma página."""
+    tempos = []
+    for _ in range(visitas):
+        segundos, resposta = medir(cliente.get, url)
+        if resposta.status_code != 200:
+            raise RuntimeError(f"{url} respondeu {resposta.status_code}")
+        tempos.append(segundos)
+    return {'segundos': statistics.median(tempos), 'minimo': min(tempos), 'visitas': visitas}
+
+
+def rodar_tamanho(app2, linhas, args, pasta_base):
+    """Todos os cenários num banco novo de `linhas` transações. Retorna lista de resultados."""
+    from processor import aplicar_regras_automaticas, processar_com_ia
+    from transactions import upload_to_csv_db
+
+    pasta = tempfile.mkdtemp(prefix=f"{linhas}-", dir=pasta_base)
+    user_id = _banco_novo(pasta)
+    resultados = []
+
+    def registrar(cenario, segundos, **extras):
+        resultado = {'cenario': cenario, 'linhas': linhas, 'segundos': round(segundos, 4)}
+        if 'linhas_por_s' not in extras and cenario in ('upload', 'regras', 'ia'):
+            resultado['linhas_por_s'] = round(linhas / segundos) if segundos else None
+        resultado.update(extras)
+        resultados.append(resultado)
+        print(f"{linhas:>10} {cenario:<11} {segundos:>9.3f}s")
+
+    # Extrato sintético (fora da medição)
+    caminho = os.path.join(pasta, 'extrato.csv')
+    gerar_extrato(caminho, linhas, args.estabelecimentos, args.formato, semente=args.semente)
+
+    if 'upload' in args.cenarios:
+        segundos, (sucesso, msg) = medir(upload_to_csv_db, caminho, user_id)
+        if not sucesso:
+            raise RuntimeError(f"upload falhou: {msg}")
+        registrar('upload', segundos, bytes=os.path.getsize(caminho))
+    else:
+        with contextlib.redirect_stdout(io.StringIO()):
+            upload_to_csv_db(caminho, user_id)
+
+    _criar_regras(user_id, args.regras_extras)
+    segundos, relatorio = medir(aplicar_regras_automaticas, user_id)
+    if 'regras' in args.cenarios:
+        registrar('regras', segundos, aplicadas=relatorio['aplicadas'], trava_ms=round(relatorio['trava_ms'], 1))
+
+    with classificador_falso(args.latencia_ia) as falso:
+        segundos, relatorio = medir(processar_com_ia, user_id)
+    if 'ia' in args.cenarios:
+        registrar('ia', segundos, grupos=relatorio['grupos'], chamadas_ia=falso.chamadas,
+                  linhas_por_s=round(relatorio['linhas'] / segundos) if segundos else None)
+
+    _confirmar_parte(user_id)
+
+    cliente = app2.app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao['user_id'] = user_id
+    for cenario, url in (('dashboard', '/dashboard'), ('categorias', '/categorias')):
+        if cenario in args.cenarios:
+            pagina = medir_pagina(cliente, url)
+            registrar(cenario, pagina.pop('segundos'), **pagina)
+
+    from db import fechar_conexoes_da_thread
+    fechar_conexoes_da_thread()
+    os.chdir(pasta_base)
+    if not args.manter:
+        shutil.rmtree(pasta, ignore_errors=True)
+    return resultados
+
+
+# ========== COMPARAÇÃO COM A BASE ==========
+def comparar(resultados, base, tolerancia):
+    """
+    Imprime a variação de cada cenário em relação à base.
+    Retorna a lista de regressões (mais lento que 1 + tolerancia e por
+    mais de DIFERENCA_MINIMA_S).
+    """
+    anteriores = {(r['cenario'], r['linhas']): r['segundos'] for r in base['resultados']}
+    regressoes = []
+    print(f"\n{'linhas':>10} {'cenário':<11} {'base (s)':>9} {'agora (s)':>10} {'variação':>9}")
+    for r in resultados:
+        anterior = anteriores.get((r['cenario'], r['linhas']))
+        if not anterior:
+            continue
+        variacao = r['segundos'] / anterior - 1
+        marca = ''
+        if variacao > tolerancia and r['segundos'] - anterior > DIFERENCA_MINIMA_S:
+            marca = ' ⚠️'
+            regressoes.append(r)
+        print(f"{r['linhas']:>10} {r['cenario']:<11} {anterior:>9.3f} {r['segundos']:>10.3f} {variacao:>+8.0%}{marca}")
+    return regressoes
+
+
+# ========== EXECUÇÃO ==========
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de ponta a ponta (upload, regras, IA e páginas)")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS_PADRAO)
+    parser.add_argument('--cenarios', nargs='+', choices=CENARIOS, default=list(CENARIOS))
+    parser.add_argument('--estabelecimentos', type=int, default=2000)
+    parser.add_argument('--formato', choices=sorted(FORMATOS), default='itau')
+    parser.add_argument('--regras-extras', type=int, default=200,
+                        help="regras que não batem com nada (autômato do tamanho de um usuário real)")
+    parser.add_argument('--latencia-ia', type=float, default=0.0,
+                        help="segundos por chamada do classificador falso")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', help="JSON de resultados (padrão: benchmarks/resultados/<data>.json)")
+    parser.add_argument('--base', help="JSON de uma execução anterior para comparar")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO)
+    parser.add_argument('--manter', action='store_true', help="não apaga os bancos gerados")
+    args = parser.parse_args()
+
+    pasta_base = tempfile.mkdtemp(prefix='giro-bench-')
+    diretorio_original = os.getcwd()
+    os.chdir(pasta_base)
+    try:
+        app2 = _importar_app()
+        print(f"{'linhas':>10} {'cenário':<11} {'tempo':>10}")
+        resultados = []
+        for linhas in args.tamanhos:
+            resultados.extend(rodar_tamanho(app2, linhas, args, pasta_base))
+    finally:
+        os.chdir(diretorio_original)
+        if not args.manter:
+            shutil.rmtree(pasta_base, ignore_errors=True)
+
+    execucao = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'ambiente': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'plataforma': platform.platform(),
+            'processadores': os.cpu_count(),
+        },
+        'parametros': {k: v for k, v in vars(args).items() if k not in ('saida', 'base', 'manter')},
+        'resultados': resultados,
+    }
+
+    saida = args.saida or os.path.join(
+        RAIZ, 'benchmarks', 'resultados', datetime.now().strftime('%Y%m%d-%H%M%S') + '.json'
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as f:
+        json.dump(execucao, f, ensure_ascii=False, indent=2)
+    print(f"\n📄 Resultados em {saida}")
+
+    if args.base:
+        with open(args.base, encoding='utf-8') as f:
+            base = json.load(f)
+        regressoes = comparar(resultados, base, args.tolerancia)
+        if regressoes:
+            print(f"\n⚠️ {len(regressoes)} cenário(s) mais lento(s) que a base (+{args.tolerancia:.0%})")
+            sys.exit(1)
+        print("\n✅ Nenhuma regressão acima da tolerância")
+
+
+if __name__ == '__main__':
+    main()
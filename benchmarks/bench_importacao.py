@@ -0,0 +1,105 @@
+# ========== BENCHMARK: LIMPEZA DA IMPORTAÇÃO ==========
+# Compara o antigo .apply linha a linha (parse_brl + limpar_descricao)
+# com as versões em coluna (converter_valores_brl + limpar_descricoes)
+# de transactions.py, em linhas sintéticas.
+#
+# Uso:
+#   python benchmarks/bench_importacao.py
+#   python benchmarks/bench_importacao.py --linhas 200000
+
+# ========== IMPORTS ==========
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+# Permite importar os módulos da raiz do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transactions import converter_valores_brl, limpar_descricao, limpar_descricoes, parse_brl
+
+
+# ========== GERAÇÃO DE DADOS SINTÉTICOS ==========
+ESTABELECIMENTOS = ['IFOOD', 'UBER *TRIP', 'PADARIA JOÃO', 'PIX RECEBIDO', 'POSTO SHELL', 'NETFLIX.COM']
+SUFIXOS = [
+    '',
+    ' - CPF: 123.456.789-01',
+    ' 12.345.678/0001-99',
+    ' Agência: 0001 Conta: 12345-6',
+    ' • 111.222.333',
+]
+
+
+def _valor(rng):
+    v = rng.uniform(-5000, 5000)
+    formato = rng.randint(0, 3)
+    if formato == 0:
+        return f"R$ {v:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+    if formato == 1:
+        return f"{v:.2f}".replace('.', ',')
+    if formato == 2:
+        return f"{v:.2f}"
+    return str(int(v))
+
+
+def gerar_dados(qtd_linhas, semente=42):
+    """Gera DataFrame reproduzível com amount/description em texto (como vem do CSV)."""
+    rng = random.Random(semente)
+    valores = [_valor(rng) for _ in range(qtd_linhas)]
+    descricoes = [rng.choice(ESTABELECIMENTOS) + rng.choice(SUFIXOS) for _ in range(qtd_linhas)]
+    # Algumas linhas ruins: valor ilegível e descrição vazia
+    for i in range(0, qtd_linhas, 997):
+        valores[i] = 'N/D'
+        descricoes[i] = None
+    return pd.DataFrame({'amount': valores, 'description': descricoes}, dtype=object)
+
+
+# ========== AS DUAS IMPLEMENTAÇÕES ==========
+def _parse_ou_nan(valor):
+    try:
+        return parse_brl(valor)
+    except ValueError:
+        return math.nan
+
+
+def linha_a_linha(df):
+    """Implementação antiga: uma chamada Python por linha."""
+    return df['amount'].apply(_parse_ou_nan), df['description'].apply(limpar_descricao)
+
+
+def em_coluna(df):
+    """Implementação nova: operações .str na coluna inteira."""
+    return converter_valores_brl(df['amount']), limpar_descricoes(df['description'])
+
+
+# ========== EXECUÇÃO ==========
+def medir(funcao, df):
+    inicio = time.perf_counter()
+    resultado = funcao(df)
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da limpeza de valores e descrições no upload")
+    parser.add_argument('--linhas', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = gerar_dados(args.linhas)
+
+    t_antigo, (valores_a, descricoes_a) = medir(linha_a_linha, df)
+    t_novo, (valores_n, descricoes_n) = medir(em_coluna, df)
+
+    # As duas precisam dar o MESMO resultado
+    assert valores_a.round(6).equals(valores_n.round(6)), "valores divergentes"
+    assert descricoes_a.astype(object).equals(descricoes_n.astype(object)), "descrições divergentes"
+
+    print(f"{'linhas':>10} | {'linha a linha':>14} | {'em coluna':>10} | {'ganho':>6}")
+    print(f"{args.linhas:>10} | {t_antigo:>13.2f}s | {t_novo:>9.2f}s | {t_antigo / t_novo:>5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
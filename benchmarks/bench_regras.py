@@ -0,0 +1,88 @@
+# ========== BENCHMARK: REGRAS AUTOMÁTICAS ==========
+# Compara o antigo loop aninhado (transações × regras) com o
+# autômato Aho-Corasick de rule_matcher.py, variando a quantidade de regras.
+#
+# Uso:
+#   python benchmarks/bench_regras.py
+#   python benchmarks/bench_regras.py --linhas 20000 --regras 10 100 400 1000
+
+# ========== IMPORTS ==========
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+# Permite importar os módulos da raiz do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rule_matcher import AutomatoPalavrasChave
+
+
+# ========== GERAÇÃO DE DADOS SINTÉTICOS ==========
+def _palavra(rng, tamanho):
+    return ''.join(rng.choice(string.ascii_uppercase) for _ in range(tamanho))
+
+
+def gerar_dados(qtd_linhas, qtd_regras, semente=42):
+    """Gera (palavras-chave, descrições) reproduzíveis."""
+    rng = random.Random(semente)
+    palavras = [_palavra(rng, rng.randint(4, 10)) for _ in range(qtd_regras)]
+    descricoes = []
+    for _ in range(qtd_linhas):
+        partes = [_palavra(rng, rng.randint(3, 8)) for _ in range(rng.randint(2, 5))]
+        # ~30% das descrições contêm alguma palavra-chave
+        if palavras and rng.random() < 0.3:
+            partes.insert(rng.randint(0, len(partes)), rng.choice(palavras).lower())
+        descricoes.append(' '.join(partes))
+    return palavras, descricoes
+
+
+# ========== AS DUAS IMPLEMENTAÇÕES ==========
+def loop_aninhado(palavras, descricoes):
+    """Implementação antiga: primeira regra que bate vence."""
+    resultado = []
+    for d in descricoes:
+        achou = None
+        for i, p in enumerate(palavras):
+            if p.lower() in d.lower():
+                achou = i
+                break
+        resultado.append(achou)
+    return resultado
+
+
+def com_automato(palavras, descricoes):
+    """Nova implementação: compila uma vez e lê cada descrição uma vez."""
+    automato = AutomatoPalavrasChave(palavras)
+    return [automato.primeiro_indice(d) for d in descricoes]
+
+
+# ========== EXECUÇÃO ==========
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das regras automáticas")
+    parser.add_argument('--linhas', type=int, default=20000)
+    parser.add_argument('--regras', type=int, nargs='+', default=[10, 50, 100, 400, 1000])
+    args = parser.parse_args()
+
+    print(f"{'regras':>8} {'loop (s)':>10} {'autômato (s)':>13} {'ganho':>7}")
+    for qtd_regras in args.regras:
+        palavras, descricoes = gerar_dados(args.linhas, qtd_regras)
+
+        inicio = time.perf_counter()
+        esperado = loop_aninhado(palavras, descricoes)
+        t_loop = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        obtido = com_automato(palavras, descricoes)
+        t_automato = time.perf_counter() - inicio
+
+        # Garante que o comportamento "primeira regra vence" foi mantido
+        assert obtido == esperado, "Resultados divergentes!"
+
+        print(f"{qtd_regras:>8} {t_loop:>10.3f} {t_automato:>13.3f} {t_loop / t_automato:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
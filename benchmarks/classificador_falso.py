@@ -0,0 +1,89 @@
+# ========== CLASSIFICADOR FALSO (SEM REDE) ==========
+# Substitui a IA nos benchmarks: resposta determinística (a mesma
+# descrição sempre recebe a mesma categoria e confiança), sem chave de
+# API, sem limitador de cota e com latência simulada opcional.
+#
+# Uso:
+#   with classificador_falso(latencia_s=0.2) as falso:
+#       processar_com_ia(user_id)
+#   print(falso.chamadas, falso.transacoes)
+
+# ========== IMPORTS ==========
+import hashlib
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+# Permite importar os módulos da raiz do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ai_agent
+import processor
+from ai_agent import CATEGORIAS_BASE
+
+
+# Categorias possíveis para despesas (receita positiva vira "Receita")
+_CATEGORIAS_DESPESA = [c for c in CATEGORIAS_BASE if c != 'Receita']
+
+
+class ClassificadorFalso:
+    """
+    Mesma interface de classificar_transacao_com_ia e classificar_lote
+    (ai_agent.py). latencia_s = pausa por CHAMADA (um lote = uma chamada),
+    para simular a ida e volta da API.
+    """
+
+    def __init__(self, latencia_s=0.0):
+        self.latencia_s = latencia_s
+        self.chamadas = 0
+        self.transacoes = 0
+
+    def resposta(self, description, amount):
+        """Categoria e confiança derivadas do hash da descrição."""
+        resumo = hashlib.md5(str(description).encode('utf-8')).digest()
+        if amount > 0:
+            categoria = 'Receita'
+        else:
+            categoria = _CATEGORIAS_DESPESA[resumo[0] % len(_CATEGORIAS_DESPESA)]
+        return {
+            "category": categoria,
+            "confidence": float(50 + resumo[1] % 50),
+            "reason": "classificador falso (benchmark)"
+        }
+
+    def classificar_transacao_com_ia(self, description, amount):
+        self._chamar(1)
+        return True, self.resposta(description, amount)
+
+    def classificar_lote(self, transacoes, origens=None):
+        self._chamar(len(transacoes))
+        if origens is not None:
+            origens.extend(['ia'] * len(transacoes))
+        return [(True, self.resposta(d, a)) for d, a in transacoes]
+
+    def _chamar(self, quantidade):
+        self.chamadas += 1
+        self.transacoes += quantidade
+        if self.latencia_s:
+            time.sleep(self.latencia_s)
+
+
+@contextmanager
+def classificador_falso(latencia_s=0.0):
+    """
+    Troca a IA pelo ClassificadorFalso enquanto o bloco roda (em ai_agent
+    e onde processor.py importou classificar_lote) e desfaz no fim.
+    """
+    falso = ClassificadorFalso(latencia_s)
+    originais = (
+        ai_agent.classificar_transacao_com_ia, ai_agent.classificar_lote, processor.classificar_lote
+    )
+    ai_agent.classificar_transacao_com_ia = falso.classificar_transacao_com_ia
+    ai_agent.classificar_lote = falso.classificar_lote
+    processor.classificar_lote = falso.classificar_lote
+    try:
+        yield falso
+    finally:
+        (ai_agent.classificar_transacao_com_ia, ai_agent.classificar_lote,
+         processor.classificar_lote) = originais
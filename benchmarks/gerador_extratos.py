@@ -0,0 +1,189 @@
+# ========== GERADOR DE EXTRATOS SINTÉTICOS ==========
+# Gera CSVs parecidos com extratos de bancos brasileiros, para os
+# benchmarks: estabelecimentos que se repetem (poucos muito frequentes,
+# muitos raros), descrições com IDs, parcelas, datas e CPF no meio,
+# valores no formato de cada banco e linhas de título antes do cabeçalho.
+#
+# Reproduzível: a mesma semente gera o mesmo arquivo.
+#
+# Uso:
+#   python benchmarks/gerador_extratos.py extrato.csv
+#   python benchmarks/gerador_extratos.py extrato.csv --linhas 100000 --estabelecimentos 2000 --formato nubank
+
+# ========== IMPORTS ==========
+import argparse
+import io
+import random
+from datetime import date, timedelta
+
+
+# ========== FORMATOS DE BANCO ==========
+# sep, decimal, formato da data, encoding, cabeçalho, linhas de título
+# antes do cabeçalho, prefixo do valor e se usa separador de milhar
+FORMATOS = {
+    # Extrato de conta corrente exportado em Excel/CSV "brasileiro"
+    'itau': {
+        'sep': ';', 'decimal': ',', 'data': '%d/%m/%Y', 'encoding': 'cp1252',
+        'cabecalho': ['Data', 'Descrição', 'Valor'],
+        'preambulo': ['Extrato de Conta Corrente', 'Agência: 0001 Conta: 12345-6', ''],
+        'moeda': '', 'milhar': True,
+    },
+    # Fatura/extrato de banco digital: ISO e ponto decimal
+    'nubank': {
+        'sep': ',', 'decimal': '.', 'data': '%Y-%m-%d', 'encoding': 'utf-8',
+        'cabecalho': ['date', 'description', 'amount'],
+        'preambulo': [],
+        'moeda': '', 'milhar': False,
+    },
+    # Com BOM, "R$" no valor e descrição sem acento no cabeçalho
+    'bb': {
+        'sep': ';', 'decimal': ',', 'data': '%d/%m/%Y', 'encoding': 'utf-8-sig',
+        'cabecalho': ['Data', 'Descricao', 'Valor'],
+        'preambulo': [],
+        'moeda': 'R$ ', 'milhar': True,
+    },
+}
+
+# Estabelecimentos base: (nome, categoria "de verdade", faixa de valor, sinal)
+# Com mais estabelecimentos pedidos do que esta lista, os nomes ganham
+# um número de filial ("PADARIA PAO QUENTE 12")
+ESTABELECIMENTOS_BASE = [
+    ('UBER *TRIP', 'Transporte', (8, 60), -1),
+    ('99APP *CORRIDA', 'Transporte', (7, 45), -1),
+    ('POSTO IPIRANGA', 'Transporte', (50, 300), -1),
+    ('NETFLIX.COM', 'Assinaturas', (39.9, 55.9), -1),
+    ('SPOTIFY', 'Assinaturas', (21.9, 34.9), -1),
+    ('AMAZON PRIME', 'Assinaturas', (14.9, 19.9), -1),
+    ('IFOOD *PEDIDO', 'Alimentação', (25, 120), -1),
+    ('PADARIA PAO QUENTE', 'Alimentação', (5, 40), -1),
+    ('SUPERMERCADO EXTRA', 'Alimentação', (40, 600), -1),
+    ('RESTAURANTE SABOR', 'Alimentação', (30, 180), -1),
+    ('MERCADOLIVRE*VENDEDOR', 'Compras Online', (20, 900), -1),
+    ('SHOPEE *LOJA', 'Compras Online', (15, 250), -1),
+    ('AMAZON MARKETPLACE', 'Compras Online', (30, 1200), -1),
+    ('FARMACIA DROGASIL', 'Outros', (10, 200), -1),
+    ('PIX ENVIADO', 'Outros', (10, 1500), -1),
+    ('PIX RECEBIDO', 'Receita', (10, 3000), 1),
+    ('SALARIO EMPRESA', 'Receita', (2500, 12000), 1),
+]
+
+# Data final fixa: o arquivo não muda de um dia para o outro
+DATA_FINAL = date(2024, 12, 31)
+
+
+# ========== ESTABELECIMENTOS ==========
+def gerar_estabelecimentos(quantidade):
+    """
+    Lista de `quantidade` estabelecimentos (nome, categoria, faixa, sinal).
+    Os primeiros são os da lista base; os seguintes são filiais numeradas.
+    """
+    estabelecimentos = []
+    for i in range(quantidade):
+        nome, categoria, faixa, sinal = ESTABELECIMENTOS_BASE[i % len(ESTABELECIMENTOS_BASE)]
+        filial = i // len(ESTABELECIMENTOS_BASE)
+        if filial:
+            nome = f"{nome} {filial}"
+        estabelecimentos.append((nome, categoria, faixa, sinal))
+    return estabelecimentos
+
+
+def _id_aleatorio(rng):
+    return ''.join(rng.choice('ABCDEFGHJKLMNPQRSTUVWXYZ23456789') for _ in range(4))
+
+
+def _descricao(rng, nome, dia):
+    """Nome + o "ruído" que os bancos colocam (muda entre lançamentos)."""
+    sorteio = rng.random()
+    if sorteio < 0.25:
+        return f"{nome} {_id_aleatorio(rng)}"
+    if sorteio < 0.35:
+        return f"{nome} {dia:%d/%m}"
+    if sorteio < 0.45:
+        return f"{nome} PARC {rng.randint(1, 10):02d}/10"
+    if sorteio < 0.50 and nome.startswith('PIX'):
+        return f"{nome} - {rng.randint(100, 999)}.{rng.randint(100, 999)}.{rng.randint(100, 999)}-{rng.randint(10, 99)}"
+    return nome
+
+
+def _valor(valor, formato):
+    """Valor no formato do banco: "-1.234,56", "R$ 45,90", "-12.50"."""
+    if formato['milhar']:
+        texto = f"{valor:,.2f}"
+    else:
+        texto = f"{valor:.2f}"
+    if formato['decimal'] == ',':
+        texto = texto.replace(',', 'X').replace('.', ',').replace('X', '.')
+    if formato['moeda']:
+        sinal = '-' if texto.startswith('-') else ''
+        texto = f"{sinal}{formato['moeda']}{texto.lstrip('-')}"
+    return texto
+
+
+# ========== GERAÇÃO ==========
+def gerar_linhas(linhas, estabelecimentos=500, formato='itau', meses=12, semente=42):
+    """
+    Gerador de linhas de dados (listas [data, descrição, valor] já como
+    texto no formato do banco). Popularidade tipo Zipf: o estabelecimento
+    k aparece ~1/(k+1) vezes o primeiro, como num extrato de verdade.
+    """
+    config = FORMATOS[formato]
+    rng = random.Random(semente)
+    lista = gerar_estabelecimentos(estabelecimentos)
+    pesos = [1 / (k + 1) for k in range(len(lista))]
+    dias = meses * 30
+
+    # Sorteia em blocos (random.choices com pesos é caro chamado linha a linha)
+    restantes = linhas
+    while restantes > 0:
+        bloco = min(restantes, 10000)
+        for nome, _, (minimo, maximo), sinal in rng.choices(lista, weights=pesos, k=bloco):
+            dia = DATA_FINAL - timedelta(days=rng.randrange(dias))
+            valor = sinal * round(rng.uniform(minimo, maximo), 2)
+            yield [dia.strftime(config['data']), _descricao(rng, nome, dia), _valor(valor, config)]
+        restantes -= bloco
+
+
+def gerar_extrato(destino, linhas, estabelecimentos=500, formato='itau', meses=12, semente=42):
+    """
+    Escreve um extrato com `linhas` transações em `destino` (caminho ou
+    arquivo binário aberto), no encoding do banco. Retorna `linhas`.
+    """
+    config = FORMATOS[formato]
+    if hasattr(destino, 'write'):
+        arquivo, fechar = destino, False
+    else:
+        arquivo, fechar = open(destino, 'wb'), True
+
+    try:
+        texto = io.TextIOWrapper(arquivo, encoding=config['encoding'], newline='', write_through=True)
+        for linha in config['preambulo']:
+            texto.write(linha + '\r\n')
+        texto.write(config['sep'].join(config['cabecalho']) + '\r\n')
+        for campos in gerar_linhas(linhas, estabelecimentos, formato, meses, semente):
+            texto.write(config['sep'].join(campos) + '\r\n')
+        texto.flush()
+        # Solta o arquivo sem fechá-lo (quem passou um arquivo aberto continua usando)
+        texto.detach()
+    finally:
+        if fechar:
+            arquivo.close()
+    return linhas
+
+
+# ========== EXECUÇÃO ==========
+def main():
+    parser = argparse.ArgumentParser(description="Gera um extrato bancário sintético (CSV)")
+    parser.add_argument('saida')
+    parser.add_argument('--linhas', type=int, default=10000)
+    parser.add_argument('--estabelecimentos', type=int, default=500)
+    parser.add_argument('--formato', choices=sorted(FORMATOS), default='itau')
+    parser.add_argument('--meses', type=int, default=12)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    gerar_extrato(args.saida, args.linhas, args.estabelecimentos, args.formato, args.meses, args.semente)
+    print(f"{args.linhas} linhas ({args.formato}) em {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
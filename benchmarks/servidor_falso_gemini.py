@@ -0,0 +1,226 @@
+# ========== SERVIDOR FALSO DO GEMINI ==========
+# Servidor HTTP local que fala o mesmo formato da API do Gemini
+# (POST /v1beta/models/<modelo>:generateContent), para testar carga,
+# limitador e retries SEM rede e sem gastar cota.
+#
+# - Respostas determinísticas (as do classificador falso)
+# - Latência configurável (fixa + variação aleatória)
+# - 429 injetado: aleatório (--taxa-429) e/ou por cota de requisições
+#   por minuto (--limite-rpm), com "Please retry in Xs" como a API real
+#
+# Uso:
+#   python benchmarks/servidor_falso_gemini.py --porta 8089 --latencia-ms 300 --limite-rpm 60
+#   GIRO_GEMINI_BASE_URL=http://127.0.0.1:8089 GOOGLE_API_KEY=falsa python app2.py
+
+# ========== IMPORTS ==========
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from classificador_falso import ClassificadorFalso
+
+
+# ========== CONSTANTES ==========
+_RE_ROTA = re.compile(r'^/v1beta/models/([^/:]+):generateContent$')
+
+# Janela da cota simulada (como a cota por minuto da API)
+JANELA_COTA_S = 60.0
+
+
+# ========== SERVIDOR ==========
+class ServidorFalsoGemini:
+    """
+    Servidor falso numa thread própria.
+
+        servidor = ServidorFalsoGemini(latencia_ms=200, taxa_429=0.05)
+        base_url = servidor.iniciar()     # "http://127.0.0.1:<porta>"
+        ...
+        servidor.parar()
+
+    Contadores (thread-safe): requisicoes, respostas_429, transacoes.
+    """
+
+    def __init__(self, porta=0, latencia_ms=0.0, variacao_ms=0.0, taxa_429=0.0,
+                 limite_rpm=None, retry_s=1.0, semente=42):
+        self.porta = porta
+        self.latencia_ms = latencia_ms
+        self.variacao_ms = variacao_ms
+        self.taxa_429 = taxa_429
+        self.limite_rpm = limite_rpm
+        self.retry_s = retry_s
+        self.classificador = ClassificadorFalso()
+        self._rng = random.Random(semente)
+        self._trava = threading.Lock()
+        self._aceitas = deque()   # instantes das requisições aceitas (cota)
+        self.requisicoes = 0
+        self.respostas_429 = 0
+        self.transacoes = 0
+        self._http = None
+        self._thread = None
+
+    # ---------- ciclo de vida ----------
+    def iniciar(self):
+        """Sobe o servidor em segundo plano. Retorna a base_url."""
+        servidor = self
+
+        class Tratador(_TratadorGemini):
+            falso = servidor
+
+        self._http = ThreadingHTTPServer(('127.0.0.1', self.porta), Tratador)
+        self._http.daemon_threads = True
+        self.porta = self._http.server_address[1]
+        self._thread = threading.Thread(target=self._http.serve_forever, name="gemini-falso", daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.porta}"
+
+    def parar(self):
+        if self._http is not None:
+            self._http.shutdown()
+            self._http.server_close()
+            self._http = None
+
+    def estatisticas(self):
+        with self._trava:
+            return {
+                'requisicoes': self.requisicoes,
+                'respostas_429': self.respostas_429,
+                'transacoes': self.transacoes,
+            }
+
+    # ---------- decisões por requisição ----------
+    def _decidir_429(self):
+        """None = pode responder; senão, segundos sugeridos para tentar de novo."""
+        with self._trava:
+            self.requisicoes += 1
+            agora = time.monotonic()
+            if self.taxa_429 and self._rng.random() < self.taxa_429:
+                self.respostas_429 += 1
+                return self.retry_s
+            if self.limite_rpm:
+                while self._aceitas and agora - self._aceitas[0] >= JANELA_COTA_S:
+                    self._aceitas.popleft()
+                if len(self._aceitas) >= self.limite_rpm:
+                    self.respostas_429 += 1
+                    return max(0.1, JANELA_COTA_S - (agora - self._aceitas[0]))
+                self._aceitas.append(agora)
+            return None
+
+    def _latencia_s(self):
+        with self._trava:
+            variacao = self._rng.uniform(0, self.variacao_ms) if self.variacao_ms else 0.0
+        return (self.latencia_ms + variacao) / 1000
+
+    def responder(self, entrada):
+        """Texto da resposta para a entrada JSON montada por ai_agent."""
+        dados = json.loads(entrada)
+        if 'transactions' in dados:
+            itens = dados['transactions']
+            resposta = [
+                dict(self.classificador.resposta(t['description'], t['amount']), id=t['id'])
+                for t in itens
+            ]
+        else:
+            itens = [dados]
+            resposta = self.classificador.resposta(dados['description'], dados['amount'])
+        with self._trava:
+            self.transacoes += len(itens)
+        return json.dumps(resposta, ensure_ascii=False)
+
+
+class _TratadorGemini(BaseHTTPRequestHandler):
+    """Uma requisição HTTP (cada uma na sua thread)."""
+
+    falso = None            # ServidorFalsoGemini (definido em iniciar())
+    protocol_version = "HTTP/1.1"   # conexões reaproveitadas, como na API real
+
+    def do_POST(self):
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        corpo = self.rfile.read(tamanho)
+
+        if not _RE_ROTA.match(self.path.split('?', 1)[0]):
+            return self._enviar(404, _erro(404, "Rota não existe no servidor falso.", "NOT_FOUND"))
+
+        time.sleep(self.falso._latencia_s())
+
+        retry_s = self.falso._decidir_429()
+        if retry_s is not None:
+            return self._enviar(429, _erro(
+                429,
+                f"Resource has been exhausted (e.g. check quota). Please retry in {retry_s:.1f}s.",
+                "RESOURCE_EXHAUSTED"
+            ))
+
+        try:
+            requisicao = json.loads(corpo)
+            entrada = requisicao['contents'][-1]['parts'][0]['text']
+            texto = self.falso.responder(entrada)
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            return self._enviar(400, _erro(400, f"Requisição inválida: {e}", "INVALID_ARGUMENT"))
+
+        self._enviar(200, {
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"text": texto}]},
+                "finishReason": "STOP",
+                "index": 0
+            }],
+            "usageMetadata": {
+                "promptTokenCount": len(corpo) // 4,
+                "candidatesTokenCount": len(texto) // 4,
+                "totalTokenCount": (len(corpo) + len(texto)) // 4
+            },
+            "modelVersion": _RE_ROTA.match(self.path.split('?', 1)[0]).group(1)
+        })
+
+    def _enviar(self, status, dados):
+        corpo = json.dumps(dados, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        # Sem uma linha de log por requisição (atrapalha a medição)
+        pass
+
+
+def _erro(codigo, mensagem, status):
+    """Corpo de erro no formato da API do Google."""
+    return {"error": {"code": codigo, "message": mensagem, "status": status}}
+
+
+# ========== EXECUÇÃO ==========
+def main():
+    parser = argparse.ArgumentParser(description="Servidor falso do Gemini (mesmo formato, sem rede)")
+    parser.add_argument('--porta', type=int, default=8089)
+    parser.add_argument('--latencia-ms', type=float, default=0.0)
+    parser.add_argument('--variacao-ms', type=float, default=0.0)
+    parser.add_argument('--taxa-429', type=float, default=0.0, help="fração das requisições que recebe 429")
+    parser.add_argument('--limite-rpm', type=int, help="cota simulada: requisições por minuto")
+    parser.add_argument('--retry-s', type=float, default=1.0, help="espera sugerida nos 429 aleatórios")
+    args = parser.parse_args()
+
+    servidor = ServidorFalsoGemini(
+        args.porta, args.latencia_ms, args.variacao_ms, args.taxa_429, args.limite_rpm, args.retry_s
+    )
+    print(f"🤖 Servidor falso do Gemini em {servidor.iniciar()}")
+    print(f"   GIRO_GEMINI_BASE_URL={servidor.base_url} GOOGLE_API_KEY=falsa python app2.py")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"   {servidor.estatisticas()}")
+    except KeyboardInterrupt:
+        servidor.parar()
+
+
+if __name__ == '__main__':
+    main()
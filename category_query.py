@@ -0,0 +1,139 @@
+# ========== CONSULTAS DA PÁGINA DE CATEGORIAS ==========
+# A página /categorias sai de UMA consulta agrupada: totais, quantidades
+# e as últimas ULTIMAS_POR_CATEGORIA transações de cada categoria. O
+# resto da lista de uma categoria vem sob demanda, página a página,
+# pelo endpoint JSON (buscar_transacoes_categoria).
+#
+# Categoria "efetiva" de uma transação: a confirmada ou, enquanto não
+# tem, a sugerida (mesma regra do filtro do dashboard). A expressão é
+# indexada (idx_transactions_user_categoria_efetiva) e precisa ser
+# escrita EXATAMENTE igual nas consultas para o índice ser usado.
+
+
+# ========== CONSTANTES ==========
+# Quantas transações de cada categoria já vêm na página
+ULTIMAS_POR_CATEGORIA = 5
+
+# Tamanho de cada página do endpoint JSON
+TAMANHO_PAGINA_CATEGORIA = 50
+MAX_TAMANHO_PAGINA_CATEGORIA = 500
+
+CATEGORIA_EFETIVA = "COALESCE(confirmed_category, suggested_category)"
+
+
+# ========== SQL ==========
+# (os planos são conferidos por database.py --verificar-indices)
+# Resumo: totais por categoria + as últimas de cada uma
+SQL_RESUMO_CATEGORIAS = f'''
+    WITH categorias AS (
+        SELECT {CATEGORIA_EFETIVA} AS categoria,
+               COUNT(*) AS quantidade,
+               SUM(CASE WHEN amount < 0 THEN -amount ELSE 0 END) AS total
+        FROM transactions
+        WHERE user_id = ? AND {CATEGORIA_EFETIVA} <> ''
+        GROUP BY {CATEGORIA_EFETIVA}
+    )
+    SELECT categorias.categoria, categorias.quantidade, categorias.total,
+           t.transaction_id, t.date, t.description, t.amount
+    FROM categorias
+    JOIN transactions t ON t.transaction_id IN (
+        SELECT transaction_id FROM transactions
+        WHERE user_id = ? AND {CATEGORIA_EFETIVA} = categorias.categoria
+        ORDER BY date DESC, transaction_id DESC
+        LIMIT ?
+    )
+    ORDER BY categorias.categoria, t.date DESC, t.transaction_id DESC
+'''
+
+# Página da lista de uma categoria ({where} = consulta_pagina_categoria)
+SQL_PAGINA_CATEGORIA = '''
+    SELECT transaction_id, date, description, amount, status
+    FROM transactions {where}
+    ORDER BY date DESC, transaction_id DESC
+    LIMIT ?
+'''
+
+
+# ========== RESUMO DA PÁGINA ==========
+def resumo_categorias(con, user_id, ultimas=ULTIMAS_POR_CATEGORIA):
+    """
+    Lista de categorias do usuário (A-Z), cada uma como dict:
+    - nome, quantidade, total (soma das despesas, em módulo)
+    - transacoes → as `ultimas` mais recentes
+    - cursor     → chave da última exibida, para continuar a lista
+                   (None se todas já estão em "transacoes")
+
+    Uma consulta só: o GROUP BY percorre o índice da categoria efetiva
+    (já em ordem, sem ordenar) e as últimas de cada categoria são uma
+    subconsulta com LIMIT, também direto do índice. Mais barato que
+    numerar TODAS as linhas com ROW_NUMBER() e descartar quase todas.
+    """
+    linhas = con.execute(SQL_RESUMO_CATEGORIAS, (user_id, user_id, ultimas)).fetchall()
+
+    # <> '': sem categoria (NULL) e nome vazio não viram card (como antes)
+    categorias = []
+    for linha in linhas:
+        # Linhas vêm agrupadas por categoria: nova categoria = novo card
+        if not categorias or categorias[-1]['nome'] != linha['categoria']:
+            categorias.append({
+                'nome': linha['categoria'],
+                'quantidade': linha['quantidade'],
+                'total': linha['total'],
+                'transacoes': [],
+                'cursor': None
+            })
+        categorias[-1]['transacoes'].append(linha)
+
+    # Cursor só quando sobrou algo para "ver mais"
+    for categoria in categorias:
+        if categoria['quantidade'] > len(categoria['transacoes']):
+            categoria['cursor'] = codificar_cursor(categoria['transacoes'][-1])
+
+    return categorias
+
+
+# ========== LISTA COMPLETA (SOB DEMANDA) ==========
+def codificar_cursor(linha):
+    """Cursor da lista de uma categoria: chave (date, id) da última linha."""
+    return f"{linha['date']}|{linha['transaction_id']}"
+
+
+def decodificar_cursor(cursor):
+    """(date, id) do cursor, ou None se ausente/inválido (= do começo)."""
+    if not cursor:
+        return None
+    try:
+        data, transaction_id = cursor.rsplit('|', 1)
+        return data, int(transaction_id)
+    except ValueError:
+        return None
+
+
+def consulta_pagina_categoria(user_id, categoria, cursor, limite):
+    """(SQL, parâmetros) de uma página da lista de uma categoria (limite+1 linhas)."""
+    where = f"WHERE user_id = ? AND {CATEGORIA_EFETIVA} = ?"
+    parametros = [user_id, categoria]
+
+    chave = decodificar_cursor(cursor)
+    if chave is not None:
+        where += " AND (date, transaction_id) < (?, ?)"
+        parametros.extend(chave)
+
+    return SQL_PAGINA_CATEGORIA.format(where=where), parametros + [limite + 1]
+
+
+def buscar_transacoes_categoria(con, user_id, categoria, cursor=None, limite=TAMANHO_PAGINA_CATEGORIA):
+    """
+    Próxima página da lista de uma categoria (mais recentes primeiro),
+    direto do índice da categoria efetiva.
+
+    Retorna (transações como dicts, cursor da próxima página ou None).
+    """
+    limite = max(1, min(int(limite), MAX_TAMANHO_PAGINA_CATEGORIA))
+    linhas = con.execute(*consulta_pagina_categoria(user_id, categoria, cursor, limite)).fetchall()
+
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo = codificar_cursor(linhas[-1])
+    return [dict(linha) for linha in linhas], proximo
@@ -0,0 +1,116 @@
+# ========== TOTAIS POR CATEGORIA ==========
+# Tabela-resumo category_totals: por usuário, categoria e mês, a soma
+# (em centavos, em módulo) e a quantidade de transações CONFIRMADAS.
+#
+# O gráfico do dashboard lê só esta tabela (uma linha por categoria/mês)
+# em vez de somar todas as transações a cada visita. Ela é mantida na
+# MESMA transação de cada confirmação, edição e exclusão:
+#
+#   ajustar_totais(con, user_id, ids, peso=-1)   # tira o que as linhas contavam
+#   UPDATE / DELETE nas transações
+#   ajustar_totais(con, user_id, ids, peso=1)    # soma o estado novo
+#
+# Se algo sair do lugar, reconstruir_totais() recalcula do zero
+# (python database.py --reconstruir-totais / --verificar-totais).
+
+
+# ========== CONSTANTES ==========
+# Quantos ids por comando (limite de parâmetros "?" do SQLite)
+TAMANHO_LOTE_IDS = 500
+
+# O que entra no resumo: só transações confirmadas com categoria
+# Mês = "AAAA-MM" (as datas ficam em ISO no banco)
+_SELECAO_CONFIRMADAS = '''
+    SELECT user_id, confirmed_category AS category, substr(date, 1, 7) AS month,
+           SUM(CAST(ROUND(ABS(amount) * 100) AS INTEGER)) AS total_cents, COUNT(*) AS count
+    FROM transactions
+    WHERE {filtro} AND status = 'confirmed' AND confirmed_category IS NOT NULL
+    GROUP BY user_id, confirmed_category, substr(date, 1, 7)
+'''
+
+# Soma (peso 1) ou subtrai (peso -1) um pedaço de ids do usuário
+# "WHERE true" no fim: o SQLite exige para não confundir o
+# ON CONFLICT do UPSERT com a sintaxe do SELECT
+SQL_AJUSTAR_TOTAIS = f'''
+    INSERT INTO category_totals (user_id, category, month, total_cents, count)
+    SELECT user_id, category, month, total_cents * ?, count * ?
+    FROM ({_SELECAO_CONFIRMADAS.format(filtro="user_id = ? AND transaction_id IN ({marcadores})")})
+    WHERE true
+    ON CONFLICT (user_id, category, month) DO UPDATE SET
+        total_cents = total_cents + excluded.total_cents,
+        count = count + excluded.count
+'''
+
+# Soma de cada categoria do usuário (dashboard)
+SQL_TOTAIS_POR_CATEGORIA = '''
+    SELECT category AS categoria, SUM(total_cents) / 100.0 AS total
+    FROM category_totals
+    WHERE user_id = ?
+    GROUP BY category
+    ORDER BY category
+'''
+
+
+# ========== MANUTENÇÃO INCREMENTAL ==========
+def ajustar_totais(con, user_id, ids, peso=1):
+    """
+    Soma (peso=1) ou subtrai (peso=-1) no resumo o que as transações
+    `ids` do usuário contam AGORA (só as confirmadas entram).
+
+    Chame com peso=-1 ANTES de alterar/excluir e com peso=1 DEPOIS.
+    NÃO faz commit: roda dentro da transação de quem chamou.
+    """
+    ids = list(ids)
+    for inicio in range(0, len(ids), TAMANHO_LOTE_IDS):
+        pedaco = ids[inicio:inicio + TAMANHO_LOTE_IDS]
+        marcadores = ",".join("?" * len(pedaco))
+        con.execute(SQL_AJUSTAR_TOTAIS.format(marcadores=marcadores), [peso, peso, user_id] + pedaco)
+
+    if peso < 0:
+        # Categoria/mês sem nenhuma transação: sai do resumo
+        con.execute("DELETE FROM category_totals WHERE user_id = ? AND count <= 0", (user_id,))
+
+
+# ========== RECONSTRUÇÃO E VERIFICAÇÃO ==========
+def reconstruir_totais(con, user_id=None):
+    """
+    Recalcula o resumo do zero a partir das transações (de um usuário
+    ou de todos). NÃO faz commit. Retorna quantas linhas o resumo tem.
+    """
+    if user_id is None:
+        con.execute("DELETE FROM category_totals")
+        filtro, parametros = "1 = 1", []
+    else:
+        con.execute("DELETE FROM category_totals WHERE user_id = ?", (user_id,))
+        filtro, parametros = "user_id = ?", [user_id]
+
+    cur = con.execute(
+        "INSERT INTO category_totals (user_id, category, month, total_cents, count) "
+        + _SELECAO_CONFIRMADAS.format(filtro=filtro),
+        parametros
+    )
+    return cur.rowcount
+
+
+def verificar_totais(con):
+    """
+    Compara o resumo com o recálculo a partir das transações.
+
+    Retorna lista de (user_id, category, month) divergentes
+    (faltando, sobrando ou com valores diferentes). Vazia = tudo certo.
+    """
+    recalculado = _SELECAO_CONFIRMADAS.format(filtro="1 = 1")
+    gravado = "SELECT user_id, category, month, total_cents, count FROM category_totals"
+    divergentes = con.execute(f'''
+        SELECT user_id, category, month FROM ({gravado} EXCEPT {recalculado})
+        UNION
+        SELECT user_id, category, month FROM ({recalculado} EXCEPT {gravado})
+        ORDER BY 1, 2, 3
+    ''').fetchall()
+    return [tuple(linha) for linha in divergentes]
+
+
+# ========== LEITURA ==========
+def totais_por_categoria(con, user_id):
+    """Soma (em reais) de cada categoria do usuário, todos os meses: [(categoria, total)]."""
+    return con.execute(SQL_TOTAIS_POR_CATEGORIA, (user_id,)).fetchall()
@@ -0,0 +1,191 @@
+# ========== IMPORTS ==========
+# Importa "hashlib" para gerar a chave (hash) de cada classificação
+import hashlib
+
+# Importa "json" para guardar o resultado como texto no SQLite
+import json
+
+# Importa SQLite3 (camada persistente do cache)
+import sqlite3 as lite
+
+# Importa "threading" para proteger o LRU e ter uma conexão por thread
+import threading
+
+# Importa "time" para calcular expiração (TTL)
+import time
+
+# Importa OrderedDict: dicionário que lembra a ordem de uso (base do LRU)
+from collections import OrderedDict
+
+# Importa a fábrica de conexões (db.py): mesmos PRAGMAs do resto do sistema
+from db import abrir_conexao
+
+
+# ========== CONSTANTES ==========
+# Origem do resultado guardado
+# "ia" = resposta real do modelo | "heuristica" = fallback local
+ORIGEM_IA = "ia"
+ORIGEM_HEURISTICA = "heuristica"
+
+# Tempo de vida padrão de cada origem (em segundos)
+# Resposta da IA vale 30 dias; fallback da heurística só 10 minutos,
+# para que um 429 passageiro não "congele" a resposta errada
+TTL_IA_PADRAO = 30 * 24 * 3600
+TTL_HEURISTICA_PADRAO = 10 * 60
+
+
+# ========== FUNÇÕES HELPER ==========
+def normalizar_descricao(description):
+    """Maiúsculas + espaços colapsados: "  Uber   trip" → "UBER TRIP"."""
+    return " ".join(str(description).upper().split())
+
+
+def versao_categorias(categorias):
+    """Hash curto do conjunto de categorias (muda se a lista mudar)."""
+    return hashlib.sha1("|".join(sorted(categorias)).encode()).hexdigest()[:8]
+
+
+def _sinal(amount):
+    """-1 (saída), 0 ou 1 (entrada)."""
+    return (amount > 0) - (amount < 0)
+
+
+# ========== CLASSE CACHE EM DUAS CAMADAS ==========
+class CacheClassificacoes:
+    """
+    Cache de classificações em duas camadas:
+
+    1. Memória: LRU com tamanho máximo (descarta o menos usado)
+    2. Disco: tabela SQLite "classification_cache" (sobrevive a
+       reinícios e é compartilhada entre processos/workers)
+
+    Chave = hash de (descrição normalizada, sinal do valor,
+    versão do conjunto de categorias, origem).
+    "normalizador" define como a descrição é normalizada
+    (padrão: normalizar_descricao).
+    Só respostas da IA vão para o disco; fallbacks da heurística
+    ficam apenas na memória, com TTL curto e chave separada.
+    """
+
+    def __init__(self, caminho_bd, categorias, capacidade=5000,
+                 ttl_ia=TTL_IA_PADRAO, ttl_heuristica=TTL_HEURISTICA_PADRAO,
+                 normalizador=normalizar_descricao):
+        self.caminho_bd = caminho_bd
+        self.normalizador = normalizador
+        self.versao = versao_categorias(categorias)
+        self.capacidade = capacidade
+        self.ttl = {ORIGEM_IA: ttl_ia, ORIGEM_HEURISTICA: ttl_heuristica}
+
+        # LRU: {chave: (expira_em, resultado)}
+        self._memoria = OrderedDict()
+        self._trava = threading.Lock()
+        self._local = threading.local()
+
+        # Contadores expostos em estatisticas()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ---------- camada de disco ----------
+    def _conexao(self):
+        """
+        Uma conexão SQLite por thread (sqlite3 não compartilha entre threads).
+
+        Separada da conexão da thread em db.obter_conexao(): o commit do
+        cache não pode confirmar junto a transação de quem chamou a IA.
+        A tabela vem das migrações (database.migrar).
+        """
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = abrir_conexao(self.caminho_bd)
+            self._local.con = con
+        return con
+
+    # ---------- chave ----------
+    def chave(self, description, amount, origem=ORIGEM_IA):
+        bruto = f"{self.normalizador(description)}|{_sinal(amount)}|{self.versao}|{origem}"
+        return hashlib.sha256(bruto.encode()).hexdigest()
+
+    # ---------- camada de memória ----------
+    def _guardar_memoria(self, chave, expira_em, resultado):
+        with self._trava:
+            self._memoria[chave] = (expira_em, resultado)
+            self._memoria.move_to_end(chave)
+            while len(self._memoria) > self.capacidade:
+                self._memoria.popitem(last=False)
+                self.evictions += 1
+
+    # ---------- API pública ----------
+    def obter(self, description, amount, origem=ORIGEM_IA):
+        """Retorna o resultado guardado (dict) ou None se não houver/expirou."""
+        chave = self.chave(description, amount, origem)
+        agora = time.time()
+
+        # CAMADA 1: memória
+        with self._trava:
+            item = self._memoria.get(chave)
+            if item is not None:
+                if item[0] > agora:
+                    self._memoria.move_to_end(chave)
+                    self.hits += 1
+                    return dict(item[1])
+                del self._memoria[chave]
+
+        # CAMADA 2: disco (só respostas da IA são persistidas)
+        if origem == ORIGEM_IA:
+            try:
+                linha = self._conexao().execute(
+                    "SELECT resultado, expira_em FROM classification_cache WHERE chave = ?",
+                    (chave,)
+                ).fetchone()
+            except lite.Error as e:
+                print(f"⚠️ Cache em disco indisponível: {e}")
+                linha = None
+            if linha and linha[1] > agora:
+                resultado = json.loads(linha[0])
+                # Promove para a memória
+                self._guardar_memoria(chave, linha[1], resultado)
+                with self._trava:
+                    self.hits += 1
+                return dict(resultado)
+
+        with self._trava:
+            self.misses += 1
+        return None
+
+    def guardar(self, description, amount, resultado, origem=ORIGEM_IA):
+        """Guarda o resultado com o TTL da sua origem."""
+        chave = self.chave(description, amount, origem)
+        expira_em = time.time() + self.ttl[origem]
+        self._guardar_memoria(chave, expira_em, dict(resultado))
+
+        if origem == ORIGEM_IA:
+            try:
+                con = self._conexao()
+                con.execute(
+                    "INSERT OR REPLACE INTO classification_cache (chave, resultado, expira_em) VALUES (?, ?, ?)",
+                    (chave, json.dumps(resultado, ensure_ascii=False), expira_em)
+                )
+                con.commit()
+            except lite.Error as e:
+                print(f"⚠️ Cache em disco indisponível: {e}")
+
+    def limpar_expirados(self):
+        """Remove do disco as entradas vencidas. Retorna quantas saíram."""
+        con = self._conexao()
+        cur = con.execute("DELETE FROM classification_cache WHERE expira_em <= ?", (time.time(),))
+        con.commit()
+        return cur.rowcount
+
+    def estatisticas(self):
+        """Contadores de hit/miss/eviction e ocupação da memória."""
+        with self._trava:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "taxa_acerto": round(self.hits / total, 3) if total else 0.0,
+                "tamanho_memoria": len(self._memoria),
+                "capacidade": self.capacidade,
+            }
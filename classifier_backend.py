@@ -0,0 +1,121 @@
+# ========== BACKENDS DA IA DE CLASSIFICAÇÃO ==========
+# Quem de fato responde os prompts montados em ai_agent.py.
+#
+# ai_agent cuida de cache, limitador, retries e heurísticas; o backend
+# só manda (instrução de sistema, entrada JSON) e devolve o texto da
+# resposta. Trocar o backend (ou o servidor para onde ele aponta) não
+# muda nada no resto do sistema:
+#
+#   BackendGemini()                                  → API do Google
+#   BackendGemini(base_url="http://127.0.0.1:8089")  → servidor falso local
+#                                                      (benchmarks/servidor_falso_gemini.py)
+
+# ========== IMPORTS ==========
+# Importa "os" para ler a chave e o modelo do ambiente
+import os
+
+# Importa "threading": o cliente é criado uma vez e dividido entre threads
+import threading
+
+# Importa ABC: backend sem gerar() falha ao ser criado, não na primeira chamada
+from abc import ABC, abstractmethod
+
+# Importa o SDK do Gemini (google-genai)
+from google import genai
+from google.genai import types
+
+
+# ========== CONSTANTES ==========
+# Modelo usado nas classificações
+MODELO_GEMINI = os.getenv("GIRO_GEMINI_MODELO", "gemini-1.5-flash-latest")
+
+# Tempo máximo de uma chamada (em milissegundos, como o SDK espera)
+TIMEOUT_GEMINI_MS = 60000
+
+
+# ========== INTERFACE ==========
+class BackendClassificador(ABC):
+    """
+    Interface de um backend da IA (herde e implemente gerar).
+
+    - gerar(instrucao, entrada) → texto da resposta (JSON)
+
+    Erros da API sobem como exceção. Cota estourada precisa trazer "429"
+    ou "RESOURCE_EXHAUSTED" na mensagem (e, se souber, "Please retry in
+    Xs"): é o que ai_agent usa para o limitador e as novas tentativas.
+
+    Uma instância é dividida por TODAS as threads: precisa ser thread-safe.
+    """
+
+    nome = "base"
+
+    @abstractmethod
+    def gerar(self, instrucao, entrada):
+        """Manda (instrução de sistema, entrada JSON) e devolve o texto da resposta."""
+
+
+# ========== GEMINI ==========
+class BackendGemini(BackendClassificador):
+    """
+    Gemini pelo SDK google-genai, com UM cliente de longa duração.
+
+    O cliente (conexões HTTP reaproveitadas) é criado na primeira chamada,
+    não no import: sem GOOGLE_API_KEY o sistema ainda sobe e usa as
+    heurísticas. A configuração de cada instrução de sistema também é
+    montada uma vez só.
+
+    base_url = outro servidor com a mesma API (ex.: o servidor falso local).
+    As novas tentativas ficam com ai_agent (o SDK não repete sozinho),
+    para o limitador aprender com cada 429.
+    """
+
+    nome = "gemini"
+
+    def __init__(self, api_key=None, modelo=MODELO_GEMINI, base_url=None, timeout_ms=TIMEOUT_GEMINI_MS):
+        self.api_key = api_key
+        self.modelo = modelo
+        self.base_url = base_url
+        self.timeout_ms = timeout_ms
+        self._trava = threading.Lock()
+        self._cliente = None
+        self._configuracoes = {}   # {instrução: GenerateContentConfig}
+
+    def _obter_cliente(self):
+        with self._trava:
+            if self._cliente is None:
+                opcoes = types.HttpOptions(
+                    base_url=self.base_url,
+                    timeout=self.timeout_ms,
+                    retry_options=types.HttpRetryOptions(attempts=1)
+                )
+                self._cliente = genai.Client(
+                    api_key=self.api_key or os.getenv("GOOGLE_API_KEY"),
+                    http_options=opcoes
+                )
+            return self._cliente
+
+    def _configuracao(self, instrucao):
+        with self._trava:
+            configuracao = self._configuracoes.get(instrucao)
+            if configuracao is None:
+                configuracao = self._configuracoes[instrucao] = types.GenerateContentConfig(
+                    system_instruction=instrucao,
+                    response_mime_type="application/json",
+                    temperature=0.2
+                )
+            return configuracao
+
+    def gerar(self, instrucao, entrada):
+        resposta = self._obter_cliente().models.generate_content(
+            model=self.modelo,
+            contents=entrada,
+            config=self._configuracao(instrucao)
+        )
+        return resposta.text
+
+    def fechar(self):
+        """Fecha as conexões do cliente (a próxima chamada abre de novo)."""
+        with self._trava:
+            cliente, self._cliente = self._cliente, None
+        if cliente is not None:
+            cliente.close()
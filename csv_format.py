@@ -0,0 +1,211 @@
+# ========== IMPORTS ==========
+# Importa "csv" para quebrar linhas respeitando aspas ("a;b";c)
+import csv
+
+# Importa "hashlib" para a impressão digital do formato do banco
+import hashlib
+
+# Importa "re" para reconhecer padrões de valores (1.234,56 x 1,234.56)
+import re
+
+# Importa "threading" para proteger o cache de formatos
+import threading
+
+# Importa OrderedDict: cache limitado (descarta o formato mais antigo)
+from collections import OrderedDict
+
+
+# ========== CONSTANTES ==========
+# Só os primeiros KB do arquivo são lidos para detectar o formato
+TAMANHO_AMOSTRA = 64 * 1024
+
+# Ordem de tentativa: utf-8-sig primeiro (mais restrito), latin-1 por último
+# (latin-1 aceita qualquer byte, então nunca falha)
+ENCODINGS = ['utf-8-sig', 'cp1252', 'latin-1']
+
+SEPARADORES = [';', ',', '\t']
+
+# Até quantas linhas de "lixo" (título, dados da conta) antes do cabeçalho
+MAX_LINHAS_PREAMBULO = 30
+
+# Quantas linhas de dados olhar para decidir o separador decimal
+LINHAS_PARA_DECIMAL = 200
+
+# Cria dicionário para renomear colunas (aceita várias formas)
+# Usuários podem digitar "Data" ou "data" ou "Descrição" ou "descricao"
+# (usado também por transactions.py)
+RENOMEAR_COLUNAS = {
+    'data': 'date',
+    'descrição': 'description',
+    'descricao': 'description',
+    'valor': 'amount'
+}
+COLUNAS_OBRIGATORIAS = {'date', 'description', 'amount'}
+
+# Padrões de valor: "1.234,56" / "12,5" (decimal vírgula) x "1,234.56" / "12.50" (decimal ponto)
+_RE_DECIMAL_VIRGULA = re.compile(r'^-?(\d{1,3}(\.\d{3})+|\d+),\d{1,2}$')
+_RE_DECIMAL_PONTO = re.compile(r'^-?(\d{1,3}(,\d{3})+|\d+)\.\d{1,2}$')
+
+
+# ========== LEITURA DA AMOSTRA ==========
+def ler_amostra(fonte):
+    """
+    Lê só os primeiros TAMANHO_AMOSTRA bytes (caminho ou arquivo aberto).
+    Arquivos abertos voltam para o início depois.
+    """
+    if hasattr(fonte, 'read'):
+        amostra = fonte.read(TAMANHO_AMOSTRA)
+        fonte.seek(0)
+    else:
+        with open(fonte, 'rb') as f:
+            amostra = f.read(TAMANHO_AMOSTRA)
+    if isinstance(amostra, str):
+        amostra = amostra.encode('utf-8')
+    return amostra
+
+
+def impressao_formato(amostra):
+    """
+    Impressão digital do formato de um banco: a primeira linha do
+    arquivo com dígitos trocados por "9" (datas e números de conta
+    mudam entre extratos; o layout não).
+    """
+    primeira = amostra.split(b'\n', 1)[0][:512]
+    return hashlib.sha1(re.sub(rb'\d', b'9', primeira.strip())).hexdigest()
+
+
+# ========== DETECÇÃO ==========
+def _decodificar(amostra):
+    """Tenta cada encoding; corta no último "\n" para não partir caracteres."""
+    corte = amostra.rfind(b'\n')
+    if corte > 0 and len(amostra) >= TAMANHO_AMOSTRA:
+        amostra = amostra[:corte]
+    for encoding in ENCODINGS:
+        try:
+            return encoding, amostra.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return None, None
+
+
+def _celulas(linha, sep):
+    return [c.strip().lower() for c in next(csv.reader([linha], delimiter=sep), [])]
+
+
+def _achar_cabecalho(linhas):
+    """Acha (índice da linha, separador) do cabeçalho com as colunas obrigatórias."""
+    for indice, linha in enumerate(linhas[:MAX_LINHAS_PREAMBULO]):
+        for sep in SEPARADORES:
+            nomes = {RENOMEAR_COLUNAS.get(c, c) for c in _celulas(linha, sep)}
+            if COLUNAS_OBRIGATORIAS.issubset(nomes):
+                return indice, sep
+    return None, None
+
+
+def _detectar_decimal(linhas_dados, sep, coluna_valor):
+    """Vota entre "," e "." olhando os valores da coluna de amount."""
+    votos_virgula = votos_ponto = 0
+    for linha in linhas_dados[:LINHAS_PARA_DECIMAL]:
+        celulas = next(csv.reader([linha], delimiter=sep), [])
+        if coluna_valor >= len(celulas):
+            continue
+        valor = celulas[coluna_valor].replace('R$', '').replace(' ', '').strip()
+        if _RE_DECIMAL_VIRGULA.match(valor):
+            votos_virgula += 1
+        elif _RE_DECIMAL_PONTO.match(valor):
+            votos_ponto += 1
+    # Empate / sem evidência: padrão brasileiro
+    return '.' if votos_ponto > votos_virgula else ','
+
+
+def detectar_formato(amostra):
+    """
+    Descobre o formato do arquivo olhando SÓ a amostra.
+
+    Retorna dict com:
+    - encoding        → 'utf-8-sig', 'cp1252' ou 'latin-1'
+    - sep             → ';', ',' ou '\\t'
+    - decimal         → ',' ou '.'
+    - linha_cabecalho → quantas linhas pular até o cabeçalho
+    Ou None se não achar um cabeçalho com date/description/amount.
+    """
+    encoding, texto = _decodificar(amostra)
+    if texto is None:
+        return None
+
+    linhas = texto.splitlines()
+    indice, sep = _achar_cabecalho(linhas)
+    if indice is None:
+        return None
+
+    nomes = [RENOMEAR_COLUNAS.get(c, c) for c in _celulas(linhas[indice], sep)]
+    decimal = _detectar_decimal(linhas[indice + 1:], sep, nomes.index('amount'))
+
+    return {
+        'encoding': encoding,
+        'sep': sep,
+        'decimal': decimal,
+        'linha_cabecalho': indice
+    }
+
+
+# ========== CACHE POR FORMATO DE BANCO ==========
+# {impressão do formato: formato detectado}
+# A impressão só olha o cabeçalho: dois bancos (ou duas exportações do
+# mesmo banco) podem ter o mesmo cabeçalho com encoding ou decimal
+# diferentes, então todo acerto é conferido com a amostra atual
+_CACHE_FORMATOS = OrderedDict()
+_TRAVA_CACHE = threading.Lock()
+MAX_FORMATOS_EM_CACHE = 256
+
+
+def _formato_confere(amostra, formato):
+    """
+    O formato do cache vale para esta amostra? Confere as partes que o
+    cabeçalho não garante: o encoding que a detecção escolheria, o
+    cabeçalho na mesma linha e com o mesmo separador, e o voto do
+    separador decimal. (Pula só a busca do cabeçalho.)
+    """
+    encoding, texto = _decodificar(amostra)
+    if encoding != formato['encoding']:
+        return False
+
+    linhas = texto.splitlines()
+    indice = formato['linha_cabecalho']
+    if indice >= len(linhas):
+        return False
+    nomes = [RENOMEAR_COLUNAS.get(c, c) for c in _celulas(linhas[indice], formato['sep'])]
+    if not COLUNAS_OBRIGATORIAS.issubset(nomes):
+        return False
+
+    decimal = _detectar_decimal(linhas[indice + 1:], formato['sep'], nomes.index('amount'))
+    return decimal == formato['decimal']
+
+
+def obter_formato(fonte):
+    """
+    Formato do arquivo, consultando o cache primeiro.
+
+    Uploads repetidos do mesmo banco pulam a busca do cabeçalho; o
+    formato do cache só é usado se conferir com a amostra atual
+    (encoding e decimal). Retorna (formato ou None, veio_do_cache).
+    """
+    amostra = ler_amostra(fonte)
+    chave = impressao_formato(amostra)
+
+    with _TRAVA_CACHE:
+        formato = _CACHE_FORMATOS.get(chave)
+        if formato is not None:
+            _CACHE_FORMATOS.move_to_end(chave)
+            formato = dict(formato)
+
+    if formato is not None and _formato_confere(amostra, formato):
+        return formato, True
+
+    formato = detectar_formato(amostra)
+    if formato is not None:
+        with _TRAVA_CACHE:
+            _CACHE_FORMATOS[chave] = dict(formato)
+            while len(_CACHE_FORMATOS) > MAX_FORMATOS_EM_CACHE:
+                _CACHE_FORMATOS.popitem(last=False)
+    return formato, False
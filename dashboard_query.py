@@ -0,0 +1,224 @@
+# ========== CONSULTAS DO DASHBOARD ==========
+# Página de transações com paginação por chave (keyset) e filtros no
+# servidor. Nada de carregar TODAS as transações do usuário: cada página
+# lê só TAMANHO_PAGINA linhas direto do índice
+# idx_transactions_user_status_date (user_id, status, date [, rowid]).
+#
+# Ordem da lista: pendentes primeiro ('pending' > 'confirmed' em DESC),
+# depois mais recentes primeiro, desempate pelo id.
+
+# ========== IMPORTS ==========
+# Importa "re" para validar datas dos filtros (AAAA-MM-DD)
+import re
+
+
+# ========== CONSTANTES ==========
+TAMANHO_PAGINA = 100
+MAX_TAMANHO_PAGINA = 500
+
+STATUS_VALIDOS = {'pending', 'confirmed'}
+SINAIS_VALIDOS = {'despesa', 'receita'}
+
+_RE_DATA = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+# Mesma ordem do índice (status, date, rowid), tudo DESC: sem ordenação extra
+_ORDEM = "ORDER BY status DESC, date DESC, transaction_id DESC"
+
+
+# ========== SQL ==========
+# (os planos são conferidos por database.py --verificar-indices)
+# {where} = cláusula montada por _where (filtros) + cursor
+SQL_PAGINA = f"SELECT * FROM transactions {{where}} {_ORDEM} LIMIT ?"
+
+SQL_CONTAGEM = '''
+    SELECT status, COUNT(*) AS qtd,
+           COALESCE(SUM(CASE WHEN amount < 0 THEN -amount END), 0) AS despesas
+    FROM transactions {where}
+    GROUP BY status
+'''
+
+# Feed de mudanças
+SQL_ULTIMO_EVENTO = "SELECT id FROM audit_log WHERE user_id = ? ORDER BY id DESC LIMIT 1"
+SQL_EVENTOS_DEPOIS = "SELECT id, transaction_id, action FROM audit_log WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?"
+SQL_ESTADO_ALTERADAS = '''
+    SELECT transaction_id, status, suggested_category, suggested_confidence, confirmed_category
+    FROM transactions
+    WHERE user_id = ? AND transaction_id IN ({marcadores})
+'''
+
+
+# ========== FILTROS ==========
+def ler_filtros(args):
+    """
+    Filtros vindos da URL (request.args), já validados.
+    Valor inválido é ignorado (vira "sem filtro").
+
+    Retorna dict com:
+    - status    → 'pending', 'confirmed' ou None
+    - categoria → texto ou None (confirmada, ou sugerida se pendente)
+    - sinal     → 'despesa' (valor < 0), 'receita' (valor > 0) ou None
+    - de, ate   → 'AAAA-MM-DD' ou None (intervalo fechado)
+    """
+    status = args.get('status')
+    sinal = args.get('sinal')
+    categoria = (args.get('categoria') or '').strip()
+    de = args.get('de') or ''
+    ate = args.get('ate') or ''
+    return {
+        'status': status if status in STATUS_VALIDOS else None,
+        'categoria': categoria or None,
+        'sinal': sinal if sinal in SINAIS_VALIDOS else None,
+        'de': de if _RE_DATA.match(de) else None,
+        'ate': ate if _RE_DATA.match(ate) else None,
+    }
+
+
+def _where(user_id, filtros):
+    """Monta (cláusula WHERE, parâmetros) para os filtros."""
+    condicoes = ["user_id = ?"]
+    parametros = [user_id]
+
+    if filtros['status']:
+        condicoes.append("status = ?")
+        parametros.append(filtros['status'])
+    if filtros['categoria']:
+        # Categoria "efetiva": a confirmada ou, se ainda não tem, a sugerida
+        condicoes.append("COALESCE(confirmed_category, suggested_category) = ?")
+        parametros.append(filtros['categoria'])
+    if filtros['sinal'] == 'despesa':
+        condicoes.append("amount < 0")
+    elif filtros['sinal'] == 'receita':
+        condicoes.append("amount > 0")
+    if filtros['de']:
+        condicoes.append("date >= ?")
+        parametros.append(filtros['de'])
+    if filtros['ate']:
+        condicoes.append("date <= ?")
+        parametros.append(filtros['ate'])
+
+    return "WHERE " + " AND ".join(condicoes), parametros
+
+
+# ========== CURSOR DA PÁGINA ==========
+def codificar_cursor(linha):
+    """Cursor da próxima página: chave (status, date, id) da última linha."""
+    return f"{linha['status']}|{linha['date']}|{linha['transaction_id']}"
+
+
+def decodificar_cursor(cursor):
+    """(status, date, id) do cursor, ou None se ausente/inválido (= primeira página)."""
+    if not cursor:
+        return None
+    try:
+        status, resto = cursor.split('|', 1)
+        data, transaction_id = resto.rsplit('|', 1)
+        return status, data, int(transaction_id)
+    except ValueError:
+        return None
+
+
+# ========== CONSULTAS ==========
+def consulta_pagina(user_id, filtros, cursor, limite):
+    """(SQL, parâmetros) de uma página a partir do cursor (limite+1 linhas)."""
+    where, parametros = _where(user_id, filtros)
+
+    chave = decodificar_cursor(cursor)
+    if chave is not None:
+        # Comparação de tupla: continua exatamente depois da última linha vista
+        where += " AND (status, date, transaction_id) < (?, ?, ?)"
+        parametros.extend(chave)
+
+    return SQL_PAGINA.format(where=where), parametros + [limite + 1]
+
+
+def buscar_pagina(con, user_id, filtros, cursor=None, limite=TAMANHO_PAGINA):
+    """
+    Uma página de transações a partir do cursor.
+
+    Lê limite+1 linhas: a sobra só diz se existe próxima página.
+    Retorna (transações, cursor da próxima página ou None).
+    """
+    limite = max(1, min(int(limite), MAX_TAMANHO_PAGINA))
+    linhas = con.execute(*consulta_pagina(user_id, filtros, cursor, limite)).fetchall()
+
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        return linhas, codificar_cursor(linhas[-1])
+    return linhas, None
+
+
+def consulta_contagem(user_id, filtros):
+    """(SQL, parâmetros) dos totais por status do conjunto filtrado."""
+    where, parametros = _where(user_id, filtros)
+    return SQL_CONTAGEM.format(where=where), parametros
+
+
+def contar_transacoes(con, user_id, filtros):
+    """
+    Totais do conjunto filtrado (todas as páginas), numa consulta
+    agregada separada: {'total', 'pendentes', 'confirmadas', 'despesas'}.
+    """
+    totais = {'total': 0, 'pendentes': 0, 'confirmadas': 0, 'despesas': 0.0}
+
+    for linha in con.execute(*consulta_contagem(user_id, filtros)):
+        totais['total'] += linha['qtd']
+        totais['despesas'] += linha['despesas']
+        if linha['status'] == 'pending':
+            totais['pendentes'] = linha['qtd']
+        elif linha['status'] == 'confirmed':
+            totais['confirmadas'] = linha['qtd']
+
+    return totais
+
+
+
+# ========== FEED DE MUDANÇAS ==========
+# Cursor = id do audit_log. Toda mudança em transação grava uma linha
+# de auditoria, e o SQLite tem UM escritor por vez: ids são entregues
+# em ordem de commit, então quem já viu o id N nunca "perde" um N-1.
+
+# Quantos eventos de auditoria por resposta (o cliente pede de novo se houver mais)
+MAX_EVENTOS_FEED = 500
+
+
+def ultimo_evento(con, user_id):
+    """Id do último evento de auditoria do usuário (0 se não houver): cursor inicial do feed."""
+    linha = con.execute(SQL_ULTIMO_EVENTO, (user_id,)).fetchone()
+    return linha['id'] if linha else 0
+
+
+def buscar_mudancas(con, user_id, desde, limite=MAX_EVENTOS_FEED):
+    """
+    Transações do usuário que mudaram depois do evento `desde`.
+    Custo proporcional às mudanças, não ao total de transações.
+
+    Retorna dict com:
+    - cursor     → id do último evento lido (próximo `desde`)
+    - mais       → True se ainda há eventos depois do cursor
+    - alteradas  → estado ATUAL de cada transação alterada (dicts)
+    - excluidas  → ids das que não existem mais
+    - criadas    → quantas transações novas apareceram (upload/manual)
+    """
+    eventos = con.execute(SQL_EVENTOS_DEPOIS, (user_id, desde, limite + 1)).fetchall()
+    mais = len(eventos) > limite
+    eventos = eventos[:limite]
+
+    resposta = {
+        'cursor': eventos[-1]['id'] if eventos else desde,
+        'mais': mais,
+        'alteradas': [],
+        'excluidas': [],
+        'criadas': sum(1 for e in eventos if e['action'] == 'created'),
+    }
+    if not eventos:
+        return resposta
+
+    # Vários eventos da mesma transação → um estado só (o atual)
+    ids = list(dict.fromkeys(e['transaction_id'] for e in eventos))
+    marcadores = ",".join("?" * len(ids))
+    atuais = con.execute(SQL_ESTADO_ALTERADAS.format(marcadores=marcadores), [user_id] + ids).fetchall()
+
+    resposta['alteradas'] = [dict(linha) for linha in atuais]
+    existentes = {linha['transaction_id'] for linha in atuais}
+    resposta['excluidas'] = [i for i in ids if i not in existentes]
+    return resposta
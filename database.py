@@ -1,11 +1,53 @@
 # ========== IMPORT ==========
-import sqlite3 as lite
+# Importa "sys" para o código de saída da verificação de índices (CLI)
+import sys
+
+# Importa "hashlib" e "datetime" para as cópias congeladas das migrações 2 e 4
+import hashlib
+from datetime import datetime
+
+# Importa a fábrica de conexões (db.py): caminho do banco e PRAGMAs (WAL etc.)
+from db import CAMINHO_BD, abrir_conexao
+
+
+# ========== MIGRAÇÕES ==========
+# Cada migração é uma função que recebe o cursor e muda o esquema.
+# Regras:
+# - NUNCA edite uma migração já publicada: crie uma nova no fim da lista
+# - Cada uma roda UMA vez por banco (a versão fica em "schema_version")
+# - Rodam em ordem, cada uma na sua transação (falhou → nada dela fica)
+# - NÃO importam código do app: o que elas precisam fica copiado aqui,
+#   como era quando saíram (mudar transactions.py depois não muda o que
+#   uma migração antiga faz num banco que ainda não a rodou)
+
+# ---------- cópias congeladas ----------
+# Formatos de data de transactions.normalizar_datas (migrações 2 e 4)
+_FORMATOS_DATA_V1 = ('%d/%m/%Y', '%Y-%m-%d', '%d/%m/%y', '%d-%m-%Y', '%d.%m.%Y')
 
-# ========== FUNÇÃO PRINCIPAL ==========
-def inicializar_banco():
-    # Conecta ao banco (cria se não existir)
-    con = lite.connect('Classificador Inteligente de Transações.db')
-    cur = con.cursor()
+
+def _data_iso_v1(data):
+    """Uma data em ISO, como transactions.normalizar_datas fazia; o resto fica como texto."""
+    texto = '' if data is None else str(data).strip()
+    for formato in _FORMATOS_DATA_V1:
+        try:
+            return datetime.strptime(texto, formato).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    return texto
+
+
+def _content_hash_v1(user_id, data, valor, descricao, ocorrencias):
+    """Hash de conteúdo de uma linha, como transactions.calcular_content_hashes fazia."""
+    centavos = round(float(valor) * 100)
+    texto = ' '.join(str(descricao).upper().split()) if descricao is not None else ''
+    conteudo = f"{_data_iso_v1(data)}|{centavos}|{texto}"
+    ordinal = ocorrencias.get(conteudo, 0)
+    ocorrencias[conteudo] = ordinal + 1
+    return hashlib.sha1(f"{user_id}|{conteudo}|{ordinal}".encode()).hexdigest()
+
+
+def _m001_tabelas_iniciais(cur):
+    """Tabelas do sistema (bancos antigos já as têm: IF NOT EXISTS)."""
 
     # ========== TABELA USERS ==========
     cur.execute('''
@@ -60,10 +102,422 @@ def inicializar_banco():
         )
     ''')
 
-    # Confirma e fecha
-    con.commit()
-    con.close()
+    # ========== TABELA CLASSIFICATION_CACHE ==========
+    # Camada em disco do cache de classificações (classification_cache.py)
+    # chave = hash de (descrição normalizada, sinal, versão das categorias)
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS classification_cache (
+            chave TEXT PRIMARY KEY,
+            resultado TEXT NOT NULL,
+            expira_em REAL NOT NULL
+        )
+    ''')
+
+    # ========== TABELA JOBS ==========
+    # Fila durável de classificação (job_queue.py)
+    # status: queued | running | done | failed
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            rerun INTEGER NOT NULL DEFAULT 0,
+            next_run_at REAL NOT NULL,
+            lease_until REAL,
+            worker TEXT,
+            last_error TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    # ========== TABELAS DO CLASSIFICADOR LOCAL (NAIVE BAYES) ==========
+    # Contagens aprendidas com as confirmações (local_classifier.py)
+    # nb_features = quantas vezes cada feature apareceu em cada categoria
+    # nb_classes  = quantos documentos/features cada categoria tem
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS nb_features (
+            user_id INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            feature TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, category, feature),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS nb_classes (
+            user_id INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            docs INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, category),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+
+def _m002_content_hash(cur):
+    """
+    Dedup de re-upload: content_hash = hash de (usuário, data, valor,
+    descrição, ocorrência). Preenche as linhas antigas e cria o índice
+    único (o mesmo lançamento não entra duas vezes).
+    """
+    colunas = {c[1] for c in cur.execute("PRAGMA table_info(transactions)")}
+    if 'content_hash' not in colunas:
+        cur.execute("ALTER TABLE transactions ADD COLUMN content_hash TEXT")
+
+    # Linhas antigas (sem hash), por usuário, na ordem em que entraram
+    antigas = cur.execute(
+        "SELECT transaction_id, user_id, date, description, amount FROM transactions "
+        "WHERE content_hash IS NULL ORDER BY user_id, transaction_id"
+    ).fetchall()
+    hashes = []
+    usuario, ocorrencias = None, {}
+    for transaction_id, user_id, data, descricao, valor in antigas:
+        if user_id != usuario:
+            usuario, ocorrencias = user_id, {}
+        hashes.append((_content_hash_v1(user_id, data, valor, descricao, ocorrencias), transaction_id))
+    cur.executemany("UPDATE transactions SET content_hash = ? WHERE transaction_id = ?", hashes)
+    if hashes:
+        print(f"♻️ content_hash calculado para {len(hashes)} transações antigas")
+
+    cur.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_content_hash
+        ON transactions (content_hash)
+    ''')
+
+
+def _m003_indices_consultas(cur):
+    """
+    Índices das consultas quentes (ver consultas_quentes() abaixo).
+    Sem eles, todo filtro por usuário lia a tabela inteira.
+    """
+    # Pendentes do usuário: regras (status) e IA (status + sem sugestão)
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_status_sugestao
+        ON transactions (user_id, status, suggested_category)
+    ''')
+    # Dashboard: transações do usuário por data (mais novas primeiro)
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_date
+        ON transactions (user_id, date)
+    ''')
+    # Categorias do usuário (DISTINCT sai direto do índice, sem ler a tabela)
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_confirmada
+        ON transactions (user_id, confirmed_category)
+    ''')
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_sugerida
+        ON transactions (user_id, suggested_category)
+    ''')
+    # Regras do usuário (lista em ordem de id e busca por palavra-chave)
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_rules_user_keyword
+        ON rules (user_id, keyword)
+    ''')
+    # Histórico de uma transação
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_audit_log_transaction
+        ON audit_log (transaction_id)
+    ''')
+    # Fila: job ativo do usuário e próximo job pronto
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_jobs_user_status
+        ON jobs (user_id, status)
+    ''')
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_jobs_status_proximo
+        ON jobs (status, next_run_at)
+    ''')
+
+
+def _m004_indice_dashboard(cur):
+    """
+    Índice da página do dashboard (dashboard_query.py): pendentes
+    primeiro, mais novas primeiro. O rowid (transaction_id) já vai
+    no fim de todo índice, então a ordem (status, date, id) e o
+    cursor de página saem direto dele, sem ordenar nada.
+    Antes, as datas ainda em "DD/MM/AAAA" passam para ISO.
+    """
+    # Datas antigas em "DD/MM/AAAA" não ordenam nem filtram por período
+    # Tabela temporária {antiga: nova}: UM UPDATE em vez de um por data
+    cur.execute("CREATE TEMP TABLE datas_convertidas (antiga TEXT PRIMARY KEY, nova TEXT NOT NULL)")
+    for (antiga,) in cur.connection.execute(
+        "SELECT DISTINCT date FROM transactions "
+        "WHERE date NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'"
+    ):
+        nova = _data_iso_v1(antiga)
+        if nova != antiga:
+            cur.execute("INSERT INTO datas_convertidas (antiga, nova) VALUES (?, ?)", (antiga, nova))
+    cur.execute('''
+        UPDATE transactions
+        SET date = (SELECT nova FROM datas_convertidas WHERE antiga = transactions.date)
+        WHERE date IN (SELECT antiga FROM datas_convertidas)
+    ''')
+    if cur.rowcount:
+        print(f"📅 {cur.rowcount} datas antigas convertidas para AAAA-MM-DD")
+    cur.execute("DROP TABLE datas_convertidas")
+
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_status_date
+        ON transactions (user_id, status, date)
+    ''')
+
+
+def _m005_totais_por_categoria(cur):
+    """
+    Resumo category_totals (category_totals.py): soma em centavos e
+    quantidade de confirmadas por usuário/categoria/mês. O gráfico do
+    dashboard lê daqui. Já nasce preenchido com o histórico.
+    """
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS category_totals (
+            user_id INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            month TEXT NOT NULL,
+            total_cents INTEGER NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, category, month),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    # Só confirmadas com categoria; mês = "AAAA-MM" (datas já em ISO)
+    cur.execute('''
+        INSERT INTO category_totals (user_id, category, month, total_cents, count)
+        SELECT user_id, confirmed_category, substr(date, 1, 7),
+               SUM(CAST(ROUND(ABS(amount) * 100) AS INTEGER)), COUNT(*)
+        FROM transactions
+        WHERE status = 'confirmed' AND confirmed_category IS NOT NULL
+        GROUP BY user_id, confirmed_category, substr(date, 1, 7)
+    ''')
+    if cur.rowcount:
+        print(f"📊 category_totals preenchido com {cur.rowcount} categorias/mês")
+
+
+def _m006_indice_categoria_efetiva(cur):
+    """
+    Índice na categoria "efetiva" (confirmada, senão sugerida) usada pela
+    página de categorias (category_query.py) e pelo filtro do dashboard.
+    Índice em EXPRESSÃO: a consulta precisa repetir o mesmo COALESCE.
+    """
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_categoria_efetiva
+        ON transactions (user_id, COALESCE(confirmed_category, suggested_category), date)
+    ''')
+
+
+def _m007_indice_auditoria_usuario(cur):
+    """
+    Feed de mudanças do dashboard: eventos do usuário depois de um id.
+    (user_id) + rowid implícito = eventos do usuário já em ordem de id.
+    """
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_audit_log_user
+        ON audit_log (user_id)
+    ''')
+
+
+def _m008_versao_modelo_local(cur):
+    """
+    Versão do modelo local de cada usuário: treinar() soma 1 a cada
+    treino, na mesma transação. Mover um exemplo de categoria não muda
+    contagens nem somas de nb_classes, só esta versão.
+    """
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS nb_versoes (
+            user_id INTEGER PRIMARY KEY,
+            versao INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+
+# Lista ORDENADA de migrações: (versão, descrição, função)
+MIGRACOES = [
+    (1, "tabelas iniciais", _m001_tabelas_iniciais),
+    (2, "content_hash para dedup de re-upload", _m002_content_hash),
+    (3, "índices das consultas quentes", _m003_indices_consultas),
+    (4, "datas em ISO e índice da paginação do dashboard", _m004_indice_dashboard),
+    (5, "resumo de totais por categoria", _m005_totais_por_categoria),
+    (6, "índice da categoria efetiva", _m006_indice_categoria_efetiva),
+    (7, "índice do feed de mudanças", _m007_indice_auditoria_usuario),
+    (8, "versão do modelo local", _m008_versao_modelo_local),
+]
+
+
+# ========== EXECUTOR DE MIGRAÇÕES ==========
+def versao_atual(con):
+    """Última versão aplicada (0 = banco novo ou anterior às migrações)."""
+    con.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            descricao TEXT NOT NULL,
+            aplicada_em DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    return con.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def migrar(con):
+    """
+    Aplica, em ordem, as migrações que o banco ainda não tem.
+    Retorna a lista de versões aplicadas agora.
+    """
+    aplicadas = []
+    for versao, descricao, migracao in MIGRACOES:
+        # BEGIN IMMEDIATE: dois processos subindo juntos não migram duas vezes
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            if versao <= versao_atual(con):
+                con.rollback()
+                continue
+            migracao(con.cursor())
+            con.execute(
+                "INSERT INTO schema_version (version, descricao) VALUES (?, ?)",
+                (versao, descricao)
+            )
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+        print(f"🧱 Migração {versao} aplicada: {descricao}")
+        aplicadas.append(versao)
+    return aplicadas
+
+
+# ========== FUNÇÃO PRINCIPAL ==========
+def inicializar_banco():
+    """Cria o banco (se não existir) e aplica as migrações pendentes."""
+    # Conecta ao banco (cria se não existir)
+    # isolation_level=None: as transações são controladas por migrar()
+    con = abrir_conexao(CAMINHO_BD, isolation_level=None)
+    try:
+        migrar(con)
+    finally:
+        con.close()
     print("Base de dados inicializada com sucesso!")
 
+
+# ========== VERIFICAÇÃO DOS PLANOS DE CONSULTA ==========
+def consultas_quentes():
+    """
+    Consultas quentes (nome, SQL, parâmetros de exemplo), montadas com as
+    MESMAS constantes e funções que os módulos executam: se uma consulta
+    mudar lá e parar de usar índice, verificar_indices() acusa.
+
+    Os módulos são importados só aqui: processor.py puxa a IA, e app2.py
+    importa este módulo.
+    """
+    import batch_actions
+    import category_query
+    import category_totals
+    import dashboard_query
+    import job_queue
+    import processor
+    import rule_matcher
+
+    sem_filtro = dashboard_query.ler_filtros({})
+    por_status_e_periodo = dashboard_query.ler_filtros({'status': 'pending', 'de': '2024-01-01', 'ate': '2024-12-31'})
+    por_categoria = dashboard_query.ler_filtros({'categoria': 'x'})
+    pagina = dashboard_query.TAMANHO_PAGINA
+    pagina_categoria = category_query.TAMANHO_PAGINA_CATEGORIA
+    dois_ids = ",".join("??")
+
+    return [
+        ("regras: pendentes do usuário", processor.SQL_PENDENTES_REGRAS, (1,)),
+        ("ia: pendentes sem sugestão", processor.SQL_PENDENTES_IA, (1,)),
+        ("dashboard: primeira página",
+         *dashboard_query.consulta_pagina(1, sem_filtro, None, pagina)),
+        ("dashboard: página seguinte",
+         *dashboard_query.consulta_pagina(1, sem_filtro, 'pending|2024-01-01|1', pagina)),
+        ("dashboard: página filtrada por status e período",
+         *dashboard_query.consulta_pagina(1, por_status_e_periodo, None, pagina)),
+        ("dashboard: página filtrada por categoria",
+         *dashboard_query.consulta_pagina(1, por_categoria, None, pagina)),
+        ("dashboard: totais por status", *dashboard_query.consulta_contagem(1, sem_filtro)),
+        ("dashboard: gastos por categoria (resumo)", category_totals.SQL_TOTAIS_POR_CATEGORIA, (1,)),
+        ("totais: ajuste das transações do lote",
+         category_totals.SQL_AJUSTAR_TOTAIS.format(marcadores=dois_ids), (1, 1, 1, 1, 2)),
+        ("categorias: resumo com as últimas de cada categoria",
+         category_query.SQL_RESUMO_CATEGORIAS, (1, 1, category_query.ULTIMAS_POR_CATEGORIA)),
+        ("categorias: página da lista de uma categoria",
+         *category_query.consulta_pagina_categoria(1, 'x', '2024-01-01|1', pagina_categoria)),
+        ("confirmar: transação por id", batch_actions.SQL_TRANSACAO_POR_ID, (1, 1)),
+        ("lote: selecionadas do usuário",
+         batch_actions.SQL_A_CONFIRMAR.format(filtro=batch_actions.FILTRO_SELECIONADAS.format(marcadores=dois_ids)),
+         (1, 1, 2)),
+        ("lote: pendentes acima da confiança",
+         batch_actions.SQL_A_CONFIRMAR.format(filtro=batch_actions.FILTRO_PENDENTES_ACIMA), (1, 90)),
+        ("confirmar: regra existente", rule_matcher.SQL_REGRA_EXISTENTE, (1, 'x')),
+        ("regras: lista do usuário", rule_matcher.SQL_REGRAS_DO_USUARIO, (1,)),
+        ("regras: assinatura do cache", rule_matcher.SQL_ASSINATURA_REGRAS, (1,)),
+        ("feed: último evento do usuário", dashboard_query.SQL_ULTIMO_EVENTO, (1,)),
+        ("feed: eventos depois do cursor",
+         dashboard_query.SQL_EVENTOS_DEPOIS, (1, 0, dashboard_query.MAX_EVENTOS_FEED + 1)),
+        ("feed: estado atual das alteradas",
+         dashboard_query.SQL_ESTADO_ALTERADAS.format(marcadores=dois_ids), (1, 1, 2)),
+        ("fila: job ativo do usuário", job_queue.SQL_JOB_ATIVO, (1,)),
+        ("fila: próximo job pronto", job_queue.SQL_PROXIMO_JOB, (0, 0)),
+    ]
+
+
+def verificar_indices(con):
+    """
+    Roda EXPLAIN QUERY PLAN em cada consulta quente.
+
+    Retorna (quantas foram conferidas, problemas): problemas = lista de
+    (nome, plano) das que fazem SCAN de tabela (leitura completa).
+    Lista vazia = tudo usando índice.
+    "SCAN ... USING (COVERING) INDEX" não conta: percorre só o índice.
+    SCAN de subconsulta/CTE materializada também não: lê um resultado
+    já filtrado, não a tabela.
+    """
+    consultas = consultas_quentes()
+    problemas = []
+    for nome, sql, parametros in consultas:
+        plano = [linha[3] for linha in con.execute("EXPLAIN QUERY PLAN " + sql, parametros)]
+        materializadas = {p.split()[1] for p in plano if p.startswith("MATERIALIZE")}
+        if any(
+            p.startswith("SCAN") and "INDEX" not in p and "SUBQUERY" not in p.upper()
+            and p.split()[1] not in materializadas
+            for p in plano
+        ):
+            problemas.append((nome, plano))
+    return len(consultas), problemas
+
+
 if __name__ == "__main__":
-    inicializar_banco()
\ No newline at end of file
+    inicializar_banco()
+
+    # python database.py --verificar-indices → confere os planos (sai com 1 se algum regrediu)
+    if "--verificar-indices" in sys.argv:
+        con = abrir_conexao(CAMINHO_BD)
+        conferidas, problemas = verificar_indices(con)
+        con.close()
+        for nome, plano in problemas:
+            print(f"❌ {nome}: {' | '.join(plano)}")
+        if problemas:
+            sys.exit(1)
+        print(f"✅ {conferidas} consultas quentes usando índice")
+
+    # python database.py --verificar-totais → confere category_totals (sai com 1 se divergir)
+    # python database.py --reconstruir-totais → recalcula category_totals do zero
+    if "--verificar-totais" in sys.argv or "--reconstruir-totais" in sys.argv:
+        from category_totals import reconstruir_totais, verificar_totais
+
+        con = abrir_conexao(CAMINHO_BD)
+        if "--reconstruir-totais" in sys.argv:
+            linhas = reconstruir_totais(con)
+            con.commit()
+            print(f"📊 category_totals reconstruído: {linhas} categorias/mês")
+        divergentes = verificar_totais(con)
+        con.close()
+        for user_id, categoria, mes in divergentes:
+            print(f"❌ usuário {user_id}, {categoria}, {mes}: resumo diferente das transações")
+        if divergentes:
+            sys.exit(1)
+        print("✅ category_totals confere com as transações")
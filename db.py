@@ -0,0 +1,93 @@
+# ========== IMPORTS ==========
+# Importa SQLite3 com apelido "lite" (banco de dados local)
+import sqlite3 as lite
+
+# Importa "threading" para ter UMA conexão reaproveitada por thread
+import threading
+
+
+# ========== CONSTANTES ==========
+CAMINHO_BD = 'Classificador Inteligente de Transações.db'
+
+# Quanto esperar por uma trava de escrita antes de "database is locked"
+BUSY_TIMEOUT_MS = 30000
+
+# Quantos comandos SQL preparados cada conexão guarda (reuso sem re-compilar)
+COMANDOS_EM_CACHE = 512
+
+# Configuração aplicada UMA vez, quando a conexão é aberta:
+# - WAL: leitores não bloqueiam o escritor (e vice-versa). O dashboard lê
+#   enquanto a IA grava. Fica gravado no arquivo do banco.
+# - synchronous NORMAL: seguro com WAL e bem menos fsync por commit
+# - busy_timeout: espera a trava em vez de falhar na hora
+# - mmap_size: leituras direto do arquivo mapeado em memória (256 MB)
+# - cache_size negativo = KB de cache de páginas por conexão (16 MB)
+# - temp_store MEMORY: ordenações/índices temporários na RAM
+# (foreign_keys fica DESLIGADO, como sempre foi: o audit_log guarda
+#  registros de transações já excluídas)
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -16384",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+# ========== FÁBRICA DE CONEXÕES ==========
+def abrir_conexao(caminho=CAMINHO_BD, isolation_level=""):
+    """
+    Abre uma conexão NOVA já configurada (PRAGMAs + acesso por nome
+    de coluna). Quem abre, fecha. Para o dia a dia use obter_conexao().
+    """
+    con = lite.connect(
+        caminho,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        cached_statements=COMANDOS_EM_CACHE,
+        isolation_level=isolation_level
+    )
+    # Configura para acessar por nome de coluna (Ex: row['email'])
+    con.row_factory = lite.Row
+    for pragma in PRAGMAS:
+        con.execute(pragma)
+    return con
+
+
+# Conexões reaproveitadas: {caminho: conexão} por thread
+# (sqlite3 não deixa usar a mesma conexão em threads diferentes)
+_LOCAL = threading.local()
+
+
+def obter_conexao(caminho=CAMINHO_BD):
+    """
+    Conexão da thread atual, aberta na primeira chamada e reaproveitada
+    nas seguintes (PRAGMAs e comandos preparados não são refeitos).
+
+    NÃO feche: ao terminar o trabalho chame liberar_conexao().
+    """
+    conexoes = getattr(_LOCAL, "conexoes", None)
+    if conexoes is None:
+        conexoes = _LOCAL.conexoes = {}
+    con = conexoes.get(caminho)
+    if con is None:
+        con = conexoes[caminho] = abrir_conexao(caminho)
+    return con
+
+
+def liberar_conexao(con):
+    """
+    Fim de uma unidade de trabalho (rota, job, upload): desfaz o que
+    ficou sem commit, para a conexão voltar limpa e sem segurar trava.
+    A conexão continua aberta para o próximo uso.
+    """
+    if con.in_transaction:
+        con.rollback()
+
+
+def fechar_conexoes_da_thread():
+    """Fecha de verdade as conexões da thread atual (ex.: thread terminando)."""
+    conexoes = getattr(_LOCAL, "conexoes", None) or {}
+    for con in conexoes.values():
+        con.close()
+    conexoes.clear()
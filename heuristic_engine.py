@@ -0,0 +1,103 @@
+# ========== IMPORTS ==========
+# Importa "json" e "os" para ler a configuração (heuristicas.json)
+import json
+import os
+
+# Importa NumPy para tratar os valores do lote de uma vez
+import numpy as np
+
+# Importa pandas para agrupar as descrições repetidas do lote
+import pandas as pd
+
+# Reaproveita o autômato Aho-Corasick das regras (rule_matcher.py):
+# TODAS as palavras-chave de TODAS as categorias numa estrutura só
+from rule_matcher import AutomatoPalavrasChave
+
+# Aplica uma função só nos valores distintos de uma coluna (transactions.py)
+from transactions import nos_valores_unicos
+
+
+# Arquivo com as tabelas de palavras-chave (dados, não código)
+CAMINHO_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "heuristicas.json")
+
+
+# ========== CLASSE MOTOR DE HEURÍSTICAS ==========
+class MotorHeuristicas:
+    """
+    Heurísticas locais compiladas UMA vez.
+
+    A configuração (heuristicas.json) lista as categorias em ordem de
+    prioridade, cada uma com suas palavras-chave. Tudo vira um único
+    autômato; cada descrição é lida uma vez e vence a categoria mais
+    prioritária que tiver alguma palavra presente (mesma ordem dos
+    antigos "if any(...)" encadeados).
+    """
+
+    def __init__(self, config):
+        self.receita = self._resultado(config["receita"])
+        self.padrao = self._resultado(config["padrao"])
+
+        # Lista achatada: palavra i → resultado da sua categoria
+        palavras = []
+        self._resultados = []
+        for regra in config["regras"]:
+            resultado = self._resultado(regra)
+            for palavra in regra["palavras"]:
+                palavras.append(palavra)
+                self._resultados.append(resultado)
+        self._automato = AutomatoPalavrasChave(palavras)
+
+    @staticmethod
+    def _resultado(regra):
+        return {
+            "category": regra["categoria"],
+            "confidence": regra["confianca"],
+            "reason": regra["razao"]
+        }
+
+    def classificar(self, description, amount):
+        """Classifica UMA transação (mesmo formato da IA)."""
+        if amount > 0:
+            return dict(self.receita)
+        indice = self._automato.primeiro_indice(str(description))
+        return dict(self.padrao if indice is None else self._resultados[indice])
+
+    def classificar_lote(self, descricoes, valores):
+        """
+        Classifica um lote inteiro de uma vez.
+
+        O autômato lê cada descrição DISTINTA das despesas uma vez só
+        (extratos repetem muito os mesmos estabelecimentos); receitas nem
+        passam por ele. A escolha do resultado de cada linha é indexação
+        NumPy numa tabela: regras..., padrão, receita.
+
+        descricoes / valores = listas ou pandas Series (mesmo tamanho)
+        Retorna lista de dicts, na mesma ordem.
+        """
+        valores = np.asarray(valores, dtype=float)
+        receitas = valores > 0
+        despesas = pd.Series(np.asarray(descricoes, dtype=object)[~receitas])
+
+        # Posições na tabela: índice da regra, depois padrão e receita
+        tabela = self._resultados + [self.padrao, self.receita]
+        sem_regra, receita = len(self._resultados), len(self._resultados) + 1
+
+        primeiro = self._automato.primeiro_indice
+
+        def indices(unicos):
+            achados = unicos.map(lambda d: primeiro(str(d)))
+            return achados.where(achados.notna(), sem_regra)
+
+        escolha = np.full(len(valores), receita)
+        escolha[~receitas] = nos_valores_unicos(despesas, indices, sem_regra).to_numpy(dtype=np.int64)
+        return [dict(tabela[k]) for k in escolha]
+
+
+def carregar_motor(caminho=CAMINHO_CONFIG):
+    """Lê a configuração e compila o motor."""
+    with open(caminho, encoding="utf-8") as f:
+        return MotorHeuristicas(json.load(f))
+
+
+# Motor padrão, compilado na importação (uma vez por processo)
+MOTOR_HEURISTICAS = carregar_motor()
@@ -0,0 +1,310 @@
+# ========== IMPORTS ==========
+# Importa "os" e "socket" para identificar o processo dono de cada job
+import os
+import socket
+
+# Importa SQLite3 (a fila mora na tabela "jobs" do banco)
+import sqlite3 as lite
+
+# Importa a fábrica de conexões compartilhada (db.py)
+from db import obter_conexao, liberar_conexao
+
+# Importa "threading" para os workers e o sinal de "tem job novo"
+import threading
+
+# Importa "time" para agendamento (backoff) e leases
+import time
+
+# Importa as etapas de classificação (processor.py)
+from processor import aplicar_regras_automaticas, processar_com_ia
+
+# Progresso publicado para a tela (rota SSE /progresso)
+from progress import PROGRESSO, AcompanhamentoJob
+from ai_agent import LIMITADOR_GEMINI
+
+
+# ========== CONSTANTES ==========
+# Quantas vezes um job pode falhar antes de desistir
+MAX_TENTATIVAS = 5
+
+# Backoff exponencial: 5s, 10s, 20s, 40s...
+BACKOFF_BASE_S = 5
+
+# "Lease" = posse temporária do job. Enquanto o worker está vivo,
+# renova a cada RENOVACAO_LEASE_S. Se o processo morrer, o lease vence
+# e outro worker (ou o próximo boot) retoma o job.
+LEASE_S = 90
+RENOVACAO_LEASE_S = 30
+
+# Intervalo de consulta à fila quando não há aviso de job novo
+INTERVALO_POLL_S = 5
+
+# last_error de quem esgotou as tentativas morrendo no meio (lease vencido)
+ERRO_LEASE_VENCIDO = "o processo caiu durante o job em todas as tentativas (lease vencido)"
+
+# Consultas da fila (os planos são conferidos por database.py --verificar-indices)
+# Job ainda não terminado do usuário (no máximo um por usuário)
+SQL_JOB_ATIVO = "SELECT id, status FROM jobs WHERE user_id = ? AND status IN ('queued', 'running') ORDER BY id LIMIT 1"
+
+# Próximo job pronto: na fila e com horário vencido, OU rodando com
+# lease vencido (o processo dono morreu)
+SQL_PROXIMO_JOB = '''
+    SELECT id, user_id, attempts, status FROM jobs
+    WHERE (status = 'queued' AND next_run_at <= ?)
+       OR (status = 'running' AND lease_until < ?)
+    ORDER BY next_run_at, id
+    LIMIT 1
+'''
+
+
+# ========== CONEXÃO ==========
+def conectar_bd():
+    # Conexão da thread (db.py): cada worker reaproveita a sua
+    return obter_conexao()
+
+
+# Aviso para os workers acordarem na hora (em vez de esperar o poll)
+_TEM_JOB_NOVO = threading.Event()
+
+
+# ========== FUNÇÃO ENFILEIRAR ==========
+def enfileirar_classificacao(user_id):
+    """
+    Pede a classificação das transações pendentes do usuário.
+
+    Junta pedidos repetidos: cada usuário tem no máximo UM job ativo.
+    - Já tem job na fila → nada a fazer (ele vai pegar as linhas novas)
+    - Tem job rodando    → marca "rerun" (roda de novo ao terminar)
+    - Não tem            → cria job novo
+
+    Retorna o id do job ativo do usuário.
+    """
+    con = conectar_bd()
+    try:
+        # BEGIN IMMEDIATE = trava de escrita: dois uploads simultâneos
+        # não conseguem criar dois jobs para o mesmo usuário
+        con.execute("BEGIN IMMEDIATE")
+        ativo = con.execute(SQL_JOB_ATIVO, (user_id,)).fetchone()
+
+        if ativo and ativo['status'] == 'running':
+            con.execute(
+                "UPDATE jobs SET rerun = 1, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (ativo['id'],)
+            )
+            job_id = ativo['id']
+        elif ativo:
+            job_id = ativo['id']
+        else:
+            job_id = con.execute(
+                "INSERT INTO jobs (user_id, status, next_run_at) VALUES (?, 'queued', ?)",
+                (user_id, time.time())
+            ).lastrowid
+
+        con.commit()
+    finally:
+        liberar_conexao(con)
+
+    PROGRESSO.publicar(user_id, {'fase': 'na_fila', 'job_id': job_id})
+    _TEM_JOB_NOVO.set()
+    return job_id
+
+
+# ========== TRABALHO DE UM JOB ==========
+def executar_classificacao(user_id, job_id=None):
+    """
+    Etapas de um job: regras do usuário primeiro, IA depois.
+    Cada passo publica o progresso do usuário (progress.PROGRESSO), com
+    o job_id que enfileirar_classificacao devolveu (a tela casa os dois).
+    """
+    acompanhamento = AcompanhamentoJob(user_id, job_id, estado_limitador=LIMITADOR_GEMINI.estado)
+    try:
+        relatorio = aplicar_regras_automaticas(user_id)
+        acompanhamento.avancar(regra=relatorio['aplicadas'])
+        processar_com_ia(user_id, progresso=acompanhamento)
+    except Exception as e:
+        # A fila tenta de novo (backoff); a tela mostra o erro até lá
+        acompanhamento.falhar(e)
+        raise
+    acompanhamento.concluir()
+
+
+# ========== CLASSE POOL DE WORKERS ==========
+class PoolWorkers:
+    """
+    Pool com número FIXO de threads que consomem a tabela "jobs".
+
+    - Concorrência limitada (tamanho do pool), não importa quantos uploads
+    - Sobrevive a reinícios: jobs ficam no banco; jobs "running" de um
+      processo que morreu são retomados quando o lease vence
+    - Falhas são repetidas com backoff exponencial até MAX_TENTATIVAS
+    """
+
+    # tarefa(user_id, job_id) = o trabalho de um job
+    def __init__(self, tamanho=2, tarefa=executar_classificacao):
+        self.tamanho = tamanho
+        self.tarefa = tarefa
+        self.identidade = f"{socket.gethostname()}:{os.getpid()}"
+        self._parar = threading.Event()
+        self._threads = []
+        # Jobs que ESTE processo está executando (para renovar leases)
+        self._em_execucao = set()
+        self._trava = threading.Lock()
+
+    # ---------- ciclo de vida ----------
+    def iniciar(self):
+        """
+        Sobe as threads. Idempotente.
+        A tabela jobs vem das migrações (database.migrar).
+        """
+        if self._threads:
+            return
+        for i in range(self.tamanho):
+            t = threading.Thread(target=self._loop, name=f"giro-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+        t = threading.Thread(target=self._renovar_leases, name="giro-leases", daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def parar(self, timeout=None):
+        self._parar.set()
+        _TEM_JOB_NOVO.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    # ---------- fila ----------
+    def _reivindicar(self):
+        """
+        Pega o próximo job pronto e marca como "running" (atomicamente).
+
+        Pronto = na fila e com horário vencido, OU rodando com lease
+        vencido (o processo dono morreu).
+
+        Lease vencido conta como tentativa: um job que derruba o processo
+        toda vez (ex.: memória estourada num arquivo ruim) para em
+        MAX_TENTATIVAS como "failed", em vez de ser retomado para sempre.
+        """
+        agora = time.time()
+        abandonados = []
+        con = conectar_bd()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            while True:
+                job = con.execute(SQL_PROXIMO_JOB, (agora, agora)).fetchone()
+                if job is None:
+                    break
+
+                tentativas = job['attempts']
+                if job['status'] == 'running':
+                    tentativas += 1
+                    if tentativas >= MAX_TENTATIVAS:
+                        con.execute('''
+                            UPDATE jobs
+                            SET status = 'failed', attempts = ?, lease_until = NULL,
+                                last_error = ?, updated_at = CURRENT_TIMESTAMP
+                            WHERE id = ?
+                        ''', (tentativas, ERRO_LEASE_VENCIDO, job['id']))
+                        abandonados.append(job)
+                        continue
+
+                con.execute('''
+                    UPDATE jobs
+                    SET status = 'running', attempts = ?, lease_until = ?, worker = ?,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (tentativas, agora + LEASE_S, self.identidade, job['id']))
+                job = dict(job, attempts=tentativas, status='running')
+                break
+            con.commit()
+        finally:
+            liberar_conexao(con)
+
+        # Depois do commit: a tela para de esperar pelos que desistimos
+        for abandonado in abandonados:
+            print(f"⚠️ Job {abandonado['id']} (usuário {abandonado['user_id']}) desistido: {ERRO_LEASE_VENCIDO}")
+            AcompanhamentoJob(abandonado['user_id'], abandonado['id']).falhar(ERRO_LEASE_VENCIDO)
+        return job
+
+    def _finalizar(self, job, erro=None):
+        """Registra o fim do job: concluído, reagendado (backoff) ou falho."""
+        con = conectar_bd()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            if erro is None:
+                # Sucesso. Se chegou upload novo durante a execução, roda de novo.
+                con.execute('''
+                    UPDATE jobs
+                    SET status = CASE WHEN rerun = 1 THEN 'queued' ELSE 'done' END,
+                        attempts = 0, rerun = 0, next_run_at = ?, lease_until = NULL,
+                        last_error = NULL, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (time.time(), job['id']))
+            else:
+                tentativas = job['attempts'] + 1
+                if tentativas >= MAX_TENTATIVAS:
+                    status, proxima = 'failed', time.time()
+                else:
+                    status, proxima = 'queued', time.time() + BACKOFF_BASE_S * 2 ** (tentativas - 1)
+                con.execute('''
+                    UPDATE jobs
+                    SET status = ?, attempts = ?, next_run_at = ?, lease_until = NULL,
+                        last_error = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (status, tentativas, proxima, str(erro), job['id']))
+            con.commit()
+        finally:
+            liberar_conexao(con)
+
+    # ---------- threads ----------
+    def _loop(self):
+        while not self._parar.is_set():
+            try:
+                job = self._reivindicar()
+            except lite.Error as e:
+                print(f"⚠️ Fila de jobs indisponível: {e}")
+                job = None
+
+            if job is None:
+                # Nada pronto: dorme até aviso de job novo (ou timeout)
+                _TEM_JOB_NOVO.wait(INTERVALO_POLL_S)
+                _TEM_JOB_NOVO.clear()
+                continue
+
+            with self._trava:
+                self._em_execucao.add(job['id'])
+            erro = None
+            try:
+                self.tarefa(job['user_id'], job['id'])
+            except Exception as e:
+                print(f"⚠️ Job {job['id']} (usuário {job['user_id']}) falhou: {e}")
+                erro = e
+            finally:
+                with self._trava:
+                    self._em_execucao.discard(job['id'])
+
+            try:
+                self._finalizar(job, erro)
+            except lite.Error as e:
+                # Sem conseguir gravar o fim: o lease vence e o job é retomado
+                print(f"⚠️ Não foi possível finalizar o job {job['id']}: {e}")
+
+    def _renovar_leases(self):
+        """Mantém vivos os leases dos jobs em execução neste processo."""
+        while not self._parar.wait(RENOVACAO_LEASE_S):
+            with self._trava:
+                ids = list(self._em_execucao)
+            if not ids:
+                continue
+            con = conectar_bd()
+            try:
+                con.executemany(
+                    "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = 'running'",
+                    [(time.time() + LEASE_S, i) for i in ids]
+                )
+                con.commit()
+            except lite.Error as e:
+                print(f"⚠️ Falha ao renovar leases: {e}")
+            finally:
+                liberar_conexao(con)
@@ -0,0 +1,199 @@
+# ========== IMPORTS ==========
+# Importa "threading" para proteger o cache de modelos entre threads
+import threading
+
+# Importa NumPy: contas do Naive Bayes em lote (vetorizadas)
+import numpy as np
+
+# Importa a impressão digital do estabelecimento (transactions.py)
+# O classificador aprende sobre "UBER TRIP", não sobre "UBER *TRIP 8F2K"
+from transactions import impressao_digital
+
+
+# ========== CONSTANTES ==========
+# Suavização de Laplace (evita probabilidade zero)
+ALPHA = 1.0
+
+# Tamanho dos n-gramas de caracteres ("UBER" → " UB", "UBE", "BER", "ER ")
+TAMANHO_NGRAMA = 3
+
+
+# ========== EXTRAÇÃO DE FEATURES ==========
+def extrair_features(description, amount):
+    """
+    Transforma uma transação em lista de features (com repetição):
+    - "w:PALAVRA"  → palavras da impressão digital
+    - "c:ABC"      → n-gramas de caracteres (pegam variações de escrita)
+    - "s:+" / "s:-" → sinal do valor (receita x despesa)
+    """
+    fp = impressao_digital(description)
+    features = ["w:" + p for p in fp.split()]
+    texto = f" {fp} "
+    features += ["c:" + texto[i:i + TAMANHO_NGRAMA] for i in range(len(texto) - TAMANHO_NGRAMA + 1)]
+    features.append("s:+" if amount > 0 else "s:-")
+    return features
+
+
+# ========== TREINO INCREMENTAL ==========
+def treinar(con, user_id, exemplos, peso=1):
+    """
+    Atualiza as contagens do usuário com exemplos confirmados.
+
+    exemplos = lista de (description, amount, category)
+    peso = +1 para aprender, -1 para "desaprender" (ex.: categoria editada)
+
+    NÃO faz commit: roda dentro da transação de quem chamou
+    (a confirmação e o treino são gravados juntos).
+    """
+    contagens = {}
+    documentos = {}
+    for description, amount, category in exemplos:
+        if not category:
+            continue
+        documentos[category] = documentos.get(category, 0) + peso
+        for f in extrair_features(description, amount):
+            chave = (category, f)
+            contagens[chave] = contagens.get(chave, 0) + peso
+
+    if not documentos:
+        return
+
+    totais = {}
+    for (category, _), n in contagens.items():
+        totais[category] = totais.get(category, 0) + n
+
+    con.executemany('''
+        INSERT INTO nb_features (user_id, category, feature, count) VALUES (?, ?, ?, ?)
+        ON CONFLICT(user_id, category, feature) DO UPDATE SET count = MAX(0, count + excluded.count)
+    ''', [(user_id, c, f, n) for (c, f), n in contagens.items()])
+
+    con.executemany('''
+        INSERT INTO nb_classes (user_id, category, docs, total) VALUES (?, ?, ?, ?)
+        ON CONFLICT(user_id, category) DO UPDATE SET
+            docs = MAX(0, docs + excluded.docs),
+            total = MAX(0, total + excluded.total)
+    ''', [(user_id, c, d, totais.get(c, 0)) for c, d in documentos.items()])
+
+    # Nova versão do modelo (gravada junto com as contagens):
+    # obter_modelo() remonta na próxima chamada depois do commit
+    con.execute('''
+        INSERT INTO nb_versoes (user_id, versao) VALUES (?, 1)
+        ON CONFLICT(user_id) DO UPDATE SET versao = versao + 1
+    ''', (user_id,))
+
+
+# ========== MODELO EM MEMÓRIA ==========
+class ModeloNaiveBayes:
+    """
+    Naive Bayes multinomial de UM usuário, montado a partir das contagens.
+
+    log_prob[c, j] = log P(feature j | categoria c)
+    log_prior[c]   = log P(categoria c)
+    """
+
+    def __init__(self, classes, features):
+        # classes  = linhas (category, docs, total)
+        # features = linhas (category, feature, count)
+        self.categorias = [c[0] for c in classes if c[1] > 0]
+        indice_cat = {c: i for i, c in enumerate(self.categorias)}
+        self.total_docs = sum(c[1] for c in classes if c[1] > 0)
+
+        self.vocabulario = {}
+        linhas, colunas, valores = [], [], []
+        for category, feature, count in features:
+            if category not in indice_cat or count <= 0:
+                continue
+            j = self.vocabulario.setdefault(feature, len(self.vocabulario))
+            linhas.append(indice_cat[category])
+            colunas.append(j)
+            valores.append(count)
+
+        n_cat, n_voc = len(self.categorias), max(1, len(self.vocabulario))
+        contagem = np.zeros((n_cat, n_voc))
+        if valores:
+            np.add.at(contagem, (np.array(linhas), np.array(colunas)), np.array(valores, dtype=float))
+
+        docs = np.array([c[1] for c in classes if c[1] > 0], dtype=float)
+        self.log_prior = np.log(docs / docs.sum()) if n_cat else np.zeros(0)
+        self.log_prob = np.log(contagem + ALPHA) - np.log(contagem.sum(axis=1, keepdims=True) + ALPHA * n_voc)
+
+    def prever_lote(self, transacoes):
+        """
+        Classifica VÁRIAS transações de uma vez.
+
+        transacoes = lista de (description, amount)
+        Retorna lista de (category, confianca 0-100).
+        """
+        n = len(transacoes)
+        if n == 0 or not self.categorias:
+            return [(None, 0.0)] * n
+
+        # Matriz esparsa (linha, coluna) das features conhecidas
+        linhas, colunas = [], []
+        for i, (description, amount) in enumerate(transacoes):
+            for f in extrair_features(description, amount):
+                j = self.vocabulario.get(f)
+                if j is not None:
+                    linhas.append(i)
+                    colunas.append(j)
+
+        # scores[i, c] = log_prior[c] + Σ log_prob[c, features de i]
+        scores = np.tile(self.log_prior, (n, 1))
+        if linhas:
+            np.add.at(scores, np.array(linhas), self.log_prob[:, np.array(colunas)].T)
+
+        # Softmax estável → probabilidade da melhor categoria
+        scores -= scores.max(axis=1, keepdims=True)
+        probs = np.exp(scores)
+        probs /= probs.sum(axis=1, keepdims=True)
+        melhores = probs.argmax(axis=1)
+        return [(self.categorias[k], float(probs[i, k]) * 100) for i, k in enumerate(melhores)]
+
+
+# ========== CACHE DE MODELOS POR USUÁRIO ==========
+# {user_id: (versão, modelo)}
+# versão = nb_versoes.versao → muda a cada treino (até quando um exemplo
+# só troca de categoria e as somas de nb_classes continuam iguais)
+_CACHE_MODELOS = {}
+_TRAVA_CACHE = threading.Lock()
+
+
+def obter_modelo(con, user_id):
+    """Retorna o modelo do usuário, remontando só se houve treino novo."""
+    linha = con.execute("SELECT versao FROM nb_versoes WHERE user_id = ?", (user_id,)).fetchone()
+    versao = linha[0] if linha else 0
+
+    with _TRAVA_CACHE:
+        em_cache = _CACHE_MODELOS.get(user_id)
+    if em_cache and em_cache[0] == versao:
+        return em_cache[1]
+
+    classes = con.execute(
+        "SELECT category, docs, total FROM nb_classes WHERE user_id = ? ORDER BY category", (user_id,)
+    ).fetchall()
+    features = con.execute(
+        "SELECT category, feature, count FROM nb_features WHERE user_id = ?", (user_id,)
+    ).fetchall()
+    modelo = ModeloNaiveBayes([tuple(c) for c in classes], [tuple(f) for f in features])
+
+    with _TRAVA_CACHE:
+        _CACHE_MODELOS[user_id] = (versao, modelo)
+    return modelo
+
+
+def classificar_localmente(con, user_id, transacoes, limiar=90.0, minimo_exemplos=20):
+    """
+    Tenta classificar sem IA.
+
+    Retorna lista com (category, confianca) para quem passou do limiar
+    ou None para quem deve ir para a IA. Se o usuário ainda tem poucos
+    exemplos (ou uma categoria só), tudo vai para a IA.
+    """
+    modelo = obter_modelo(con, user_id)
+    if len(modelo.categorias) < 2 or modelo.total_docs < minimo_exemplos:
+        return [None] * len(transacoes)
+
+    return [
+        (categoria, confianca) if confianca >= limiar else None
+        for categoria, confianca in modelo.prever_lote(transacoes)
+    ]
@@ -1,76 +1,232 @@
-import sqlite3 as lite
+import os
 import time
-from ai_agent import classificar_transacao_com_ia
+from db import obter_conexao, liberar_conexao
+from ai_agent import classificar_lote, TAMANHO_LOTE_PADRAO, CACHE_CLASSIFICACOES
+from rule_matcher import obter_matcher_regras
+from transactions import impressao_digital
+from local_classifier import classificar_localmente
+
+# Confiança mínima (0-100) para aceitar a resposta do classificador local
+# Abaixo disso a transação vai para a IA
+LIMIAR_LOCAL = float(os.getenv("GIRO_LIMIAR_LOCAL", "90"))
+
+# Pendentes de cada etapa (os planos são conferidos por database.py --verificar-indices)
+SQL_PENDENTES_REGRAS = "SELECT transaction_id, description FROM transactions WHERE user_id = ? AND status = 'pending'"
+SQL_PENDENTES_IA = "SELECT transaction_id, description, amount FROM transactions WHERE user_id = ? AND status = 'pending' AND suggested_category IS NULL"
 
 def connectar_bd():
-    con = lite.connect('Classificador Inteligente de Transações.db', timeout=15)
-    con.row_factory = lite.Row  
-    return con
+    # Conexão da thread (db.py): o worker reaproveita a mesma entre jobs
+    return obter_conexao()
 
 def aplicar_regras_automaticas(user_id):
+    """
+    Aplica as regras do usuário nas transações pendentes.
+
+    Os matches são coletados em memória primeiro; depois UPDATEs e
+    linhas de auditoria vão ao banco em lote (executemany) numa única
+    transação, segurando a trava de escrita o mínimo possível.
+
+    Retorna relatório: {'avaliadas', 'aplicadas', 'trava_ms'}
+    """
     con = connectar_bd()
     cur = con.cursor()
+    relatorio = {'avaliadas': 0, 'aplicadas': 0, 'trava_ms': 0.0}
+
+    try:
+        # Regras compiladas num único autômato (cache por usuário)
+        automato, categorias = obter_matcher_regras(cur, user_id)
+        if not categorias:
+            # Usuário sem regras: nada a fazer
+            return relatorio
+
+        transacoes = cur.execute(SQL_PENDENTES_REGRAS, (user_id,)).fetchall()
+        relatorio['avaliadas'] = len(transacoes)
+
+        # PASSO 1: Casa tudo em memória (sem tocar no banco)
+        # Uma única leitura da descrição, não importa quantas regras existam
+        # Se várias batem, vence a regra mais antiga (primeira da lista)
+        updates = []
+        auditoria = []
+        for t in transacoes:
+            indice = automato.primeiro_indice(t['description'])
+            if indice is None:
+                continue
+            categoria = categorias[indice]
+            updates.append((categoria, t['transaction_id']))
+            auditoria.append((t['transaction_id'], user_id, categoria))
+
+        if not updates:
+            return relatorio
+
+        # PASSO 2: Escreve tudo de uma vez, na mesma transação
+        # BEGIN IMMEDIATE = pega a trava de escrita já aqui,
+        # para medir exatamente quanto tempo ela fica presa
+        inicio_trava = time.perf_counter()
+        cur.execute("BEGIN IMMEDIATE")
+        cur.executemany('''
+            UPDATE transactions 
+            SET suggested_category = ?, suggested_confidence = 100
+            WHERE transaction_id = ?
+        ''', updates)
+        cur.executemany('''
+            INSERT INTO audit_log (transaction_id, user_id, action, new_category, source)
+            VALUES (?, ?, 'rule_applied', ?, 'rule')
+        ''', auditoria)
+        con.commit()
+        relatorio['trava_ms'] = (time.perf_counter() - inicio_trava) * 1000
+        relatorio['aplicadas'] = len(updates)
+
+        print(f"📏 Regras: {relatorio['aplicadas']}/{relatorio['avaliadas']} transações classificadas "
+              f"(trava de escrita: {relatorio['trava_ms']:.1f} ms)")
+        return relatorio
 
-    regras = cur.execute("SELECT * FROM rules WHERE user_id = ?", (user_id,)).fetchall()
-    transacoes = cur.execute("SELECT * FROM transactions WHERE user_id = ? AND status = 'pending'", (user_id,)).fetchall()
+    except Exception:
+        # Desfaz escrita pela metade (se houver) e repassa o erro
+        con.rollback()
+        raise
+    finally:
+        liberar_conexao(con)
+
+def agrupar_por_estabelecimento(transacoes):
+    """
+    Agrupa transações pela impressão digital do estabelecimento
+    (transactions.impressao_digital) + sinal do valor.
 
+    "UBER *TRIP 8F2K" e "UBER *TRIP 9XQ1" caem no mesmo grupo e
+    são classificados uma única vez.
+
+    Retorna lista de grupos (listas de linhas), na ordem de aparição.
+    """
+    grupos = {}
     for t in transacoes:
-        for r in regras:
-            if r['keyword'].lower() in t['description'].lower():
-                cur.execute('''
-                    UPDATE transactions 
-                    SET suggested_category = ?, suggested_confidence = 100
-                    WHERE transaction_id = ?
-                ''', (r['category'], t['transaction_id']))
-
-                cur.execute('''
-                    INSERT INTO audit_log (transaction_id, user_id, action, new_category, source)
-                    VALUES (?, ?, 'rule_applied', ?, 'rule')
-                ''', (t['transaction_id'], user_id, r['category']))
-                break  
-    con.commit()
-    con.close()
-
-def processar_com_ia(user_id):
+        sinal = (t['amount'] > 0) - (t['amount'] < 0)
+        grupos.setdefault((impressao_digital(t['description']), sinal), []).append(t)
+    return list(grupos.values())
+
+
+def processar_com_ia(user_id, tamanho_lote=None, progresso=None):
+    """
+    Classifica com IA as transações pendentes sem sugestão.
+
+    As transações são deduplicadas por estabelecimento: cada grupo é
+    classificado uma vez (pelo seu primeiro membro) e o resultado é
+    replicado para todos os membros na mesma escrita.
+
+    Ordem: classificador local (Naive Bayes treinado com as confirmações
+    do usuário) primeiro; só os grupos abaixo de LIMIAR_LOCAL vão para
+    a IA, em lotes de "tamanho_lote" por prompt
+    (padrão: TAMANHO_LOTE_PADRAO de ai_agent.py).
+
+    progresso (opcional): progress.AcompanhamentoJob, avisado a cada
+    passo com quantas linhas cada fonte classificou (tela de progresso).
+
+    Retorna relatório: {'linhas', 'grupos', 'taxa_dedup', 'locais'}
+    """
+    tamanho_lote = tamanho_lote or TAMANHO_LOTE_PADRAO
     con = connectar_bd()
     cur = con.cursor()
+    relatorio = {'linhas': 0, 'grupos': 0, 'taxa_dedup': 0.0, 'locais': 0}
 
     try:
         # Pega apenas quem não tem categoria ainda (as novas)
-        transacoes = cur.execute("SELECT * FROM transactions WHERE user_id = ? AND status = 'pending' AND suggested_category IS NULL", (user_id,)).fetchall()
+        transacoes = cur.execute(SQL_PENDENTES_IA, (user_id,)).fetchall()
 
-        for t in transacoes:
-            sucesso, resposta_ia = classificar_transacao_com_ia(t['description'], t['amount'])
+        # Deduplica por estabelecimento antes de gastar chamadas de IA
+        grupos = agrupar_por_estabelecimento(transacoes)
+        relatorio['linhas'] = len(transacoes)
+        relatorio['grupos'] = len(grupos)
+        if progresso:
+            progresso.iniciar(restantes=len(transacoes))
+        if transacoes:
+            relatorio['taxa_dedup'] = 1 - len(grupos) / len(transacoes)
+            print(f"🧬 Deduplicação: {len(transacoes)} transações → {len(grupos)} estabelecimentos "
+                  f"({relatorio['taxa_dedup']:.0%} de chamadas economizadas)")
+
+        # Classificador local: responde o que tiver confiança suficiente
+        previsoes = classificar_localmente(
+            con, user_id, [(g[0]['description'], g[0]['amount']) for g in grupos], limiar=LIMIAR_LOCAL
+        )
+        updates = []
+        auditoria = []
+        para_ia = []
+        for grupo, previsao in zip(grupos, previsoes):
+            if previsao is None:
+                para_ia.append(grupo)
+                continue
+            categoria_sugerida, confianca = previsao
+            # Teto de 99%: 100% fica reservado para as regras do usuário
+            confianca = min(99.0, round(confianca, 1))
+            for t in grupo:
+                updates.append((categoria_sugerida, confianca, t['transaction_id']))
+                auditoria.append((t['transaction_id'], user_id, categoria_sugerida))
+
+        if updates:
+            cur.executemany('''
+                UPDATE transactions 
+                SET suggested_category = ?, suggested_confidence = ?
+                WHERE transaction_id = ?
+            ''', updates)
+            cur.executemany('''
+                INSERT INTO audit_log (transaction_id, user_id, action, new_category, source)
+                VALUES (?, ?, 'local_suggested', ?, 'local')
+            ''', auditoria)
+            con.commit()
+            relatorio['locais'] = len(grupos) - len(para_ia)
+            print(f"🧠 Classificador local: {relatorio['locais']}/{len(grupos)} estabelecimentos sem chamar a IA")
+            if progresso:
+                progresso.avancar(local=len(updates))
+        grupos = para_ia
 
-            if sucesso and resposta_ia:
-                categoria_sugerida = resposta_ia.get('category')
+        for inicio in range(0, len(grupos), tamanho_lote):
+            lote = grupos[inicio:inicio + tamanho_lote]
+            # Representante de cada grupo = primeiro membro
+            # origens = de onde veio cada resposta (cache / ia / heuristica)
+            origens = []
+            respostas = classificar_lote([(g[0]['description'], g[0]['amount']) for g in lote], origens)
+
+            updates = []
+            auditoria = []
+            por_fonte = {}
+            for grupo, (sucesso, resposta_ia), origem_resposta in zip(lote, respostas, origens):
+                por_fonte[origem_resposta] = por_fonte.get(origem_resposta, 0) + len(grupo)
+                resposta_ia = resposta_ia or {}
                 # Se a IA por algum motivo devolver None vazio, forçamos 'Outros'
-                if not categoria_sugerida:
-                    categoria_sugerida = 'Outros'
+                categoria_sugerida = resposta_ia.get('category') or 'Outros'
                 confianca = resposta_ia.get('confidence', 0)
-            else:
-                categoria_sugerida = "Outros"
-                confianca = 0
-                
-            cur.execute('''
+                # sucesso = resposta da IA; senão veio do motor de heurísticas
+                acao, origem = ('ai_suggested', 'ai') if sucesso else ('heuristic_suggested', 'heuristic')
+
+                # Replica o resultado para todos os membros do grupo
+                for t in grupo:
+                    updates.append((categoria_sugerida, confianca, t['transaction_id']))
+                    auditoria.append((t['transaction_id'], user_id, acao, categoria_sugerida, origem))
+
+            cur.executemany('''
                 UPDATE transactions 
                 SET suggested_category = ?, suggested_confidence = ?
                 WHERE transaction_id = ?
-            ''', (categoria_sugerida, confianca, t['transaction_id']))
+            ''', updates)
 
-            cur.execute('''
+            cur.executemany('''
                 INSERT INTO audit_log (transaction_id, user_id, action, new_category, source)
-                VALUES (?, ?, 'ai_suggested', ?, 'ai')
-            ''', (t['transaction_id'], user_id, categoria_sugerida))
+                VALUES (?, ?, ?, ?, ?)
+            ''', auditoria)
             
-            # Salva no banco passo a passo
+            # Salva no banco lote a lote
+            # (sem pausa fixa: o ritmo das chamadas é controlado pelo
+            # LIMITADOR_GEMINI dentro de classificar_lote)
             con.commit() 
+            if progresso:
+                progresso.avancar(**por_fonte)
             
-            # Pausa vital para não levar ban gratuito da API
-            time.sleep(3.5)
+        print(f"🗂️ Cache de classificações: {CACHE_CLASSIFICACOES.estatisticas()}")
             
     except Exception as e:
         print(f"Erro na Thread da IA: {e}")
+        # Repassa o erro: a fila de jobs (job_queue.py) tenta de novo com backoff
+        raise
     finally:
-        # Garante que a conexão será fechada de qualquer forma
-        con.close()
\ No newline at end of file
+        # Garante que a conexão volta limpa (sem transação aberta) de qualquer forma
+        liberar_conexao(con)
+
+    return relatorio
@@ -0,0 +1,169 @@
+# ========== PROGRESSO DA CLASSIFICAÇÃO ==========
+# Pub/sub em memória: o worker publica eventos de progresso de cada
+# usuário e a rota SSE (/progresso em app2.py) repassa para o navegador.
+#
+# Só vale dentro do processo (os workers rodam no mesmo processo do
+# Flask, ver POOL_CLASSIFICACAO). Eventos são "fotos" do estado: se um
+# assinante lento acumular demais, os mais velhos são descartados.
+
+# ========== IMPORTS ==========
+# Importa "queue" para a fila de eventos de cada assinante
+import queue
+
+# Importa "threading" para proteger assinantes e últimos eventos
+import threading
+
+# Relógio injetável (mesmo do limitador): testes não precisam esperar
+from rate_limiter import RelogioReal
+
+
+# ========== CONSTANTES ==========
+# Eventos guardados por assinante antes de descartar os mais velhos
+MAX_EVENTOS_POR_ASSINANTE = 256
+
+# De onde vem cada classificação (ordem de exibição)
+FONTES = ('regra', 'cache', 'local', 'ia', 'heuristica')
+
+
+# ========== CANAL (PUB/SUB) ==========
+class CanalProgresso:
+    """
+    Canal de eventos por usuário.
+
+    - publicar(user_id, evento) → entrega a todos os assinantes do usuário
+    - assinar(user_id)          → fila (queue.Queue) que recebe os eventos
+    - cancelar(user_id, fila)   → para de receber
+    - ultimo(user_id)           → último evento (para quem chega no meio)
+    """
+
+    def __init__(self, max_eventos=MAX_EVENTOS_POR_ASSINANTE):
+        self.max_eventos = max_eventos
+        self._trava = threading.Lock()
+        self._assinantes = {}   # {user_id: [filas]}
+        self._ultimos = {}      # {user_id: evento}
+        self._sequencia = 0
+
+    def publicar(self, user_id, evento):
+        with self._trava:
+            self._sequencia += 1
+            evento = dict(evento, seq=self._sequencia)
+            self._ultimos[user_id] = evento
+            filas = list(self._assinantes.get(user_id, ()))
+
+        for fila in filas:
+            while True:
+                try:
+                    fila.put_nowait(evento)
+                    break
+                except queue.Full:
+                    # Assinante lento: descarta o evento mais velho
+                    try:
+                        fila.get_nowait()
+                    except queue.Empty:
+                        pass
+        return evento
+
+    def assinar(self, user_id):
+        fila = queue.Queue(maxsize=self.max_eventos)
+        with self._trava:
+            self._assinantes.setdefault(user_id, []).append(fila)
+        return fila
+
+    def cancelar(self, user_id, fila):
+        with self._trava:
+            filas = self._assinantes.get(user_id, [])
+            if fila in filas:
+                filas.remove(fila)
+            if not filas:
+                self._assinantes.pop(user_id, None)
+
+    def ultimo(self, user_id):
+        with self._trava:
+            return self._ultimos.get(user_id)
+
+    def assinantes(self, user_id):
+        with self._trava:
+            return len(self._assinantes.get(user_id, ()))
+
+
+# Canal único do processo (worker publica, rota SSE assina)
+PROGRESSO = CanalProgresso()
+
+
+# ========== ACOMPANHAMENTO DE UM JOB ==========
+class AcompanhamentoJob:
+    """
+    Progresso de UM job de classificação, publicado no canal a cada passo.
+
+    Uso (job_queue.executar_classificacao / processor.processar_com_ia):
+        acompanhamento.avancar(regra=12)          # regras aplicadas
+        acompanhamento.iniciar(restantes=300)     # o que falta classificar
+        acompanhamento.avancar(cache=4, ia=40)    # a cada lote
+        acompanhamento.concluir()  /  acompanhamento.falhar(erro)
+
+    Cada evento traz: fase, total, classificadas, percentual, contagem
+    por fonte, taxa (linhas/s), ETA (s) e o estado do limitador da IA.
+    """
+
+    def __init__(self, user_id, job_id=None, canal=PROGRESSO, estado_limitador=None, relogio=None):
+        self.user_id = user_id
+        self.job_id = job_id
+        self.canal = canal
+        self.estado_limitador = estado_limitador
+        self.relogio = relogio or RelogioReal()
+        self.fontes = dict.fromkeys(FONTES, 0)
+        self.total = None
+        self._inicio = None
+        self._feitas_no_inicio = 0
+
+    @property
+    def classificadas(self):
+        return sum(self.fontes.values())
+
+    def iniciar(self, restantes):
+        """Começo da classificação: total = já feitas (regras) + restantes."""
+        self.total = self.classificadas + restantes
+        self._inicio = self.relogio.agora()
+        self._feitas_no_inicio = self.classificadas
+        return self._publicar('classificando')
+
+    def avancar(self, **por_fonte):
+        """Soma linhas classificadas por fonte (ex.: avancar(cache=3, ia=10))."""
+        for fonte, quantidade in por_fonte.items():
+            self.fontes[fonte] = self.fontes.get(fonte, 0) + quantidade
+        return self._publicar('classificando' if self._inicio is not None else 'regras')
+
+    def concluir(self):
+        return self._publicar('concluido')
+
+    def falhar(self, erro):
+        return self._publicar('erro', erro=str(erro))
+
+    def _publicar(self, fase, **extra):
+        evento = {
+            'fase': fase,
+            'job_id': self.job_id,
+            'total': self.total,
+            'classificadas': self.classificadas,
+            'percentual': None,
+            'fontes': dict(self.fontes),
+            'taxa_por_s': None,
+            'eta_s': None,
+            'limitador': self.estado_limitador() if self.estado_limitador else None,
+        }
+        if self.total:
+            evento['percentual'] = round(100 * min(self.classificadas, self.total) / self.total, 1)
+        elif fase == 'concluido':
+            evento['percentual'] = 100.0
+
+        # Taxa medida desde iniciar() (as regras são instantâneas e não contam)
+        if self._inicio is not None and fase == 'classificando':
+            decorrido = self.relogio.agora() - self._inicio
+            feitas = self.classificadas - self._feitas_no_inicio
+            if decorrido > 0 and feitas > 0:
+                taxa = feitas / decorrido
+                evento['taxa_por_s'] = round(taxa, 2)
+                evento['eta_s'] = round(max(0, self.total - self.classificadas) / taxa, 1)
+
+        evento.update(extra)
+        return self.canal.publicar(self.user_id, evento)
@@ -0,0 +1,191 @@
+# ========== IMPORTS ==========
+# Importa "threading" para proteger o estado compartilhado entre threads
+import threading
+
+# Importa "time" para o relógio real (monotonic) e pausas (sleep)
+import time
+
+
+# ========== RELÓGIOS ==========
+# O limitador nunca chama time.* direto: usa um "relógio".
+# Em produção = RelogioReal; em testes = RelogioFalso (sem esperar de verdade)
+class RelogioReal:
+    """Relógio do sistema (segundos monotônicos)."""
+
+    def agora(self):
+        return time.monotonic()
+
+    def dormir(self, segundos):
+        time.sleep(segundos)
+
+
+class RelogioFalso:
+    """
+    Relógio de mentira para testes sem rede e sem espera.
+
+    dormir() apenas avança o tempo; "dormido" acumula o total esperado.
+    """
+
+    def __init__(self, inicio=0.0):
+        self._agora = inicio
+        self._trava = threading.Lock()
+        self.dormido = 0.0
+
+    def agora(self):
+        with self._trava:
+            return self._agora
+
+    def dormir(self, segundos):
+        with self._trava:
+            self._agora += max(0.0, segundos)
+            self.dormido += max(0.0, segundos)
+
+    def avancar(self, segundos):
+        """Avança o tempo sem contar como espera (simula tempo passando)."""
+        with self._trava:
+            self._agora += segundos
+
+
+# ========== CLASSE LIMITADOR (TOKEN BUCKET ADAPTATIVO) ==========
+class LimitadorTaxa:
+    """
+    Limitador de taxa compartilhado (requisições/minuto + tokens/minuto).
+
+    Dois "baldes" que se enchem com o tempo:
+    - requisições: taxa_atual por minuto
+    - tokens: tokens_por_minuto
+
+    Cada chamada à API pega 1 requisição + N tokens; se faltar, espera.
+
+    Adaptativo (AIMD):
+    - Erro 429 → corta a taxa pela metade e pausa pelo tempo sugerido
+      pela API ("Please retry in Xs")
+    - Sucesso → sobe a taxa aos poucos até o teto configurado
+    Assim o sistema roda colado no limite real da cota.
+    """
+
+    def __init__(self, requisicoes_por_minuto, tokens_por_minuto,
+                 relogio=None, rpm_minimo=1.0, aumento_por_sucesso=0.5, rajada=1):
+        self._relogio = relogio or RelogioReal()
+        self._trava = threading.Lock()
+
+        # Teto e piso da taxa de requisições (por minuto)
+        self.rpm_maximo = float(requisicoes_por_minuto)
+        self.rpm_minimo = float(rpm_minimo)
+        self.taxa_atual = self.rpm_maximo
+        self.aumento_por_sucesso = aumento_por_sucesso
+
+        # Balde de tokens (por minuto)
+        self.tokens_por_minuto = float(tokens_por_minuto)
+
+        # Quantas requisições podem sair "de uma vez" (rajada)
+        self._capacidade_req = float(rajada)
+        self._req_disponiveis = self._capacidade_req
+        self._tokens_disponiveis = self.tokens_por_minuto
+
+        # Pausa imposta por 429 (instante até quando ninguém chama a API)
+        self._bloqueado_ate = 0.0
+
+        # Circuito aberto = desistir da API até este instante
+        # (quem chama usa o fallback direto, sem esperar)
+        self._circuito_ate = 0.0
+
+        self._ultimo = self._relogio.agora()
+
+        # Contadores (expostos em estado())
+        self.total_429 = 0
+        self.total_sucessos = 0
+
+    # ---------- interno ----------
+    def _reabastecer(self, agora):
+        """Enche os baldes proporcionalmente ao tempo passado."""
+        decorrido = max(0.0, agora - self._ultimo)
+        self._ultimo = agora
+        self._req_disponiveis = min(
+            self._capacidade_req,
+            self._req_disponiveis + decorrido * self.taxa_atual / 60.0
+        )
+        self._tokens_disponiveis = min(
+            self.tokens_por_minuto,
+            self._tokens_disponiveis + decorrido * self.tokens_por_minuto / 60.0
+        )
+
+    # ---------- API pública ----------
+    def adquirir(self, tokens=0):
+        """
+        Bloqueia até poder fazer UMA requisição de "tokens" tokens.
+
+        Retorna quantos segundos esperou no total.
+        """
+
+        # Pedido maior que o balde inteiro nunca caberia: limita
+        tokens = min(float(tokens), self.tokens_por_minuto)
+        esperado = 0.0
+
+        while True:
+            with self._trava:
+                agora = self._relogio.agora()
+                self._reabastecer(agora)
+
+                if agora < self._bloqueado_ate:
+                    # Em pausa por causa de 429
+                    espera = self._bloqueado_ate - agora
+                elif self._req_disponiveis >= 1 and self._tokens_disponiveis >= tokens:
+                    # Tem cota: consome e libera
+                    self._req_disponiveis -= 1
+                    self._tokens_disponiveis -= tokens
+                    return esperado
+                else:
+                    # Calcula quanto falta para cada balde encher o necessário
+                    falta_req = max(0.0, 1 - self._req_disponiveis) * 60.0 / self.taxa_atual
+                    falta_tokens = max(0.0, tokens - self._tokens_disponiveis) * 60.0 / self.tokens_por_minuto
+                    espera = max(falta_req, falta_tokens)
+
+            # Espera FORA da trava, para não travar as outras threads
+            self._relogio.dormir(espera)
+            esperado += espera
+
+    def registrar_sucesso(self):
+        """Chamada que deu certo: sobe a taxa devagar (aumento aditivo)."""
+        with self._trava:
+            self.total_sucessos += 1
+            self.taxa_atual = min(self.rpm_maximo, self.taxa_atual + self.aumento_por_sucesso)
+
+    def registrar_429(self, espera_sugerida=None):
+        """
+        API respondeu 429: corta a taxa pela metade (redução multiplicativa)
+        e pausa todo mundo pelo tempo sugerido pela API.
+        """
+        with self._trava:
+            agora = self._relogio.agora()
+            self._reabastecer(agora)
+            self.total_429 += 1
+            self.taxa_atual = max(self.rpm_minimo, self.taxa_atual / 2)
+            # Esvazia o balde: a próxima requisição respeita a taxa nova
+            self._req_disponiveis = min(self._req_disponiveis, 0.0)
+            if espera_sugerida:
+                self._bloqueado_ate = max(self._bloqueado_ate, agora + espera_sugerida)
+
+    def abrir_circuito(self, segundos):
+        """Desliga a API por "segundos" (cota estourada mesmo após retries)."""
+        with self._trava:
+            self._circuito_ate = max(self._circuito_ate, self._relogio.agora() + segundos)
+
+    def circuito_aberto(self):
+        """True enquanto a API estiver desligada por abrir_circuito()."""
+        with self._trava:
+            return self._relogio.agora() < self._circuito_ate
+
+    def estado(self):
+        """Foto do estado atual (para logs e telas de progresso)."""
+        with self._trava:
+            agora = self._relogio.agora()
+            return {
+                "rpm_atual": round(self.taxa_atual, 2),
+                "rpm_maximo": self.rpm_maximo,
+                "tokens_disponiveis": int(self._tokens_disponiveis),
+                "pausado_por_s": round(max(0.0, self._bloqueado_ate - agora), 2),
+                "circuito_aberto": agora < self._circuito_ate,
+                "total_429": self.total_429,
+                "total_sucessos": self.total_sucessos,
+            }
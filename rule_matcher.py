@@ -0,0 +1,145 @@
+# ========== IMPORTS ==========
+# Importa "threading" para proteger o cache de autômatos entre threads
+# (a rota /upload e a thread da IA podem compilar regras ao mesmo tempo)
+import threading
+
+# Importa "deque" (fila rápida) usada na construção em largura (BFS) do autômato
+from collections import deque
+
+
+# Valor usado como "nenhuma regra encontrada"
+# Qualquer índice real de regra é menor que isso
+_SEM_MATCH = float('inf')
+
+
+# ========== CLASSE AUTÔMATO (AHO-CORASICK) ==========
+class AutomatoPalavrasChave:
+    """
+    Autômato Aho-Corasick que procura VÁRIAS palavras-chave de uma vez.
+
+    Em vez de testar cada palavra-chave contra cada descrição
+    (transações × regras), a descrição é percorrida UMA única vez,
+    caractere por caractere, não importa quantas palavras existam.
+
+    Regra de desempate: "primeira regra vence".
+    Cada palavra recebe a posição (índice) da sua regra; se várias
+    aparecem na mesma descrição, vence a de MENOR índice, exatamente
+    como o antigo loop aninhado com "break".
+    """
+
+    def __init__(self, palavras):
+        # palavras = lista de textos na ordem de prioridade
+        # O índice na lista é a prioridade (0 = mais prioritária)
+
+        # Tabela de transições: um dict por nó {caractere: próximo_nó}
+        self._transicoes = [{}]
+        # Link de falha de cada nó (para onde ir quando não há transição)
+        self._falha = [0]
+        # Menor índice de regra que termina neste nó (ou via links de falha)
+        self._saida = [_SEM_MATCH]
+
+        # PASSO 1: Monta a árvore (trie) com as palavras em minúsculo
+        for indice, palavra in enumerate(palavras):
+            no = 0
+            for c in palavra.lower():
+                proximo = self._transicoes[no].get(c)
+                if proximo is None:
+                    proximo = len(self._transicoes)
+                    self._transicoes[no][c] = proximo
+                    self._transicoes.append({})
+                    self._falha.append(0)
+                    self._saida.append(_SEM_MATCH)
+                no = proximo
+            # Palavra repetida: mantém a regra mais antiga (menor índice)
+            if indice < self._saida[no]:
+                self._saida[no] = indice
+
+        # PASSO 2: Calcula os links de falha em largura (BFS)
+        # e propaga a menor saída ao longo deles
+        fila = deque(self._transicoes[0].values())
+        while fila:
+            no = fila.popleft()
+            for c, filho in self._transicoes[no].items():
+                f = self._falha[no]
+                while f and c not in self._transicoes[f]:
+                    f = self._falha[f]
+                destino = self._transicoes[f].get(c, 0)
+                self._falha[filho] = destino if destino != filho else 0
+                self._saida[filho] = min(self._saida[filho], self._saida[self._falha[filho]])
+                fila.append(filho)
+
+    def primeiro_indice(self, texto):
+        """
+        Retorna o menor índice de palavra contida em "texto" (ou None).
+
+        Comparação sem diferenciar maiúsculas/minúsculas,
+        igual ao antigo "keyword.lower() in description.lower()".
+        """
+
+        # Palavra vazia ("") está contida em qualquer texto
+        melhor = self._saida[0]
+        transicoes = self._transicoes
+        falha = self._falha
+        saida = self._saida
+
+        no = 0
+        for c in texto.lower():
+            # Segue links de falha até achar transição (ou voltar à raiz)
+            while no and c not in transicoes[no]:
+                no = falha[no]
+            no = transicoes[no].get(c, 0)
+            if saida[no] < melhor:
+                melhor = saida[no]
+                # Índice 0 é imbatível: pode parar de ler
+                if melhor == 0:
+                    break
+
+        return None if melhor == _SEM_MATCH else melhor
+
+
+# ========== CACHE DE REGRAS COMPILADAS POR USUÁRIO ==========
+# Estrutura: {user_id: (assinatura, automato, categorias)}
+# assinatura = (quantidade de regras, maior id) para detectar mudanças
+# feitas por outro processo sem invalidação explícita
+_CACHE_AUTOMATOS = {}
+_TRAVA_CACHE = threading.Lock()
+
+# Consultas das regras (os planos são conferidos por database.py --verificar-indices)
+SQL_ASSINATURA_REGRAS = "SELECT COUNT(*), MAX(id) FROM rules WHERE user_id = ?"
+# ORDER BY id = mesma ordem do antigo "SELECT * FROM rules"
+# (a regra mais antiga tem prioridade)
+SQL_REGRAS_DO_USUARIO = "SELECT keyword, category FROM rules WHERE user_id = ? ORDER BY id"
+# Regra já existe? (confirmação com "criar regra" em app2.py)
+SQL_REGRA_EXISTENTE = "SELECT id FROM rules WHERE user_id = ? AND keyword = ?"
+
+
+def invalidar_cache_regras(user_id):
+    """Descarta o autômato compilado do usuário (chamar após inserir regras)."""
+    with _TRAVA_CACHE:
+        _CACHE_AUTOMATOS.pop(user_id, None)
+
+
+def obter_matcher_regras(cur, user_id):
+    """
+    Retorna (automato, categorias) com as regras do usuário compiladas.
+
+    Compila só na primeira vez (ou depois de invalidar).
+    categorias[i] = categoria da regra de índice i.
+    """
+
+    # Assinatura barata: se alguém inseriu/apagou regra, ela muda
+    assinatura = tuple(cur.execute(SQL_ASSINATURA_REGRAS, (user_id,)).fetchone())
+
+    with _TRAVA_CACHE:
+        em_cache = _CACHE_AUTOMATOS.get(user_id)
+    if em_cache and em_cache[0] == assinatura:
+        return em_cache[1], em_cache[2]
+
+    regras = cur.execute(SQL_REGRAS_DO_USUARIO, (user_id,)).fetchall()
+
+    automato = AutomatoPalavrasChave([r[0] for r in regras])
+    categorias = [r[1] for r in regras]
+
+    with _TRAVA_CACHE:
+        _CACHE_AUTOMATOS[user_id] = (assinatura, automato, categorias)
+    return automato, categorias
@@ -0,0 +1,29 @@
+# ========== FIXTURES DOS TESTES ==========
+import os
+import sys
+
+import pytest
+
+# Permite importar os módulos da raiz do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from db import fechar_conexoes_da_thread, obter_conexao
+
+
+@pytest.fixture
+def usuario(tmp_path, monkeypatch):
+    """
+    Banco novo numa pasta temporária (o caminho do banco é relativo à
+    pasta atual) com um usuário. Retorna o user_id.
+    """
+    monkeypatch.chdir(tmp_path)
+    fechar_conexoes_da_thread()
+    database.inicializar_banco()
+    con = obter_conexao()
+    cur = con.execute(
+        "INSERT INTO users (nome, email, password_hash) VALUES ('Teste', 'teste@teste', 'x')"
+    )
+    con.commit()
+    yield cur.lastrowid
+    fechar_conexoes_da_thread()
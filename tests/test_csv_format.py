@@ -0,0 +1,40 @@
+import io
+
+import csv_format
+from db import obter_conexao
+from transactions import upload_to_csv_db
+
+
+def _transacoes(user_id):
+    return obter_conexao().execute(
+        "SELECT description, amount FROM transactions WHERE user_id = ? ORDER BY transaction_id", (user_id,)
+    ).fetchall()
+
+
+def test_mesmo_cabecalho_com_encoding_e_decimal_diferentes(usuario):
+    """O formato em cache não pode ser reaproveitado para outro encoding/decimal."""
+    csv_format._CACHE_FORMATOS.clear()
+
+    cp1252 = "date;description;amount\r\n01/01/2024;PADARIA SÃO JOÃO;-12,50\r\n"
+    sucesso, msg = upload_to_csv_db(io.BytesIO(cp1252.encode('cp1252')), usuario)
+    assert sucesso, msg
+
+    utf8 = "date;description;amount\r\n02/01/2024;CAFÉ AÇAÍ;-12.50\r\n03/01/2024;CAFÉ AÇAÍ;-7.25\r\n"
+    sucesso, msg = upload_to_csv_db(io.BytesIO(utf8.encode('utf-8')), usuario)
+    assert sucesso, msg
+
+    linhas = _transacoes(usuario)
+    assert [row['amount'] for row in linhas] == [-12.5, -12.5, -7.25]
+    assert 'SÃO JOÃO' in linhas[0]['description']
+    assert all('CAFÉ AÇAÍ' in row['description'] for row in linhas[1:])
+
+
+def test_cache_reaproveitado_quando_o_formato_confere():
+    csv_format._CACHE_FORMATOS.clear()
+    amostra = "Data;Descrição;Valor\r\n01/01/2024;UBER;-12,50\r\n".encode('utf-8')
+
+    formato, do_cache = csv_format.obter_formato(io.BytesIO(amostra))
+    assert formato['decimal'] == ',' and not do_cache
+
+    formato, do_cache = csv_format.obter_formato(io.BytesIO(amostra))
+    assert formato['decimal'] == ',' and do_cache
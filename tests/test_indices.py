@@ -0,0 +1,9 @@
+from database import verificar_indices
+from db import obter_conexao
+
+
+def test_consultas_quentes_usam_indice(usuario):
+    """Toda consulta quente de um banco migrado tem que usar índice (nenhum SCAN de tabela)."""
+    quantidade, problemas = verificar_indices(obter_conexao())
+    assert quantidade > 0
+    assert problemas == []
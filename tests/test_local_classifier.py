@@ -0,0 +1,22 @@
+from db import obter_conexao
+from local_classifier import obter_modelo, treinar
+
+
+def _prever(con, user_id, description, amount=-25.0):
+    return obter_modelo(con, user_id).prever_lote([(description, amount)])[0][0]
+
+
+def test_editar_categoria_troca_a_previsao(usuario):
+    """Mover um exemplo de categoria não muda as somas de nb_classes; o modelo tem que mudar."""
+    con = obter_conexao()
+    treinar(con, usuario, [('PADARIA PAO QUENTE', -8.0, 'Alimentação')] * 10)
+    treinar(con, usuario, [('POSTO IPIRANGA', -150.0, 'Transporte')] * 10)
+    treinar(con, usuario, [('UBER TRIP', -25.0, 'Alimentação')])
+    con.commit()
+    assert _prever(con, usuario, 'UBER TRIP') == 'Alimentação'
+
+    # Como em /editar: desaprende a categoria antiga e aprende a nova
+    treinar(con, usuario, [('UBER TRIP', -25.0, 'Alimentação')], peso=-1)
+    treinar(con, usuario, [('UBER TRIP', -25.0, 'Transporte')])
+    con.commit()
+    assert _prever(con, usuario, 'UBER TRIP') == 'Transporte'
@@ -0,0 +1,46 @@
+import processor
+from benchmarks.classificador_falso import classificador_falso
+from db import obter_conexao
+from job_queue import executar_classificacao
+from progress import FONTES, PROGRESSO
+
+
+def _pendentes(con, user_id, descricoes):
+    con.executemany(
+        "INSERT INTO transactions (user_id, date, description, amount, status) "
+        "VALUES (?, '2024-01-01', ?, -10.0, 'pending')",
+        [(user_id, d) for d in descricoes]
+    )
+
+
+def test_eventos_do_job_trazem_job_id_fontes_e_eta(usuario, monkeypatch):
+    con = obter_conexao()
+    con.execute("INSERT INTO rules (user_id, keyword, category) VALUES (?, 'UBER', 'Transporte')", (usuario,))
+    _pendentes(con, usuario, ['UBER TRIP', 'PADARIA ALFA', 'POSTO BETA', 'MERCADO GAMA', 'FARMACIA DELTA', 'CINEMA OMEGA'])
+    con.commit()
+    # Lotes de 2: vários eventos no meio da classificação
+    monkeypatch.setattr(processor, 'TAMANHO_LOTE_PADRAO', 2)
+
+    fila = PROGRESSO.assinar(usuario)
+    try:
+        with classificador_falso(latencia_s=0.01):
+            executar_classificacao(usuario, job_id=42)
+    finally:
+        PROGRESSO.cancelar(usuario, fila)
+    eventos = []
+    while not fila.empty():
+        eventos.append(fila.get_nowait())
+
+    assert eventos[0]['fase'] == 'regras' and eventos[-1]['fase'] == 'concluido'
+    for evento in eventos:
+        assert evento['job_id'] == 42
+        assert set(evento['fontes']) == set(FONTES)
+        assert sum(evento['fontes'].values()) == evento['classificadas']
+        assert 'eta_s' in evento
+    assert eventos[-1]['fontes']['regra'] == 1 and eventos[-1]['fontes']['ia'] == 5
+
+    # Depois do primeiro lote da IA todo evento de progresso tem taxa e ETA
+    lotes = [e for e in eventos if e['fase'] == 'classificando' and e['fontes']['ia']]
+    assert len(lotes) == 3
+    assert all(e['taxa_por_s'] and e['eta_s'] is not None for e in lotes)
+    assert lotes[-1]['eta_s'] == 0
@@ -0,0 +1,69 @@
+import pytest
+
+from rate_limiter import LimitadorTaxa, RelogioFalso
+
+
+def _limitador(relogio, **kwargs):
+    # 60 rpm = 1 requisição/s; 600 tokens/min = 10 tokens/s
+    return LimitadorTaxa(60, 600, relogio=relogio, **kwargs)
+
+
+def test_baldes_reabastecem_com_o_tempo():
+    relogio = RelogioFalso()
+    limitador = _limitador(relogio)
+
+    assert limitador.adquirir(600) == 0.0
+    # Os dois baldes vazios: 1 requisição volta em 1 s, 300 tokens em 30 s
+    assert limitador.adquirir(300) == pytest.approx(30.0)
+    assert relogio.dormido == pytest.approx(30.0)
+
+    # Tempo passando sem ninguém pedir enche o balde até a capacidade
+    relogio.avancar(120)
+    assert limitador.adquirir(0) == 0.0
+    assert limitador.estado()['tokens_disponiveis'] == 600
+
+
+def test_429_corta_a_taxa_pela_metade_e_pausa():
+    relogio = RelogioFalso()
+    limitador = _limitador(relogio, rpm_minimo=20)
+
+    limitador.registrar_429(espera_sugerida=5)
+    assert limitador.estado()['rpm_atual'] == 30
+    assert limitador.estado()['pausado_por_s'] == 5
+    # Ninguém chama a API durante a pausa sugerida
+    assert limitador.adquirir() == pytest.approx(5.0)
+
+    limitador.registrar_429()
+    limitador.registrar_429()
+    assert limitador.estado()['rpm_atual'] == 20   # não passa do piso
+    assert limitador.estado()['total_429'] == 3
+
+
+def test_sucessos_recuperam_a_taxa_aos_poucos_ate_o_teto():
+    limitador = _limitador(RelogioFalso(), aumento_por_sucesso=0.5)
+    limitador.registrar_429()
+
+    for _ in range(10):
+        limitador.registrar_sucesso()
+    assert limitador.estado()['rpm_atual'] == 35
+
+    for _ in range(100):
+        limitador.registrar_sucesso()
+    assert limitador.estado()['rpm_atual'] == 60
+    assert limitador.estado()['total_sucessos'] == 110
+
+
+def test_circuito_abre_e_fecha_com_o_tempo():
+    relogio = RelogioFalso()
+    limitador = _limitador(relogio)
+    assert not limitador.circuito_aberto()
+
+    limitador.abrir_circuito(30)
+    assert limitador.circuito_aberto()
+    assert limitador.estado()['circuito_aberto']
+
+    relogio.avancar(29.9)
+    assert limitador.circuito_aberto()
+    relogio.avancar(0.2)
+    assert not limitador.circuito_aberto()
+    assert not limitador.estado()['circuito_aberto']
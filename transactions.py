@@ -1,14 +1,53 @@
+# Importa "os" para ler a configuração do ambiente
+import os
+
 # Importa Pandas: biblioteca para ler e processar arquivos CSV
 import pandas as pd
 
-# Importa SQLite3 com apelido "lite" (banco de dados local)
-import sqlite3 as lite
+# Importa NumPy: espalha o resultado dos valores únicos de volta nas linhas
+import numpy as np
+
+# Importa a fábrica de conexões compartilhada (db.py)
+from db import obter_conexao, liberar_conexao, PRAGMAS
 
 # Importa "re" (regular expressions) para procurar/remover padrões de texto
 # Usado para limpar descrições (remover CPF, CNPJ, etc)
 import re
 
+# Importa "unicodedata" para remover acentos na impressão digital
+import unicodedata
+
+# Importa "hashlib" para o hash de conteúdo (dedup de re-upload)
+import hashlib
+
+# Importa "queue" e "threading" para a fila entre leitores e o escritor
+import queue
+import threading
+
+# Importa o pool limitado de threads que leem os arquivos em paralelo
+from concurrent.futures import ThreadPoolExecutor
+
+# Importa a detecção de formato do arquivo (encoding, separador, decimal)
+from csv_format import RENOMEAR_COLUNAS, COLUNAS_OBRIGATORIAS, obter_formato
+
 # ========== FUNÇÃO LIMPAR DESCRIÇÃO ==========
+# Padrões de dados sensíveis, juntos em UMA regex compilada uma vez só
+# (antes eram quatro re.sub por descrição). O "|" testa na ordem abaixo.
+_RE_DADOS_SENSIVEIS = re.compile(
+    # Padrão: "Agência: 0001 Conta: 12345-6"
+    # (?i:...) = case-insensitive só neste trecho
+    # \d+ = um ou mais dígitos | \s* = zero ou mais espaços
+    r'(?i:Agência:\s*\d+\s*Conta:\s*[\d\-]+)'
+    # CPF em formato "123•456•789-01" ou similar
+    # [-•]+ = um ou mais hífen ou bullet | \d{3} = exatamente 3 dígitos
+    r'|\s*[-•]+\s*\d{3}\.\d{3}\.\d{3}[-•]\d{2}\s*'
+    # CNPJ em formato "12.345.678/0001-99"
+    r'|\s*\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}\s*'
+    # CPF sem separador completo: "123•456•789"
+    r'|\s*[-•]+\s*\d{3}\.\d{3}\.\d{3}\s*'
+)
+
+
 # Função que remove informações sensíveis da descrição
 # Exemplo: "IFOOD - CPF: 123.456.789-01 - Agência: 0001" → "IFOOD"
 def limpar_descricao(desc):
@@ -18,38 +57,91 @@ def limpar_descricao(desc):
     if not isinstance(desc, str):
         return "Transação"
     
-    # Remove padrão: "Agência: 0001 Conta: 12345-6"
-    # r'...' = "raw string" (interpreta \ literalmente)
-    # (?i) = case-insensitive (ignora maiúscula/minúscula)
-    # \d+ = um ou mais dígitos
-    # \s* = zero ou mais espaços
-    # '' = substitui por vazio (remove)
-    desc = re.sub(r'(?i)Agência:\s*\d+\s*Conta:\s*[\d\-]+', '', desc)
-    
-    # Remove CPF em formato "123•456•789-01" ou similar
-    # \s* = espaços
-    # [-•]+ = um ou mais hífen ou bullet
-    # \d{3} = exatamente 3 dígitos
-    desc = re.sub(r'\s*[-•]+\s*\d{3}\.\d{3}\.\d{3}[-•]\d{2}\s*', '', desc)
-    
-    # Remove CNPJ em formato "12.345.678/0001-99"
-    # \d{2} = 2 dígitos
-    # \. = ponto literal
-    # / = barra literal
-    # - = hífen literal
-    desc = re.sub(r'\s*\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}\s*', '', desc)
-    
-    # Remove CPF sem separador completo: "123•456•789"
-    desc = re.sub(r'\s*[-•]+\s*\d{3}\.\d{3}\.\d{3}\s*', '', desc)
+    # Remove Agência/Conta, CPF e CNPJ ('' = substitui por vazio)
+    desc = _RE_DADOS_SENSIVEIS.sub('', desc)
     
     # Remove espaços nas pontas e hífers soltos que ficaram
     # strip() = remove das extremidades
     return desc.strip(' -')
 
+
+def nos_valores_unicos(serie, funcao, vazio):
+    """
+    Aplica "funcao" (operações .str) só nos valores DISTINTOS da coluna
+    e espalha o resultado de volta. Extratos repetem muito os mesmos
+    textos, então cada descrição/valor é processado uma vez só.
+
+    Células vazias (NaN) recebem "vazio".
+    """
+    codigos, unicos = pd.factorize(serie)
+    resultado = funcao(pd.Series(unicos, dtype=object)).to_numpy(dtype=object)
+    # Código -1 (vazio) aponta para o último item: o valor "vazio"
+    resultado = np.append(resultado, vazio)
+    return pd.Series(resultado[codigos], index=serie.index)
+
+
+def limpar_descricoes(serie):
+    """
+    Versão em coluna de limpar_descricao: limpa uma Series inteira
+    com operações .str (sem chamar Python linha a linha).
+
+    Valores que não são texto viram "Transação", como na versão escalar.
+    """
+    def limpar(unicos):
+        # Só os textos passam pelo .str: numa coluna sem nenhum texto
+        # (ex.: só números) o .str nem existe e levantaria AttributeError
+        textos = unicos[unicos.map(type) == str]
+        limpas = textos.str.replace(_RE_DADOS_SENSIVEIS, '', regex=True).str.strip(' -')
+        return limpas.reindex(unicos.index, fill_value='Transação')
+
+    return nos_valores_unicos(serie, limpar, 'Transação')
+
+# ========== FUNÇÃO IMPRESSÃO DIGITAL DO ESTABELECIMENTO ==========
+# Padrões que MUDAM entre lançamentos do mesmo estabelecimento
+# Parcelas: "PARC 03/10", "PARCELA 3/10", "3 DE 10"
+_RE_PARCELA = re.compile(r'\bPARC(?:ELA)?\s*\d{1,2}\s*(?:/|DE)\s*\d{1,2}\b|\b\d{1,2}\s*DE\s*\d{1,2}\b')
+# Datas e horas: "12/03", "12/03/2024", "14:35"
+_RE_DATA_HORA = re.compile(r'\b\d{1,2}/\d{1,2}(?:/\d{2,4})?\b|\b\d{1,2}:\d{2}(?::\d{2})?\b')
+# IDs: tokens que misturam letras e dígitos ("8F2K") ou números longos ("123456")
+_RE_ID = re.compile(r'\b(?=\w*\d)(?=\w*[A-Z])\w+\b|\b\d{4,}\b')
+# Pontuação que só separa partes ("UBER *TRIP", "PAG-SEGURO")
+_RE_PONTUACAO = re.compile(r'[*#.,;:/\\_\-]+')
+
+
+def impressao_digital(desc):
+    """
+    Gera a "impressão digital" do estabelecimento de uma descrição.
+
+    Bancos repetem o mesmo estabelecimento com IDs, datas e parcelas
+    diferentes. A impressão remove o que varia e mantém o que identifica:
+    - "UBER *TRIP 8F2K"            → "UBER TRIP"
+    - "Uber *Trip 9XQ1 12/03"      → "UBER TRIP"
+    - "LOJA ABC PARC 03/10"        → "LOJA ABC"
+
+    Parte de limpar_descricao (sem CPF/CNPJ) e nunca retorna vazio.
+    """
+
+    base = limpar_descricao(desc).upper()
+
+    # Remove acentos: "AÇÚCAR" → "ACUCAR"
+    base = ''.join(c for c in unicodedata.normalize('NFKD', base) if not unicodedata.combining(c))
+
+    fp = _RE_PARCELA.sub(' ', base)
+    fp = _RE_DATA_HORA.sub(' ', fp)
+    fp = _RE_PONTUACAO.sub(' ', fp)
+    fp = _RE_ID.sub(' ', fp)
+
+    # Colapsa espaços
+    fp = ' '.join(fp.split())
+
+    # Se sobrou nada (descrição só de números), usa a base inteira
+    return fp or ' '.join(base.split())
+
+
 # ========== FUNÇÃO CONVERTER PARA REAL ==========
 # Função que transforma formato brasileiro em número
 # Exemplo: "R$ 1.234,56" → 1234.56
-def parse_brl(val):
+def parse_brl(val, decimal=None):
     """
     Converte string no formato brasileiro (R$ 1.234,56) para float.
     
@@ -58,6 +150,9 @@ def parse_brl(val):
     - "1.234,56" → 1234.56 (sem símbolo)
     - "1,50" → 1.5 (apenas vírgula)
     - 100 → 100.0 (já é número)
+
+    decimal = separador decimal do arquivo, se já for conhecido
+    (',' ou '.'). Sem ele, o formato é adivinhado valor a valor.
     """
     
     # Se já é número (int ou float), apenas converte para float
@@ -66,6 +161,13 @@ def parse_brl(val):
     
     #Transforma para string e remove símbolo R$ e espaços
     s = str(val).replace('R$', '').replace(' ', '').strip()
+
+    # Separador decimal conhecido: o outro é milhar (remove)
+    # "1.234,56" com ',' → 1234.56 | "1,234.56" com '.' → 1234.56
+    if decimal == ',':
+        return float(s.replace('.', '').replace(',', '.'))
+    if decimal == '.':
+        return float(s.replace(',', ''))
     
     #Determina o formato (. e , podem aparecer juntos)
     # Caso 1: se tem AMBOS (ponto e vírgula)
@@ -86,122 +188,495 @@ def parse_brl(val):
     # float() converte para número
     return float(s)
 
-# ========== FUNÇÃO UPLOAD CSV PARA BANCO ==========
-# Função principal que lê CSV e insere no banco de dados
-def upload_to_csv_db(file_path, user_id):
+# ========== FUNÇÃO CONVERTER COLUNA PARA REAL ==========
+def converter_valores_brl(serie, decimal=None):
     """
-    Lê arquivo CSV e insere transações no banco de dados.
-    
-    Passos:
-    1. Lê arquivo (tenta vários separadores/encodings)
+    Versão em coluna de parse_brl: converte uma Series inteira de uma vez.
+
+    - "R$ 1.234,56" → 1234.56
+    - "1,50"        → 1.5
+    - "-12.00"      → -12.0
+
+    decimal = separador decimal do arquivo (',' ou '.'); sem ele vale a
+    mesma regra de parse_brl (se tem vírgula, ela é o decimal).
+
+    Valores que não viram número ficam NaN (quem chama decide o que fazer).
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float)
+
+    def converter(unicos):
+        s = unicos.astype(str).astype(object)
+
+        # Remove símbolo R$ e espaços (replace simples: bem mais rápido que regex)
+        s = s.str.replace('R$', '', regex=False).str.replace(' ', '', regex=False)
+
+        # Decimal vírgula: ponto é milhar (remove) e vírgula vira ponto
+        if decimal == ',':
+            s = s.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+        elif decimal == '.':
+            s = s.str.replace(',', '', regex=False)
+        else:
+            virgula = s.str.contains(',', regex=False)
+            s = s.where(~virgula, s[virgula].str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+
+        # Caminho rápido: tudo numérico; senão, inválidos viram NaN
+        try:
+            return s.astype(float)
+        except ValueError:
+            return pd.to_numeric(s, errors='coerce')
+
+    return nos_valores_unicos(serie, converter, np.nan).astype(float)
+
+
+# ========== HASH DE CONTEÚDO (DEDUP DE RE-UPLOAD) ==========
+# Formatos de data aceitos, na ordem de tentativa
+_FORMATOS_DATA = ('%d/%m/%Y', '%Y-%m-%d', '%d/%m/%y', '%d-%m-%Y', '%d.%m.%Y')
+
+
+def normalizar_datas(serie):
+    """
+    Datas em ISO ("05/03/2024" e "2024-03-05" → "2024-03-05").
+    O que não for data reconhecida fica como texto (sem espaços nas pontas).
+    """
+    def normalizar(unicos):
+        texto = unicos.astype(str).str.strip()
+        datas = pd.Series(pd.NaT, index=unicos.index, dtype='datetime64[ns]')
+        for formato in _FORMATOS_DATA:
+            faltando = datas.isna()
+            if not faltando.any():
+                break
+            datas[faltando] = pd.to_datetime(texto[faltando], format=formato, errors='coerce')
+        return datas.dt.strftime('%Y-%m-%d').where(datas.notna(), texto)
+
+    return nos_valores_unicos(serie, normalizar, '')
+
+
+def calcular_content_hashes(user_id, datas, valores, descricoes, ocorrencias):
+    """
+    Hash de conteúdo de cada linha: o mesmo lançamento gera o mesmo hash
+    em qualquer extrato que o contenha (re-upload é ignorado no INSERT).
+
+    Entra no hash: user_id, data normalizada, valor em centavos,
+    descrição limpa (maiúsculas, espaços colapsados) e o NÚMERO DA
+    OCORRÊNCIA. Duas compras iguais no mesmo dia (ex.: dois cafés de
+    R$ 5,00) viram ocorrências 0 e 1, e as duas entram.
+
+    ocorrencias = dict {conteúdo: vezes já visto} compartilhado entre os
+    pedaços do mesmo arquivo (atualizado aqui).
+    """
+    centavos = (valores.astype(float) * 100).round().astype('int64')
+    textos = nos_valores_unicos(
+        descricoes,
+        lambda unicos: unicos.astype(str).str.upper().str.split().str.join(' '),
+        ''
+    )
+
+    hashes = []
+    for data, centavo, texto in zip(normalizar_datas(datas).tolist(), centavos.tolist(), textos.tolist()):
+        conteudo = f"{data}|{centavo}|{texto}"
+        # Ocorrência = quantas vezes o conteúdo já apareceu (pedaços anteriores + este)
+        ordinal = ocorrencias.get(conteudo, 0)
+        ocorrencias[conteudo] = ordinal + 1
+        hashes.append(hashlib.sha1(f"{user_id}|{conteudo}|{ordinal}".encode()).hexdigest())
+    return hashes
+
+
+# ========== CONSTANTES DE IMPORTAÇÃO ==========
+# Quantas linhas são lidas/processadas por vez (chunk)
+# A memória usada depende disso, NÃO do tamanho do arquivo
+TAMANHO_CHUNK_PADRAO = 5000
+
+# Cache de páginas maior só durante a importação (64 MB; o padrão de db.py é menor)
+# cache_size negativo = KB. Volta ao padrão no fim (a conexão é reaproveitada)
+PRAGMA_CACHE_IMPORTACAO = "PRAGMA cache_size = -65536"
+PRAGMA_CACHE_PADRAO = next(p for p in PRAGMAS if 'cache_size' in p)
+
+# Tabela temporária em arquivo durante a importação: as linhas preparadas
+# saem da RAM quando passam do cache (o padrão de db.py deixa tudo na RAM).
+# Trocar o temp_store apaga as tabelas temporárias: só no início e no fim
+PRAGMA_TEMP_IMPORTACAO = "PRAGMA temp_store = FILE"
+PRAGMA_TEMP_PADRAO = next(p for p in PRAGMAS if 'temp_store' in p)
+
+# Quantas linhas com erro guardar no relatório (o total é sempre contado)
+MAX_ERROS_RELATORIO = 1000
+
+
+def _rebobinar(fonte):
+    """Volta ao início se "fonte" for um arquivo aberto (caminho não precisa)."""
+    if hasattr(fonte, 'seek'):
+        fonte.seek(0)
+
+
+# ========== INSERÇÃO EM LOTE ==========
+# Os pedaços vão primeiro para uma tabela TEMPORÁRIA (só desta conexão,
+# fora do banco principal: não trava ninguém). A trava de escrita só é
+# pedida no fim, para passar o arquivo inteiro para transactions de uma
+# vez: o worker e o /confirmar não esperam a leitura do arquivo.
+def _preparar_lote(cur, df, hashes):
+    """Guarda um pedaço na tabela temporária com UM executemany (sem ida e volta por linha)."""
+    cur.executemany(
+        "INSERT INTO upload_preparado (date, description, amount, content_hash) VALUES (?, ?, ?, ?)",
+        zip(df['date'].tolist(), df['description'].tolist(), df['amount'].astype(float).tolist(), hashes)
+    )
+
+
+def _inserir_preparadas(cur, user_id):
+    """
+    Passa as linhas preparadas para transactions com UM INSERT ... SELECT,
+    na ordem do arquivo.
+
+    Linhas cujo content_hash já existe (re-upload) são puladas pelo
+    ON CONFLICT; retorna quantas entraram de fato.
+    """
+    # Status começa como 'pending' (aguardando confirmação)
+    # ON CONFLICT(content_hash) em vez de INSERT OR IGNORE: só ignora o
+    # duplicado; outros erros (ex.: NULL numa coluna NOT NULL) continuam
+    # aparecendo. Data vazia NÃO é erro: normalizar_datas a deixa como ''
+    # e ela entra assim
+    # "WHERE true": sem ele o SQLite lê o ON CONFLICT como o ON de um JOIN
+    cur.execute('''
+        INSERT INTO transactions (user_id, date, description, amount, status, content_hash)
+        SELECT ?, date, description, amount, 'pending', content_hash
+        FROM upload_preparado
+        WHERE true
+        ORDER BY rowid
+        ON CONFLICT (content_hash) DO NOTHING
+    ''', (user_id,))
+    return cur.rowcount
+
+
+def _registrar_auditoria_upload(cur, user_id, id_antes):
+    """
+    Cria o audit log 'created' de TODAS as transações novas com um
+    INSERT ... SELECT pela faixa de ids (id > id_antes).
+
+    Seguro porque roda na mesma transação (BEGIN IMMEDIATE) do INSERT:
+    ninguém mais grava transações no meio, então a faixa é só deste upload.
+    """
+    cur.execute('''
+        INSERT INTO audit_log (transaction_id, user_id, action, new_category, source)
+        SELECT transaction_id, user_id, 'created', 'NEW_UPLOAD', 'user'
+        FROM transactions
+        WHERE transaction_id > ? AND user_id = ?
+        ORDER BY transaction_id
+    ''', (id_antes, user_id))
+
+
+# ========== LEITURA EM PEDAÇOS ==========
+class ArquivoInvalido(ValueError):
+    """Arquivo que não dá para importar (formato ou colunas). A mensagem vai para o usuário."""
+
+
+def ler_pedacos(fonte, user_id, tamanho_chunk=TAMANHO_CHUNK_PADRAO, relatorio=None):
+    """
+    Gerador: lê o arquivo (caminho ou arquivo aberto) em pedaços de
+    "tamanho_chunk" linhas e devolve cada um já limpo, como
+    (DataFrame, content_hashes). Não toca no banco.
+
+    Passos (por pedaço):
+    1. Lê o pedaço (formato detectado uma vez, antes da leitura)
     2. Valida colunas obrigatórias
-    3. Processa valores monetários
-    4. Limpa descrições
-    5. Insere no banco com criação de audit log
-    
-    Retorna:
-    - (True, "mensagem") = Sucesso
-    - (False, "erro") = Falha com motivo
+    3. Processa valores monetários (coluna inteira, sem loop Python)
+    4. Limpa descrições e normaliza datas (idem)
+    5. Calcula o hash de conteúdo de cada linha
+
+    relatorio = dict opcional que recebe as linhas recusadas:
+    "total_erros" e "exemplos_erros" (no máximo MAX_ERROS_RELATORIO).
+
+    Levanta ArquivoInvalido se o formato ou as colunas não servirem.
     """
-    
-    #Abre conexão com banco
-    con = lite.connect("Classificador Inteligente de Transações.db", timeout=30, check_same_thread=False)    
-    cur = con.cursor()
-    
-    try:
-        #Tenta ler CSV com diferentes separadores
-        # Problema: diferentes bancos usam , ou ;
-        # Solução: tenta todos até um funcionar
-        df = None
-        for sep in [',', ';', '\t']:  # Tenta vírgula, ponto-e-vírgula, tab
-            try:
-                # Lê usando pandas (biblioteca para dados)
-                # sep = separador de colunas
-                # encoding='utf-8-sig' = formato texto universal
-                df = pd.read_csv(file_path, sep=sep, encoding='utf-8-sig')
-                break  # Se funcionou, SAI do loop
-            except:
-                # Separador não funcionou, tenta o próximo
-                continue
-        
-        # Se nenhum separador funcionou, df ainda é None
-        if df is None:
-            return False, "Não foi possível ler o CSV. Verifique o formato (separador e encoding)."
+    if relatorio is None:
+        relatorio = {}
+    relatorio.setdefault('total_erros', 0)
+    exemplos_erros = relatorio.setdefault('exemplos_erros', [])
+
+    #Detecta o formato olhando só o começo do arquivo
+    # Problema: bancos usam , ou ; ou tab, utf-8 ou latin-1,
+    # "1.234,56" ou "1,234.56" e às vezes linhas de título antes do cabeçalho
+    # Solução: uma amostra de poucos KB decide tudo; o arquivo é lido UMA vez
+    # Uploads repetidos do mesmo banco reaproveitam o formato (cache)
+    formato, do_cache = obter_formato(fonte)
+
+    # Se não achou um cabeçalho com as colunas obrigatórias
+    if formato is None:
+        raise ArquivoInvalido("Não foi possível ler o CSV. Verifique o formato (separador e encoding).")
+
+    print(f"🔎 Formato {'(cache)' if do_cache else 'detectado'}: "
+          f"encoding={formato['encoding']} sep={formato['sep']!r} decimal={formato['decimal']!r} "
+          f"cabeçalho na linha {formato['linha_cabecalho'] + 1}")
+
+    # Leitor em pedaços: cada iteração devolve um DataFrame de até tamanho_chunk linhas
+    # dtype=str: o valor chega como texto e converter_valores_brl aplica o decimal detectado
+    # (senão o pandas leria "1.234" como 1.234 em arquivos de decimal vírgula)
+    # encoding_errors='replace': byte inválido depois da amostra não derruba o upload
+    _rebobinar(fonte)
+    leitor = pd.read_csv(
+        fonte,
+        sep=formato['sep'],
+        encoding=formato['encoding'],
+        encoding_errors='replace',
+        skiprows=formato['linha_cabecalho'],
+        dtype=str,
+        chunksize=tamanho_chunk
+    )
 
+    # Conteúdos já vistos neste arquivo (para o número da ocorrência)
+    ocorrencias = {}
+    # Linha no arquivo = linhas antes do cabeçalho + cabeçalho + posição no CSV
+    deslocamento_linha = formato['linha_cabecalho'] + 2
+    for df in leitor:
         #Normaliza nomes de colunas
-        # .columns = pega nomes das colunas
-        # .str.strip() = remove espaços nas pontas
-        # .str.lower() = transforma em minúscula
-        # Exemplo: " Data " → "data"
+        # Exemplo: " Data " → "data" → "date"
         df.columns = df.columns.str.strip().str.lower()
-        
-        # Cria dicionário para renomear colunas (aceita várias formas)
-        # Usuários podem digitar "Data" ou "data" ou "Descrição" ou "descricao"
-        rename_map = {
-            'data': 'date',  # Aceita "data" também
-            'descrição': 'description',  # Aceita com acento
-            'descricao': 'description',  # Aceita sem acento
-            'valor': 'amount'  # Aceita "valor" também
-        }
-        
-        # Aplica renomeação (in place = modifica o df original)
-        df.rename(columns=rename_map, inplace=True)
+        df.rename(columns=RENOMEAR_COLUNAS, inplace=True)
 
         #Valida se tem as 3 colunas obrigatórias
-        # .issubset() = verifica se está contido em
-        # {'date', 'description', 'amount'} = conjunto de colunas necessárias
-        if not {'date', 'description', 'amount'}.issubset(df.columns):
+        if not COLUNAS_OBRIGATORIAS.issubset(df.columns):
             # Faltam colunas, mostra o que foi encontrado
-            return False, f"Colunas necessárias: date, description, amount. Encontradas: {list(df.columns)}"
+            raise ArquivoInvalido(f"Colunas necessárias: date, description, amount. Encontradas: {list(df.columns)}")
+
+        #Processa coluna de AMOUNT (valores), tudo de uma vez
+        # Transforma "R$ 1.234,56" em 1234.56 (inválidos viram NaN)
+        valores = converter_valores_brl(df['amount'], decimal=formato['decimal'])
+
+        # Valor preenchido que não virou número → relatório de erros
+        invalidas = valores.isna() & df['amount'].notna()
+        if invalidas.any():
+            relatorio['total_erros'] += int(invalidas.sum())
+            for indice, bruto in df.loc[invalidas, 'amount'].items():
+                if len(exemplos_erros) >= MAX_ERROS_RELATORIO:
+                    break
+                exemplos_erros.append({
+                    'linha': int(indice) + deslocamento_linha,
+                    'valor': bruto,
+                    'motivo': 'valor inválido'
+                })
 
-        #Processa coluna de AMOUNT (valores)
-        # .apply(parse_brl) = aplica função parse_brl em CADA linha
-        # Transforma "R$ 1.234,56" em 1234.56
-        df['amount'] = df['amount'].apply(parse_brl)
-        
         # Remove linhas com valores vazios/inválidos
-        # .dropna() = remove "not a number"
-        df = df.dropna(subset=['amount'])
-        
+        df = df.assign(amount=valores).dropna(subset=['amount'])
+
+        #Limpa descrições (remove CPF, CNPJ, etc)
+        df['description'] = limpar_descricoes(df['description'])
+
+        # Datas em ISO (ordenação e filtro por período no dashboard)
+        df['date'] = normalizar_datas(df['date'])
+
+        yield df, calcular_content_hashes(user_id, df['date'], df['amount'], df['description'], ocorrencias)
+
+
+# ========== GRAVAÇÃO ==========
+def gravar_pedacos(pedacos, user_id, relatorio=None, progresso=None, erros=None):
+    """
+    Insere no banco os pedaços (DataFrame, content_hashes) de UM arquivo,
+    na ordem, e cria o audit log de todas as linhas novas de uma vez.
+    Os pedaços são preparados numa tabela temporária e passam para
+    transactions em UMA transação no fim: ou o arquivo entra inteiro, ou
+    nada entra, e a trava de escrita não fica presa durante a leitura.
+
+    relatorio = o mesmo dict passado a ler_pedacos (linhas recusadas);
+    lido só depois do último pedaço. No sucesso, recebe "inseridas" e
+    "repetidas" (linhas já importadas antes, puladas pelo content_hash).
+
+    progresso = função opcional chamada após cada chunk com
+    (numero_do_chunk, linhas_preparadas_ate_agora)
+
+    erros = lista opcional que recebe o relatório das linhas recusadas
+    (valor que não virou número): dicts com "linha" (no arquivo),
+    "valor" e "motivo". Linhas ruins NÃO abortam o arquivo; guarda no
+    máximo MAX_ERROS_RELATORIO (o total vai na mensagem).
+
+    Retorna:
+    - (True, "mensagem") = Sucesso
+    - (False, "erro") = Falha com motivo
+    """
+    if relatorio is None:
+        relatorio = {}
+
+    #Pega a conexão da thread (db.py: WAL, busy_timeout etc. já configurados)
+    con = obter_conexao()
+    cur = con.cursor()
+    con.execute(PRAGMA_CACHE_IMPORTACAO)
+    con.execute(PRAGMA_TEMP_IMPORTACAO)
+
+    try:
+        con.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS upload_preparado "
+            "(date TEXT, description TEXT, amount REAL, content_hash TEXT)"
+        )
+        total_preparadas = 0
+        for numero_chunk, (df, hashes) in enumerate(pedacos, start=1):
+            #Prepara as linhas do pedaço (sem trava no banco principal)
+            _preparar_lote(cur, df, hashes)
+            # Commit só da tabela temporária: não segura nada entre os pedaços
+            con.commit()
+            total_preparadas += len(df)
+
+            # Informa o progresso
+            if progresso:
+                progresso(numero_chunk, total_preparadas)
+            else:
+                print(f"📥 Chunk {numero_chunk}: {total_preparadas} transações lidas")
+
+        # Relatório de linhas recusadas (para quem chamou e no log)
+        total_erros = relatorio.get('total_erros', 0)
+        exemplos_erros = relatorio.get('exemplos_erros', [])
+        if erros is not None:
+            erros.extend(exemplos_erros)
+        if total_erros:
+            print(f"⚠️ {total_erros} linhas recusadas. Primeiras: "
+                  + ", ".join(f"linha {e['linha']} ({e['valor']!r})" for e in exemplos_erros[:5]))
+
         # Se não sobrou nenhuma linha, erro!
-        if df.empty:
+        if total_preparadas == 0:
             return False, "Nenhuma transação válida encontrada."
 
-        #Limpa descrições (remove CPF, CNPJ, etc)
-        # .apply(limpar_descricao) = aplica limpeza em CADA descrição
-        df['description'] = df['description'].apply(limpar_descricao)
-
-        #Insere CADA linha do CSV no banco
-        # .iterrows() = itera (loopa) por cada linha
-        # _, row = ignora índice, pega apenas os dados
-        for _, row in df.iterrows():
-            # Insere na tabela transactions
-            # (user_id, date, description, amount, status)
-            # Status começa como 'pending' (aguardando confirmação)
-            cur.execute('''
-                INSERT INTO transactions (user_id, date, description, amount, status)
-                VALUES (?, ?, ?, ?, 'pending')
-            ''', (user_id, row['date'], row['description'], row['amount']))
-            
-            #Registra no AUDIT LOG
-            # Rastreia que esta transação foi criada (para auditoria)
-            # cur.lastrowid = ID da linha que acabou de ser criada
-            cur.execute('''
-                INSERT INTO audit_log (transaction_id, user_id, action, new_category, source)
-                VALUES (?, ?, 'created', 'NEW_UPLOAD', 'user')
-            ''', (cur.lastrowid, user_id))
-
-        #Confirma todas as mudanças no banco
+        #Insere tudo no banco: trava de escrita só a partir daqui até o commit
+        con.execute("BEGIN IMMEDIATE")
+        # Maior id antes do upload (lido já com a trava de escrita)
+        id_antes = cur.execute("SELECT COALESCE(MAX(transaction_id), 0) FROM transactions").fetchone()[0]
+        total_inseridas = _inserir_preparadas(cur, user_id)
+        total_repetidas = total_preparadas - total_inseridas
+
+        if total_repetidas:
+            print(f"♻️ {total_repetidas} transações já importadas antes foram ignoradas")
+
+        #Registra no AUDIT LOG (todas as linhas novas de uma vez) e confirma
+        _registrar_auditoria_upload(cur, user_id, id_antes)
         con.commit()
+        relatorio['inseridas'] = total_inseridas
+        relatorio['repetidas'] = total_repetidas
         
         # Retorna sucesso
-        return True, "Upload concluído"
+        msg = f"Upload concluído ({total_inseridas} transações novas, {total_repetidas} já existentes ignoradas"
+        if total_erros:
+            linhas = ", ".join(str(e['linha']) for e in exemplos_erros[:5])
+            msg += (f", {total_erros} linhas ignoradas por valor inválido: {linhas}"
+                    f"{'...' if total_erros > 5 else ''}")
+        return True, msg + ")"
+
+    # Formato ou colunas que não servem: a mensagem já é para o usuário
+    except ArquivoInvalido as e:
+        con.rollback()
+        return False, str(e)
         
     # Se algum erro não previsto acontecer
     except Exception as e:
+        # Desfaz o que não foi confirmado ainda
+        con.rollback()
         # Retorna erro com explicação (não quebra o programa)
         return False, f"Erro: {str(e)}"
     
-    # FINALLY: Garante que fecha conexão (mesmo se der erro)
+    # FINALLY: Garante que a conexão volta limpa e com o cache padrão (mesmo se der erro)
+    # (voltar o temp_store apaga a tabela temporária)
+    finally:
+        liberar_conexao(con)
+        con.execute(PRAGMA_TEMP_PADRAO)
+        con.execute(PRAGMA_CACHE_PADRAO)
+
+
+# ========== FUNÇÃO UPLOAD CSV PARA BANCO ==========
+# Função principal que lê CSV e insere no banco de dados
+def upload_to_csv_db(file_path, user_id, tamanho_chunk=TAMANHO_CHUNK_PADRAO,
+                     progresso=None, erros=None):
+    """
+    Lê UM arquivo CSV (caminho ou arquivo aberto) e insere as transações
+    no banco, pedaço a pedaço, na thread atual: a memória não cresce
+    com o tamanho do arquivo. Vários arquivos: importar_arquivos().
+
+    progresso e erros: ver gravar_pedacos.
+    Retorna (True, "mensagem") ou (False, "erro").
+    """
+    relatorio = {}
+    return gravar_pedacos(
+        ler_pedacos(file_path, user_id, tamanho_chunk, relatorio),
+        user_id, relatorio, progresso, erros
+    )
+
+
+# ========== VÁRIOS ARQUIVOS: LEITURA PARALELA, UM ESCRITOR ==========
+# Cada arquivo é lido e limpo numa thread do pool (no máximo
+# MAX_ARQUIVOS_EM_PARALELO de uma vez, somando TODAS as requisições).
+# Os pedaços prontos vão para uma fila curta por arquivo, e UM escritor
+# (a thread de quem chamou) grava os arquivos em ordem, cada um na sua
+# transação. Enquanto o escritor grava o arquivo 1, os outros já estão
+# sendo lidos; a fila cheia segura o leitor (memória limitada).
+# (a limpeza roda quase toda com o GIL preso: mais leitores só disputam
+# CPU com o escritor, que é o gargalo por causa dos índices)
+MAX_ARQUIVOS_EM_PARALELO = int(os.getenv("GIRO_LEITORES_UPLOAD", "2"))
+
+# Pedaços prontos esperando o escritor, por arquivo
+PEDACOS_NA_FILA = 4
+
+_POOL_LEITURA = ThreadPoolExecutor(max_workers=MAX_ARQUIVOS_EM_PARALELO, thread_name_prefix="giro-leitura")
+
+# Marca de "arquivo terminou" na fila
+_FIM = object()
+
+
+def _entregar(fila, item, cancelado):
+    """Põe na fila, desistindo se o escritor parou de ler. Retorna False se desistiu."""
+    while not cancelado.is_set():
+        try:
+            fila.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _ler_para_fila(fonte, user_id, tamanho_chunk, relatorio, fila, cancelado):
+    """Roda no pool: lê o arquivo e entrega os pedaços (ou o erro) ao escritor."""
+    try:
+        for pedaco in ler_pedacos(fonte, user_id, tamanho_chunk, relatorio):
+            if not _entregar(fila, pedaco, cancelado):
+                return
+        _entregar(fila, _FIM, cancelado)
+    except Exception as e:
+        # O erro é levantado de novo do lado do escritor (vira a mensagem do arquivo)
+        _entregar(fila, e, cancelado)
+
+
+def _pedacos_da_fila(fila):
+    """Lado do escritor: pedaços de um arquivo até o fim (ou o erro do leitor)."""
+    while True:
+        item = fila.get()
+        if item is _FIM:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+def importar_arquivos(fontes, user_id, tamanho_chunk=TAMANHO_CHUNK_PADRAO, erros=None, relatorios=None):
+    """
+    Importa vários arquivos (caminhos ou arquivos abertos) de uma vez:
+    leitura e limpeza em paralelo, gravação por um escritor só.
+
+    Cada arquivo continua sendo tudo ou nada (a falha de um não desfaz
+    os outros). Retorna [(sucesso, mensagem)], na ordem de "fontes".
+
+    relatorios = lista opcional que recebe o relatório de cada arquivo
+    (mesma ordem), com "inseridas" / "repetidas" (ver gravar_pedacos).
+    """
+    leituras = []
+    for fonte in fontes:
+        fila = queue.Queue(maxsize=PEDACOS_NA_FILA)
+        cancelado = threading.Event()
+        relatorio = {}
+        _POOL_LEITURA.submit(_ler_para_fila, fonte, user_id, tamanho_chunk, relatorio, fila, cancelado)
+        leituras.append((fila, cancelado, relatorio))
+        if relatorios is not None:
+            relatorios.append(relatorio)
+
+    resultados = []
+    try:
+        for fila, cancelado, relatorio in leituras:
+            resultados.append(gravar_pedacos(_pedacos_da_fila(fila), user_id, relatorio, erros=erros))
+            # Escritor terminou este arquivo (mesmo que no meio, por erro)
+            cancelado.set()
     finally:
-        con.close()
\ No newline at end of file
+        # Saída antecipada: libera os leitores que ainda estão esperando
+        for _, cancelado, _ in leituras:
+            cancelado.set()
+    return resultados
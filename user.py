@@ -6,6 +6,9 @@ import hashlib
 # "as lite" = apelido curto para usar em todo o código
 import sqlite3 as lite
 
+# Importa a fábrica de conexões compartilhada (db.py)
+from db import obter_conexao, liberar_conexao
+
 
 # ========== FUNÇÃO VALIDAR SENHA ==========
 # Função que verifica se a senha é forte (segura)
@@ -71,14 +74,13 @@ def login_usuario(email, senha_digitada):
     
     # Try-except = tenta executar, se erro, captura e trata
     try:
-        # PASSO 1: Abre conexão com banco de dados
-        # lite.connect() = conecta (se não existir, cria arquivo vazio)
-        con = lite.connect('Classificador Inteligente de Transações.db')
+        # PASSO 1: Pega a conexão da thread (db.py)
+        # Reaproveitada entre requisições: não abre arquivo a cada login
+        con = obter_conexao()
         
-        # PASSO 2: Configura para acessar colunas por nome
+        # PASSO 2: Colunas por nome já vêm configuradas (db.py usa lite.Row)
         # Sem isso: usuario[0], usuario[1]... (confuso)
         # Com isso: usuario['email'], usuario['senha']... (claro!)
-        con.row_factory = lite.Row
         
         # PASSO 3: Cria cursor (ferramenta para rodar SQL)
         cur = con.cursor()
@@ -94,9 +96,9 @@ def login_usuario(email, senha_digitada):
         # fetchone() = primeira linha encontrada (ou None se não achou)
         usuario = cur.fetchone()
         
-        # PASSO 6: IMPORTANTE - Fecha conexão IMEDIATAMENTE
-        # Bom hábito: não deixa conexões abertas desnecessariamente
-        con.close()
+        # PASSO 6: IMPORTANTE - Devolve a conexão IMEDIATAMENTE
+        # Bom hábito: não deixa transação aberta segurando o banco
+        liberar_conexao(con)
         
         # PASSO 7: Verifica se usuário existe no banco
         if usuario:
@@ -146,10 +148,10 @@ def cadastrar_usuario(nome, email, senha_nova):
         # Explica ao usuário por que foi rejeitada
         return False, "Senha inválida (mínimo 8 caracteres, 1 maiúscula, 1 especial)"
     
+    # PASSO 2: Pega a conexão da thread (db.py)
+    con = obter_conexao()
+
     try:
-        # PASSO 2: Abre conexão com banco
-        con = lite.connect('Classificador Inteligente de Transações.db')
-        
         # PASSO 3: Cria cursor para executar SQL
         cur = con.cursor()
         
@@ -174,12 +176,13 @@ def cadastrar_usuario(nome, email, senha_nova):
         # Sem commit, as mudanças ficam em memória e são perdidas
         con.commit()
         
-        # PASSO 7: Fecha conexão
-        con.close()
-        
         # ✅ SUCESSO!
         return True, "Cadastro realizado!"
         
         # TRATAMENTO DE ERRO ESPECÍFICO
     except lite.IntegrityError:
-        return False, "E-mail já cadastrado."
\ No newline at end of file
+        return False, "E-mail já cadastrado."
+
+    # PASSO 7: Devolve a conexão (desfaz o INSERT que falhou, se for o caso)
+    finally:
+        liberar_conexao(con)
\ No newline at end of file